@@ -0,0 +1,262 @@
+import json
+import mmap
+import os
+from array import array
+from multiprocessing import Pool
+from typing import Optional
+
+from components import ComponentIndex
+from functions import bfs, dijkstra
+from snapshot import open_snapshot
+
+HOPS = "hops"
+WEIGHTED = "weighted"
+TYPECODES = {HOPS: 'B', WEIGHTED: 'H'}
+UNREACHABLE = {HOPS: 0xFF, WEIGHTED: 0xFFFF}
+MANIFEST = "manifest.json"
+CHUNK_ROWS = 64
+
+
+def _row (graph, source, members, local, metric):
+    """
+    Calculates the distances from a source to the rest of its component
+    :param graph: the graph
+    :param source: the source vertex id
+    :param members: the component vertex ids, by local index
+    :param local: the local index of each vertex id
+    :param metric: HOPS or WEIGHTED
+    :return: the row of distances, by local index
+    """
+    unreachable = UNREACHABLE[metric]
+    row = array(TYPECODES[metric], [unreachable]) * len(members)
+    if metric == HOPS:
+        dist = bfs(graph, source)
+    else:
+        dist = dijkstra(graph, source, _Members(members))[0]
+    for vertex, d in dist.items():
+        if d >= unreachable:
+            raise OverflowError("Distance %s does not fit in the %s matrix" % (d, metric))
+        row[local[vertex]] = d
+    return row
+
+
+class _Members:
+    """
+    The members of the component being calculated, read by dijkstra as a ComponentIndex
+    instead of walking the component again for every row
+    """
+    def __init__(self, members):
+        self._members = members
+
+    def component_of(self, vertex):
+        return 0
+
+    def members(self, component):
+        return self._members
+
+
+_worker_state = None
+
+
+def _init_worker (graph, path, metric, components):
+    # A graph mapped from a snapshot is opened again instead of pickled
+    global _worker_state
+    _worker_state = (open_snapshot(path) if path is not None else graph, metric, components)
+
+
+def _rows_worker (args):
+    component, rows = args
+    graph, metric, components = _worker_state
+    members = components[component]
+    local = {vertex: i for i, vertex in enumerate(members)}
+    return component, [(r, _row(graph, members[r], members, local, metric).tobytes()) for r in rows]
+
+
+class DistanceStore:
+    """
+    All-pairs shortest path distances kept on disk, one block file per connected
+    component. Block c holds size * size distances of TYPECODES[metric], row r
+    being the distances from the r-th member of the component. A .done file per
+    block records the finished rows, so an interrupted build can be resumed.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), "r") as file:
+            self.manifest = json.load(file)
+        self.metric = self.manifest["metric"]
+        self._component = self._map("vertex_component.bin", 'i')
+        self._local = self._map("vertex_local.bin", 'i')
+        self._blocks = {}
+
+    def _map(self, name: str, typecode: str):
+        with open(os.path.join(self.directory, name), "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return memoryview(b"").cast(typecode)
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped).cast(typecode)
+
+    def _block(self, component: int):
+        if component not in self._blocks:
+            self._blocks[component] = self._map("c%d.bin" % component, TYPECODES[self.metric])
+        return self._blocks[component]
+
+    def dist(self, vertex1: int, vertex2: int) -> int:
+        """
+        Reads the distance between two vertices
+        :param vertex1: the first vertex id
+        :param vertex2: the second vertex id
+        :return: the distance, -1 if they are not connected
+        """
+        component = self._component[vertex1]
+        if component != self._component[vertex2]:
+            return -1
+        if vertex1 == vertex2:
+            return 0
+        size = self.manifest["sizes"][component]
+        value = self._block(component)[self._local[vertex1] * size + self._local[vertex2]]
+        return -1 if value == UNREACHABLE[self.metric] else value
+
+    def complete(self) -> bool:
+        """
+        If every row of every block has been calculated
+        """
+        for component, size in enumerate(self.manifest["sizes"]):
+            if size < 2:
+                continue
+            with open(os.path.join(self.directory, "c%d.done" % component), "rb") as file:
+                if file.read().count(0):
+                    return False
+        return True
+
+
+def _create_files (graph, directory, metric, components):
+    """
+    Writes the manifest, the vertex maps and the empty block files
+    :return: the members of every component, by component number
+    """
+    manifest_path = os.path.join(directory, MANIFEST)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    n = graph.num_vertices()
+    vertex_component = array('i', [0]) * n
+    vertex_local = array('i', [0]) * n
+    members = [components.members(root) for root in components.components()]
+    for c, vertices in enumerate(members):
+        for i, vertex in enumerate(vertices):
+            vertex_component[vertex] = c
+            vertex_local[vertex] = i
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "vertex_component.bin"), "wb") as file:
+        vertex_component.tofile(file)
+    with open(os.path.join(directory, "vertex_local.bin"), "wb") as file:
+        vertex_local.tofile(file)
+    itemsize = array(TYPECODES[metric]).itemsize
+    for c, vertices in enumerate(members):
+        if len(vertices) < 2:
+            continue
+        with open(os.path.join(directory, "c%d.bin" % c), "wb") as file:
+            file.truncate(len(vertices) * len(vertices) * itemsize)
+        with open(os.path.join(directory, "c%d.done" % c), "wb") as file:
+            file.truncate(len(vertices))
+    manifest = {"metric": metric, "vertices": n, "edges": graph.num_edges(), "graph": graph.fingerprint(),
+                "sizes": [len(vertices) for vertices in members]}
+    # The manifest goes last: its presence means the files are laid out
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file)
+    return members
+
+
+def _load_members (graph, directory, metric):
+    """
+    Rebuilds the members of every component of an existing store, if it matches the graph
+    :return: the members by component number, or None if the store must be created again
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST), "r") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if (manifest.get("metric") != metric or manifest.get("vertices") != graph.num_vertices()
+            or manifest.get("edges") != graph.num_edges() or manifest.get("graph") != graph.fingerprint()):
+        return None
+    store = DistanceStore(directory)
+    members = [[None] * size for size in manifest["sizes"]]
+    for vertex in range(graph.num_vertices()):
+        members[store._component[vertex]][store._local[vertex]] = vertex
+    return members
+
+
+def _write_rows (directory, component, rows, row_bytes):
+    """
+    Writes calculated rows into a block file and then marks them as done
+    :param directory: the store directory
+    :param component: the component number
+    :param rows: the (row index, row bytes) pairs
+    :param row_bytes: the size of a row in bytes
+    """
+    with open(os.path.join(directory, "c%d.bin" % component), "r+b") as file:
+        with mmap.mmap(file.fileno(), 0) as block:
+            for r, row in rows:
+                block[r * row_bytes:(r + 1) * row_bytes] = row
+            block.flush()
+    # A row is marked as done only after its distances are on disk
+    with open(os.path.join(directory, "c%d.done" % component), "r+b") as file:
+        with mmap.mmap(file.fileno(), 0) as done:
+            for r, _ in rows:
+                done[r] = 1
+            done.flush()
+
+
+def build_distance_store (graph, directory, metric = HOPS, processes = None,
+                          components: Optional[ComponentIndex] = None) -> DistanceStore:
+    """
+    Calculates all the shortest path distances of the graph into a DistanceStore,
+    resuming from the rows already written if the directory holds a store of the same graph
+    :param graph: the graph, a CSRGraph
+    :param directory: the store directory
+    :param metric: HOPS (uint8 hop counts) or WEIGHTED (uint16 movie-count distances)
+    :param processes: the number of worker processes (None or 1 to run here)
+    :param components: a prebuilt ComponentIndex of the graph
+    :return: the DistanceStore
+    """
+    if metric not in TYPECODES:
+        raise ValueError("Unknown metric: %s" % metric)
+    members = _load_members(graph, directory, metric)
+    if members is None:
+        if components is None:
+            components = ComponentIndex.from_graph(graph)
+        members = _create_files(graph, directory, metric, components)
+
+    tasks = []
+    for c, vertices in enumerate(members):
+        if len(vertices) < 2:
+            continue
+        with open(os.path.join(directory, "c%d.done" % c), "rb") as file:
+            done = file.read()
+        pending = [r for r in range(len(vertices)) if not done[r]]
+        tasks += [(c, pending[i:i + CHUNK_ROWS]) for i in range(0, len(pending), CHUNK_ROWS)]
+
+    if processes and processes > 1:
+        path = getattr(graph, "snapshot_path", None)
+        initargs = (None, path, metric, members) if path is not None else (graph, None, metric, members)
+        pool = Pool(processes, initializer=_init_worker, initargs=initargs)
+        results = pool.imap_unordered(_rows_worker, tasks)
+    else:
+        pool = None
+        _init_worker(graph, None, metric, members)
+        results = map(_rows_worker, tasks)
+
+    itemsize = array(TYPECODES[metric]).itemsize
+    try:
+        for c, rows in results:
+            _write_rows(directory, c, rows, len(members[c]) * itemsize)
+    except BaseException:
+        # Stop now (also on Ctrl-C): the rows already written are kept for the next run
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        raise
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return DistanceStore(directory)
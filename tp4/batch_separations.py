@@ -0,0 +1,170 @@
+import heapq
+import sys
+from collections import deque
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loader import open_tsv
+from snapshot import open_snapshot
+
+
+def read_pairs (path: str, graph=None) -> List[Tuple[Any, Any]]:
+    """
+    Reads the pairs of a TSV file with two actor columns (IMDb ids) and no header
+    :param path: the file (.gz is accepted)
+    :param graph: the graph, to turn the ids into CSRGraph vertex ids
+    :return: the pairs (unknown ids are kept and answered with -1)
+    """
+    pairs = []
+    with open_tsv(path) as file:
+        for line in file:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 2:
+                continue
+            if graph is not None and hasattr(graph, "vertex_id"):
+                ids = [graph.vertex_id(field) for field in fields[:2]]
+                pairs.append(tuple(field if i is None else i for field, i in zip(fields, ids)))
+            else:
+                pairs.append((fields[0], fields[1]))
+    return pairs
+
+
+def group_pairs (pairs: Iterable[Tuple[Any, Any]]) -> Dict[Any, List[Tuple[int, Any]]]:
+    """
+    Groups the pairs by a shared endpoint, choosing greedily the endpoint that
+    answers the most pending pairs, so that few traversals cover them all
+    :param pairs: the (vertex1, vertex2) pairs
+    :return: the (pair position, other endpoint) pairs answered by each source
+    """
+    pairs = list(pairs)
+    by_vertex = {}
+    for position, (vertex1, vertex2) in enumerate(pairs):
+        by_vertex.setdefault(vertex1, []).append(position)
+        if vertex2 != vertex1:
+            by_vertex.setdefault(vertex2, []).append(position)
+    answered = [False] * len(pairs)
+    pending = {vertex: len(positions) for vertex, positions in by_vertex.items()}
+    heap = [(-count, i, vertex) for i, (vertex, count) in enumerate(pending.items())]
+    heapq.heapify(heap)
+    order = {vertex: i for _, i, vertex in heap}
+    groups = {}
+    while heap:
+        count, _, vertex = heapq.heappop(heap)
+        if -count != pending[vertex]:
+            # The count went down since it was pushed
+            if pending[vertex]:
+                heapq.heappush(heap, (-pending[vertex], order[vertex], vertex))
+            continue
+        if not pending[vertex]:
+            continue
+        group = groups.setdefault(vertex, [])
+        for position in by_vertex[vertex]:
+            if answered[position]:
+                continue
+            answered[position] = True
+            vertex1, vertex2 = pairs[position]
+            other = vertex2 if vertex1 == vertex else vertex1
+            group.append((position, other))
+            if other != vertex:
+                pending[other] -= 1
+        pending[vertex] = 0
+    return groups
+
+
+def _answer_group (graph, source, targets) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    Answers the pairs of one source with a single BFS, stopped once every target is reached
+    :param graph: the graph
+    :param source: the source vertex
+    :param targets: the (pair position, target) pairs
+    :return: the (pair position, separation rate) pairs and the number of vertices visited
+    """
+    if not graph.vertex_exists(source):
+        return [(position, -1) for position, _ in targets], 0
+    missing = {target for _, target in targets if target != source}
+    dist = {source: 0}
+    queue = deque([source])
+    while queue and missing:
+        v = queue.popleft()
+        d = dist[v] + 1
+        for w in graph.get_neighbors(v):
+            if w not in dist:
+                dist[w] = d
+                queue.append(w)
+                missing.discard(w)
+    results = []
+    for position, target in targets:
+        d = dist.get(target)
+        # Hops between actors are even in the actor-movie graph, as in separation_rate
+        results.append((position, -1 if d is None else int(d / 2)))
+    return results, len(dist)
+
+
+_worker_graph = None
+
+
+def _init_worker (graph, path):
+    # A graph mapped from a snapshot is opened again instead of pickled
+    global _worker_graph
+    _worker_graph = open_snapshot(path) if path is not None else graph
+
+
+def _group_worker (args):
+    source, targets = args
+    return _answer_group(_worker_graph, source, targets)
+
+
+def batch_separations (graph, pairs, processes: Optional[int]=None,
+                       stats: Optional[dict]=None) -> Iterator[Tuple[int, Any, Any, int]]:
+    """
+    Calculates the separation rate of many pairs of actors in the load_graph_b
+    graph, with one BFS per group of pairs that share an endpoint. The results
+    are the same as separation_rate's and come out as each group finishes.
+    :param graph: the graph
+    :param pairs: the (actor1, actor2) pairs
+    :param processes: the number of worker processes (None or 1 to run here)
+    :param stats: a dictionary to fill with the work done and saved
+    :return: the (pair position, actor1, actor2, separation rate) tuples, in no particular order
+    """
+    pairs = list(pairs)
+    groups = group_pairs(pairs)
+    if stats is not None:
+        stats.update(pairs=len(pairs), traversals=len(groups),
+                     traversals_saved=len(pairs) - len(groups), vertices_visited=0)
+    tasks = list(groups.items())
+    if processes and processes > 1:
+        path = getattr(graph, "snapshot_path", None)
+        initargs = (None, path) if path is not None else (graph, None)
+        pool = Pool(processes, initializer=_init_worker, initargs=initargs)
+        results = pool.imap_unordered(_group_worker, tasks)
+    else:
+        pool = None
+        _init_worker(graph, None)
+        results = map(_group_worker, tasks)
+    try:
+        for answers, visited in results:
+            if stats is not None:
+                stats["vertices_visited"] += visited
+            for position, rate in answers:
+                vertex1, vertex2 = pairs[position]
+                yield position, vertex1, vertex2, rate
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+if __name__ == '__main__':
+    from functions import MOVIES_DATA_PATH, ACTORS_DATA_PATH, ACTORS_NAMES_PATH
+    from snapshot import cached_graph, BIPARTITE
+
+    # Usage: batch_separations.py pairs.tsv [processes]
+    graph = cached_graph(BIPARTITE, MOVIES_DATA_PATH, ACTORS_DATA_PATH, ACTORS_NAMES_PATH)
+    pairs = read_pairs(sys.argv[1], graph)
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    stats = {}
+    for _, vertex1, vertex2, rate in batch_separations(graph, pairs, processes, stats):
+        print(graph.vertex_label(vertex1) if isinstance(vertex1, int) else vertex1,
+              graph.vertex_label(vertex2) if isinstance(vertex2, int) else vertex2, rate, sep="\t")
+    print(f"{stats['pairs']} pairs with {stats['traversals']} BFS "
+          f"({stats['traversals_saved']} saved, {stats['vertices_visited']} vertices visited)", file=sys.stderr)
@@ -0,0 +1,79 @@
+import random
+import sys
+import time
+from array import array
+
+from csr_graph import CSRGraph
+from functions import dijkstra, dijkstra_heapdict, dijkstra_indexed
+from heapdict import heapdict
+from indexed_heap import IndexedHeap
+
+
+def random_graph (vertices, edges, movies, seed = 0) -> CSRGraph:
+    """
+    Builds a random co-star-like graph: edges with skewed endpoints and a few shared movies each
+    :param vertices: the number of vertices
+    :param edges: the number of edge records
+    :param movies: the number of distinct movie numbers
+    :param seed: the random seed
+    :return: a CSRGraph
+    """
+    rng = random.Random(seed)
+    src, dst, items = array('i'), array('i'), array('i')
+    for _ in range(edges):
+        u = int(rng.paretovariate(1.0)) % vertices if rng.random() < 0.3 else rng.randrange(vertices)
+        v = rng.randrange(vertices)
+        if u != v:
+            src.append(u)
+            dst.append(v)
+            items.append(rng.randrange(movies))
+    return CSRGraph.from_edges(list(range(vertices)), [None] * vertices, src, dst, items)
+
+
+def timed (function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def queue_operations (queue, keys, rng):
+    """
+    Inserts every key, lowers half of the priorities and empties the queue
+    """
+    for key in keys:
+        queue[key] = rng.random() + 1
+    for key in keys[::2]:
+        queue[key] = rng.random()
+    while queue:
+        queue.popitem()
+
+
+if __name__ == '__main__':
+    # Usage: bench_heaps.py [vertices] [edges] [sources]
+    vertices = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    edges = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    sources = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    keys = list(range(vertices))
+    for name, queue in (("heapdict", heapdict()), ("IndexedHeap", IndexedHeap()),
+                        ("IndexedHeap (int keys)", IndexedHeap(capacity=vertices))):
+        seconds, _ = timed(queue_operations, queue, keys, random.Random(1))
+        print(f"{name:24} {vertices} keys: {seconds:.3f} s")
+
+    graph = random_graph(vertices, edges, vertices // 4)
+    rng = random.Random(2)
+    starts = [rng.randrange(vertices) for _ in range(sources)]
+    engines = (("dijkstra (heapq)", dijkstra), ("dijkstra_heapdict", dijkstra_heapdict),
+               ("dijkstra_indexed", dijkstra_indexed))
+    reference = None
+    for name, engine in engines:
+        total = 0.0
+        results = []
+        for start in starts:
+            seconds, (dist, _) = timed(engine, graph, start)
+            total += seconds
+            results.append({v: d for v, d in dist.items() if d != float('inf')})
+        if reference is None:
+            reference = results
+        status = "same distances" if results == reference else "DIFFERENT DISTANCES"
+        print(f"{name:24} {sources} sources: {total:.3f} s ({status})")
@@ -0,0 +1,194 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from csr_graph import CSRGraph
+from functions import read_data, bfs, connected, dijkstra, is_actor
+from grafo_a import load_graph
+from grafo_b import load_graph_b, separation_rate, random_walks
+from loader import read_data_compact
+from synthetic import generate_dataset
+from walks import batch_random_walks
+
+RESULTS_VERSION = 1
+SCALES = (1000, 10000)
+QUERIES = 20
+WALKS = 500
+STEPS = 50
+REGRESSION = 0.2
+
+
+def measure (function, *args, memory = True):
+    """
+    Runs a stage, timing it and then running it again under tracemalloc for its peak
+    (tracing slows Python down, so the time comes from the untraced run)
+    :param function: the stage
+    :param args: its arguments
+    :param memory: also measure the peak memory
+    :return: the result of the stage, the seconds and the peak bytes (None without memory)
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        peak = None
+        if memory:
+            tracemalloc.start()
+            function(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _rows (paths):
+    rows = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            rows += sum(1 for _ in file) - 1
+    return rows
+
+
+def _pairs (vertices, count, rng):
+    return [(rng.choice(vertices), rng.choice(vertices)) for _ in range(count)]
+
+
+def run_scale (paths, scale, memory = True, seed = 0):
+    """
+    Benchmarks every stage of the pipeline over one dataset
+    :param paths: the title-basics, title-principals and name-basics files
+    :param scale: the number of titles of the dataset, to label the results
+    :param memory: also measure the peak memory of every stage
+    :param seed: the random seed for the query sources and pairs
+    :return: the results, one per stage
+    """
+    rng = random.Random(seed)
+    results = []
+
+    def record(stage, function, args, items, unit):
+        result, seconds, peak = measure(function, *args, memory=memory)
+        count = items(result) if callable(items) else items
+        results.append({"scale": scale, "stage": stage, "seconds": seconds, "peak_bytes": peak,
+                        "items": count, "unit": unit,
+                        "throughput": count / seconds if seconds else None})
+        return result
+
+    rows = _rows(paths)
+    movies_by_id, actors_by_movie, actor_names_by_id = record(
+        "read_data", read_data, paths, rows, "rows")
+    imdb_data = record("read_data_compact", read_data_compact, paths, rows, "rows")
+    data = (movies_by_id, actors_by_movie, actor_names_by_id)
+    graph = record("load_graph", load_graph, data, lambda g: len(g.get_vertices()), "vertices")
+    graph_b = record("load_graph_b", load_graph_b, data, lambda g: len(g.get_vertices()), "vertices")
+    record("csr_costar", CSRGraph.from_imdb_data, (imdb_data,), lambda g: g.num_edges(), "edges")
+    record("csr_bipartite", lambda d: CSRGraph.from_imdb_data(d, bipartite=True), (imdb_data,),
+           lambda g: g.num_edges(), "edges")
+
+    vertices = list(graph.get_vertices())
+    record("connected", connected, (vertices, graph), len(vertices), "vertices")
+    if vertices:
+        sources = [rng.choice(vertices) for _ in range(QUERIES)]
+        record("bfs", lambda: [bfs(graph, s) for s in sources], (), len(sources), "traversals")
+        record("dijkstra", lambda: [dijkstra(graph, s) for s in sources], (), len(sources), "traversals")
+    actors = [v for v in graph_b.get_vertices() if is_actor(graph_b, v)]
+    if actors:
+        pairs = _pairs(actors, QUERIES, rng)
+        record("separation_rate", lambda: [separation_rate(a, b, graph_b) for a, b in pairs], (),
+               len(pairs), "pairs")
+    record("random_walks", random_walks, (graph_b, WALKS, STEPS), WALKS * STEPS, "steps")
+    csr_b = CSRGraph.from_graph(graph_b)
+    record("batch_random_walks", batch_random_walks, (csr_b, WALKS, STEPS, seed), WALKS * STEPS, "steps")
+    return results
+
+
+def _revision ():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks (directory, scales = SCALES, memory = True, seed = 0) -> dict:
+    """
+    Generates a synthetic dataset per scale and benchmarks the pipeline over each one
+    :param directory: where to write the datasets
+    :param scales: the numbers of titles
+    :param memory: also measure the peak memory of every stage
+    :param seed: the random seed of the datasets and the queries
+    :return: the results document
+    """
+    results = []
+    for scale in scales:
+        paths = generate_dataset(os.path.join(directory, "scale-%d" % scale), scale, seed=seed)
+        results += run_scale(paths, scale, memory, seed)
+    return {"version": RESULTS_VERSION, "revision": _revision(), "python": platform.python_version(),
+            "seed": seed, "results": results}
+
+
+def compare (old, new, threshold = REGRESSION):
+    """
+    Compares two results documents stage by stage
+    :param old: the baseline results
+    :param new: the new results
+    :param threshold: the relative slowdown or memory growth reported as a regression
+    :return: the rows (scale, stage, time ratio, memory ratio, regression)
+    """
+    baseline = {(r["scale"], r["stage"]): r for r in old["results"]}
+    rows = []
+    for result in new["results"]:
+        before = baseline.get((result["scale"], result["stage"]))
+        if before is None:
+            continue
+        time_ratio = result["seconds"] / before["seconds"] if before["seconds"] else None
+        memory_ratio = None
+        if result["peak_bytes"] and before["peak_bytes"]:
+            memory_ratio = result["peak_bytes"] / before["peak_bytes"]
+        regression = any(ratio is not None and ratio > 1 + threshold for ratio in (time_ratio, memory_ratio))
+        rows.append((result["scale"], result["stage"], time_ratio, memory_ratio, regression))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the pipeline over synthetic datasets")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the benchmarks and write the results as JSON")
+    run.add_argument("output", help="the results file")
+    run.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help="numbers of titles")
+    run.add_argument("--directory", default="./datasets/synthetic", help="where to write the datasets")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    diff = commands.add_parser("compare", help="compare two results files")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--threshold", type=float, default=REGRESSION)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        document = run_benchmarks(args.directory, args.scales, not args.no_memory, args.seed)
+        with open(args.output, "w") as file:
+            json.dump(document, file, indent=1)
+        for r in document["results"]:
+            peak = "" if r["peak_bytes"] is None else " %.1f MiB" % (r["peak_bytes"] / 2 ** 20)
+            print(f"{r['scale']:>8} {r['stage']:20} {r['seconds']:9.4f} s{peak} "
+                  f"{r['throughput'] or 0:12.1f} {r['unit']}/s")
+    else:
+        with open(args.old) as file:
+            old = json.load(file)
+        with open(args.new) as file:
+            new = json.load(file)
+        regressions = 0
+        for scale, stage, time_ratio, memory_ratio, regression in compare(old, new, args.threshold):
+            time_text = "-" if time_ratio is None else "%.2fx" % time_ratio
+            memory_text = "-" if memory_ratio is None else "%.2fx" % memory_ratio
+            print(f"{scale:>8} {stage:20} time {time_text:>7} memory {memory_text:>7}"
+                  + ("  REGRESSION" if regression else ""))
+            regressions += regression
+        sys.exit(1 if regressions else 0)
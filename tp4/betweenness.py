@@ -0,0 +1,235 @@
+import heapq
+import math
+import random
+from collections import deque
+from itertools import count
+from multiprocessing import Pool
+from typing import Any, Dict
+
+from functions import weight
+from snapshot import open_snapshot
+
+ADAPTIVE_BATCH = 32
+
+
+def _shortest_paths (graph, source):
+    """
+    Breadth First Search that counts the shortest paths from the source
+    :param graph: the graph
+    :param source: the source vertex
+    :return: the vertices by distance, their predecessors and their number of shortest paths
+    """
+    order = []
+    pred = {source: []}
+    sigma = {source: 1}
+    dist = {source: 0}
+    queue = deque([source])
+    while queue:
+        v = queue.popleft()
+        order.append(v)
+        d = dist[v] + 1
+        sigma_v = sigma[v]
+        for w in graph.get_neighbors(v):
+            if w not in dist:
+                dist[w] = d
+                sigma[w] = 0
+                pred[w] = []
+                queue.append(w)
+            if dist[w] == d:
+                sigma[w] += sigma_v
+                pred[w].append(v)
+    return order, pred, sigma
+
+
+def _weighted_shortest_paths (graph, source):
+    """
+    Dijkstra that counts the shortest paths from the source, with the movie-count weights
+    :param graph: the graph
+    :param source: the source vertex
+    :return: the vertices by distance, their predecessors and their number of shortest paths
+    """
+    order = []
+    pred = {source: []}
+    sigma = {source: 1}
+    dist = {}
+    seen = {source: 0}
+    counter = count()
+    queue = [(0, next(counter), source, source)]
+    while queue:
+        d, _, prev, v = heapq.heappop(queue)
+        if v in dist:
+            continue
+        if v != source:
+            sigma[v] += sigma[prev]
+        order.append(v)
+        dist[v] = d
+        for w in graph.get_neighbors(v):
+            new_dist = d + weight(v, w, graph)
+            if w not in dist and (w not in seen or new_dist < seen[w]):
+                seen[w] = new_dist
+                heapq.heappush(queue, (new_dist, next(counter), v, w))
+                sigma[w] = 0
+                pred[w] = [v]
+            elif new_dist == seen.get(w):
+                sigma[w] += sigma[v]
+                pred[w].append(v)
+    return order, pred, sigma
+
+
+def dependencies (graph, source, weighted = False) -> Dict[Any, float]:
+    """
+    Calculates the dependency of the source on every other vertex (Brandes)
+    :param graph: the graph
+    :param source: the source vertex
+    :param weighted: use the movie-count edge weights instead of hops
+    :return: the dependency of each reached vertex
+    """
+    if weighted:
+        order, pred, sigma = _weighted_shortest_paths(graph, source)
+    else:
+        order, pred, sigma = _shortest_paths(graph, source)
+    delta = dict.fromkeys(order, 0.0)
+    while order:
+        w = order.pop()
+        coefficient = (1 + delta[w]) / sigma[w]
+        for v in pred[w]:
+            delta[v] += sigma[v] * coefficient
+    del delta[source]
+    return delta
+
+
+def _accumulate (graph, sources, weighted) -> Dict[Any, float]:
+    """
+    Adds up the dependencies of several sources
+    :param graph: the graph
+    :param sources: the source vertices
+    :param weighted: use the movie-count edge weights
+    :return: the summed dependencies
+    """
+    total = {}
+    for source in sources:
+        for vertex, value in dependencies(graph, source, weighted).items():
+            total[vertex] = total.get(vertex, 0.0) + value
+    return total
+
+
+_worker_graph = None
+
+
+def _init_worker (graph, path):
+    # A graph mapped from a snapshot is opened again instead of pickled
+    global _worker_graph
+    _worker_graph = open_snapshot(path) if path is not None else graph
+
+
+def _accumulate_worker (args):
+    sources, weighted = args
+    return _accumulate(_worker_graph, sources, weighted)
+
+
+def _parallel_accumulate (graph, sources, weighted, processes) -> Dict[Any, float]:
+    """
+    Splits the sources across a process pool and merges the partial dependency sums
+    :param graph: the graph
+    :param sources: the source vertices
+    :param weighted: use the movie-count edge weights
+    :param processes: the number of worker processes
+    :return: the summed dependencies
+    """
+    chunks = [(sources[i::processes * 4], weighted) for i in range(processes * 4)]
+    total = {}
+    path = getattr(graph, "snapshot_path", None)
+    initargs = (None, path) if path is not None else (graph, None)
+    with Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+        for partial in pool.imap_unordered(_accumulate_worker, chunks):
+            for vertex, value in partial.items():
+                total[vertex] = total.get(vertex, 0.0) + value
+    return total
+
+
+def _scores (graph, sources, weighted, processes, scale) -> Dict[Any, float]:
+    if processes and processes > 1:
+        total = _parallel_accumulate(graph, list(sources), weighted, processes)
+    else:
+        total = _accumulate(graph, sources, weighted)
+    scores = dict.fromkeys(graph.get_vertices(), 0.0)
+    for vertex, value in total.items():
+        # Every pair is counted from both ends in an undirected graph
+        scores[vertex] = value * scale / 2
+    return scores
+
+
+def exact_betweenness (graph, weighted = False, processes = None) -> Dict[Any, float]:
+    """
+    Calculates the betweenness centrality of every vertex from all the sources (Brandes)
+    :param graph: the graph
+    :param weighted: use the movie-count edge weights instead of hops
+    :param processes: the number of worker processes (None or 1 to run here)
+    :return: the betweenness of each vertex
+    """
+    return _scores(graph, list(graph.get_vertices()), weighted, processes, 1)
+
+
+def sampled_betweenness (graph, samples, weighted = False, processes = None,
+                         rng = random) -> Dict[Any, float]:
+    """
+    Estimates the betweenness centrality from a random sample of distinct sources
+    :param graph: the graph
+    :param samples: the number of sources, at least 1 (at most every vertex is taken)
+    :param weighted: use the movie-count edge weights instead of hops
+    :param processes: the number of worker processes (None or 1 to run here)
+    :param rng: the random generator
+    :return: the estimated betweenness of each vertex
+    """
+    if samples < 1:
+        raise ValueError("The number of samples must be at least 1: %s" % samples)
+    vertices = list(graph.get_vertices())
+    if not vertices:
+        return {}
+    samples = min(samples, len(vertices))
+    sources = rng.sample(vertices, samples)
+    return _scores(graph, sources, weighted, processes, len(vertices) / samples)
+
+
+def adaptive_betweenness (graph, top = 10, epsilon = 0.1, weighted = False,
+                          max_samples = None, rng = random):
+    """
+    Estimates the top betweenness vertices, sampling sources in batches until the
+    standard error of every top estimate is below epsilon times the estimate
+    :param graph: the graph
+    :param top: the number of top vertices
+    :param epsilon: the relative error bound
+    :param weighted: use the movie-count edge weights instead of hops
+    :param max_samples: the maximum number of sources (None for all of them)
+    :param rng: the random generator
+    :return: the top (vertex, estimated betweenness) pairs and the number of sources used
+    """
+    vertices = list(graph.get_vertices())
+    n = len(vertices)
+    order = rng.sample(vertices, n)
+    if max_samples is not None:
+        order = order[:max_samples]
+    total = {}
+    squares = {}
+    used = 0
+    ranking = []
+    while used < len(order):
+        for source in order[used:used + ADAPTIVE_BATCH]:
+            for vertex, value in dependencies(graph, source, weighted).items():
+                total[vertex] = total.get(vertex, 0.0) + value
+                squares[vertex] = squares.get(vertex, 0.0) + value * value
+        used = min(used + ADAPTIVE_BATCH, len(order))
+        ranking = sorted(total.items(), key=lambda x: x[1], reverse=True)[:top]
+        if used < 2 or not ranking:
+            continue
+        converged = True
+        for vertex, value in ranking:
+            mean = value / used
+            variance = max(squares[vertex] / used - mean * mean, 0.0)
+            if mean == 0 or math.sqrt(variance / used) > epsilon * mean:
+                converged = False
+                break
+        if converged:
+            break
+    scale = n / used / 2 if used else 0
+    return [(vertex, value * scale) for vertex, value in ranking], used
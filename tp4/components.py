@@ -0,0 +1,207 @@
+import random
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class ComponentIndex:
+    """
+    Connected components kept with union-find.
+
+    Every component is identified by its representative vertex. The members
+    of each component are kept in a list, merging the smaller list into the
+    larger one on every union, so component_of, sizes and uniform sampling
+    inside a component are O(1) once the index is built.
+    """
+    def __init__(self):
+        self._parent = {}
+        self._members = {}
+
+    @classmethod
+    def from_graph(cls, graph) -> "ComponentIndex":
+        """
+        Builds the index from the edge list of a graph
+        :param graph: the graph
+        :return: a ComponentIndex
+        """
+        index = cls()
+        for vertex in graph.get_vertices():
+            index.add_vertex(vertex)
+        for vertex in graph.get_vertices():
+            for neighbor in graph.get_neighbors(vertex):
+                index.union(vertex, neighbor)
+        index.compress()
+        return index
+
+    @classmethod
+    def from_actors_by_movie(cls, actors_by_movie: Dict[Any, Iterable[Any]],
+                             include_movies: bool=False) -> "ComponentIndex":
+        """
+        Builds the index straight from read_data output, without building the graph.
+        Actors that share a movie are in the same component. Without the movies, as
+        load_graph, an actor is only indexed through a cast of two or more actors.
+        :param actors_by_movie: the actors data by movie
+        :param include_movies: also index the movies, as in the load_graph_b graph
+        :return: a ComponentIndex
+        """
+        index = cls()
+        for movie_id, actors in actors_by_movie.items():
+            if not include_movies and len(actors) < 2:
+                continue
+            first = None
+            for actor in actors:
+                index.add_vertex(actor)
+                if first is None:
+                    first = actor
+                    if include_movies:
+                        index.add_vertex(movie_id)
+                        index.union(movie_id, actor)
+                else:
+                    index.union(first, actor)
+        index.compress()
+        return index
+
+    def add_vertex(self, vertex: Any) -> None:
+        """
+        Adds a vertex as its own component
+        :param vertex: the vertex
+        """
+        if vertex not in self._parent:
+            self._parent[vertex] = vertex
+            self._members[vertex] = [vertex]
+
+    def find(self, vertex: Any) -> Any:
+        """
+        Finds the representative of the vertex component, halving the path on the way
+        :param vertex: the vertex
+        :return: the representative vertex
+        """
+        parent = self._parent
+        while parent[vertex] != vertex:
+            parent[vertex] = parent[parent[vertex]]
+            vertex = parent[vertex]
+        return vertex
+
+    def union(self, vertex1: Any, vertex2: Any) -> Any:
+        """
+        Joins the components of two vertices
+        :param vertex1: the first vertex
+        :param vertex2: the second vertex
+        :return: the representative of the joined component
+        """
+        root1, root2 = self.find(vertex1), self.find(vertex2)
+        if root1 == root2:
+            return root1
+        if len(self._members[root1]) < len(self._members[root2]):
+            root1, root2 = root2, root1
+        self._parent[root2] = root1
+        self._members[root1].extend(self._members.pop(root2))
+        return root1
+
+    def compress(self) -> None:
+        """
+        Points every vertex straight to its representative
+        """
+        for root, members in self._members.items():
+            for vertex in members:
+                self._parent[vertex] = root
+
+    def rebuild(self, component: Any, graph) -> List[Any]:
+        """
+        Recalculates a component after edges or vertices were removed from it, walking
+        only its own vertices. Vertices no longer in the graph are dropped from the index.
+        :param component: the component id
+        :param graph: the graph
+        :return: the ids of the resulting components
+        """
+        members = self._members.pop(component)
+        for vertex in members:
+            del self._parent[vertex]
+        roots = []
+        for vertex in members:
+            if vertex in self._parent or not graph.vertex_exists(vertex):
+                continue
+            self.add_vertex(vertex)
+            stack = [vertex]
+            while stack:
+                v = stack.pop()
+                for w in graph.get_neighbors(v):
+                    if w not in self._parent:
+                        self._parent[w] = vertex
+                        self._members[vertex].append(w)
+                        stack.append(w)
+            roots.append(vertex)
+        return roots
+
+    def contains(self, vertex: Any) -> bool:
+        return vertex in self._parent
+
+    def component_of(self, vertex: Any) -> Optional[Any]:
+        """
+        Gets the component of a vertex
+        :param vertex: the vertex
+        :return: the component id (its representative vertex), or None if the vertex is not indexed
+        """
+        if vertex not in self._parent:
+            return None
+        return self.find(vertex)
+
+    def same_component(self, vertex1: Any, vertex2: Any) -> bool:
+        """
+        If two vertices are connected
+        :param vertex1: the first vertex
+        :param vertex2: the second vertex
+        :return: boolean
+        """
+        return self.contains(vertex1) and self.contains(vertex2) and self.find(vertex1) == self.find(vertex2)
+
+    def members(self, component: Any) -> List[Any]:
+        """
+        Gets the vertices of a component. The list belongs to the index and must not be modified.
+        :param component: the component id
+        :return: the vertices
+        """
+        return self._members[component]
+
+    def size(self, component: Any) -> int:
+        return len(self._members[component])
+
+    def components(self) -> List[Any]:
+        """
+        Gets the components ordered from the biggest to the smallest
+        :return: the component ids
+        """
+        return sorted(self._members.keys(), key=lambda root: len(self._members[root]), reverse=True)
+
+    def num_components(self) -> int:
+        return len(self._members)
+
+    def sample(self, component: Any, rng: random.Random=random) -> Any:
+        """
+        Chooses a vertex of a component uniformly at random
+        :param component: the component id
+        :param rng: the random generator
+        :return: the vertex
+        """
+        return rng.choice(self._members[component])
+
+    def as_connected(self, vertices: Optional[Iterable[Any]]=None):
+        """
+        Gets the components in the format returned by functions.connected
+        :param vertices: only the components of these vertices, in the order they are
+        first reached (all of them by default); vertices not in the index are skipped
+        :return: the connected components (dictionary) and the connected components list
+        """
+        if vertices is None:
+            roots = self._members.keys()
+        else:
+            roots = {}
+            for vertex in vertices:
+                if vertex in self._parent:
+                    roots.setdefault(self.find(vertex), None)
+        connected_comp = {}
+        connected_comp_list = []
+        for cont, root in enumerate(roots, 1):
+            members = self._members[root]
+            connected_comp_list.append(set(members))
+            for vertex in members:
+                connected_comp[vertex] = cont
+        return connected_comp, connected_comp_list
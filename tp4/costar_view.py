@@ -0,0 +1,156 @@
+from array import array
+from typing import Any, Dict, List, Optional
+
+from functions import is_actor
+from loader import MOVIE_ID_TYPE, parse_id
+
+
+class CoStarView:
+    """
+    Read-only co-star graph derived on the fly from the actor-movie graph of
+    load_graph_b (a Graph or a CSRGraph), without expanding the cast of every
+    movie into a clique. The neighbors of an actor are the actors of its movies,
+    and the edge data are the numbers of the movies two actors share, as in
+    load_graph (so weight and put_titles work the same). It has the same vertices and edges as
+    the load_graph graph and works with bfs, dijkstra, connected and betweenness.
+
+    The co-stars of hub actors (at least hub_threshold of them) are kept once
+    calculated, since those are the vertices every search goes through.
+    """
+    def __init__(self, graph, hub_threshold: Optional[int]=None):
+        """
+        :param graph: the actor-movie graph
+        :param hub_threshold: cache the co-stars of actors with at least this many of them
+        (None to calculate them every time)
+        """
+        self.graph = graph
+        self.hub_threshold = hub_threshold
+        self.integer_items = True
+        self._hubs = {}
+        self._vertices = None
+
+    @classmethod
+    def from_read_data(cls, movies_by_id, actors_by_movie, actor_names_by_id,
+                       hub_threshold: Optional[int]=None) -> "CoStarView":
+        """
+        Builds the actor-movie graph and the view over it
+        :param movies_by_id: the movies data by id as dict
+        :param actors_by_movie: the actors data by movie
+        :param actor_names_by_id: the actors names by their ids
+        :param hub_threshold: cache the co-stars of actors with at least this many of them
+        :return: a CoStarView
+        """
+        from csr_graph import CSRGraph
+
+        graph = CSRGraph.from_read_data(movies_by_id, actors_by_movie, actor_names_by_id, bipartite=True)
+        return cls(graph, hub_threshold)
+
+    def _costars(self, actor: Any) -> Dict[Any, List[Any]]:
+        """
+        Groups the actors of the movies of an actor
+        :param actor: the actor
+        :return: the movies shared with each co-star
+        """
+        if actor in self._hubs:
+            return self._hubs[actor]
+        graph = self.graph
+        costars = {}
+        for movie in graph.get_neighbors(actor):
+            for other in graph.get_neighbors(movie):
+                if other != actor:
+                    costars.setdefault(other, []).append(movie)
+        if self.hub_threshold is not None and len(costars) >= self.hub_threshold:
+            self._hubs[actor] = costars
+        return costars
+
+    def get_neighbors(self, vertex: Any) -> List[Any]:
+        """
+        Gets the co-stars of an actor
+        :param vertex: the actor
+        :return: the list of neighbor actors
+        """
+        if not self._is_actor(vertex):
+            return []
+        return list(self._costars(vertex).keys())
+
+    def get_vertex_data(self, vertex: Any) -> Optional[Any]:
+        return self.graph.get_vertex_data(vertex)
+
+    def _is_actor(self, vertex: Any) -> bool:
+        return self.graph.vertex_exists(vertex) and is_actor(self.graph, vertex)
+
+    def _shared(self, vertex1: Any, vertex2: Any) -> Optional[List[Any]]:
+        """
+        Finds the movie vertices two different actors share
+        """
+        if vertex1 == vertex2:
+            return None
+        if vertex1 in self._hubs:
+            return self._hubs[vertex1].get(vertex2)
+        if vertex2 in self._hubs:
+            return self._hubs[vertex2].get(vertex1)
+        # Two actors that share a movie both have co-stars, no need to look for them
+        if not (self._is_actor(vertex1) and self._is_actor(vertex2)):
+            return None
+        movies1 = self.graph.get_neighbors(vertex1)
+        movies2 = self.graph.get_neighbors(vertex2)
+        if len(movies1) > len(movies2):
+            movies1, movies2 = movies2, movies1
+        others = set(movies2)
+        return [movie for movie in movies1 if movie in others]
+
+    def get_edge_data(self, vertex1: Any, vertex2: Any) -> array:
+        """
+        Gets the movies two actors share
+        :param vertex1: the first actor
+        :param vertex2: the second actor
+        :return: the numbers of the shared movies, in order
+        """
+        shared = self._shared(vertex1, vertex2)
+        if not shared:
+            raise ValueError("The edge does not exist")
+        return array(MOVIE_ID_TYPE, sorted(parse_id(self.vertex_label(movie)) for movie in shared))
+
+    def edge_exists(self, vertex1: Any, vertex2: Any) -> bool:
+        return bool(self._shared(vertex1, vertex2))
+
+    def vertex_exists(self, vertex: Any) -> bool:
+        """
+        If the vertex is an actor with co-stars (load_graph leaves the rest out)
+        :param vertex: the vertex
+        :return: boolean
+        """
+        if not self._is_actor(vertex):
+            return False
+        graph = self.graph
+        return any(len(graph.get_neighbors(movie)) > 1 for movie in graph.get_neighbors(vertex))
+
+    def vertex_label(self, vertex: Any) -> Any:
+        if hasattr(self.graph, "vertex_label"):
+            return self.graph.vertex_label(vertex)
+        return vertex
+
+    def get_vertices(self) -> List[Any]:
+        """
+        Gets the actors with co-stars, found once and kept
+        :return: the vertices
+        """
+        if self._vertices is None:
+            self._vertices = [v for v in self.graph.get_vertices() if self.vertex_exists(v)]
+        return self._vertices
+
+    def num_vertices(self) -> int:
+        return len(self.get_vertices())
+
+    def num_edges(self) -> int:
+        return sum(len(self._costars(v)) for v in self.get_vertices()) // 2
+
+    def print_graph(self) -> None:
+        """
+        Prints the graph
+        """
+        for vertex in self.get_vertices():
+            print("Vertex:", vertex)
+            print("Data:", self.get_vertex_data(vertex))
+            print("Neighbors:", self.get_neighbors(vertex))
+            print("")
@@ -0,0 +1,488 @@
+import hashlib
+from array import array
+from bisect import bisect_left
+from itertools import combinations
+from typing import Optional, Any, List
+
+from metadata import (VertexMetadata, MovieTable, Codes, parse_year, ACTOR, MOVIE, KIND_TYPE, YEAR_TYPE, GENRE_TYPE,
+                      TITLE_TYPE_CODE, NO_YEAR)
+from string_pool import StringPool
+
+INDPTR_TYPE = 'q'
+INDEX_TYPE = 'i'
+
+
+class CSRGraph:
+    """
+    Frozen graph stored in compressed sparse row form.
+
+    Vertices are the integers 0..n-1. The neighbors of vertex v are
+    indices[indptr[v]:indptr[v + 1]], sorted. The data of the edge at position
+    p of indices is edge_items[edge_ptr[p]:edge_ptr[p + 1]], where each item is
+    an index into item_labels (or the item itself when there are no labels).
+    The original vertex keys are kept in labels. The vertex data can be a
+    VertexMetadata, which also knows the kind of every vertex and the movie
+    attributes. The arrays can also be memoryviews over a mapped snapshot
+    file (see snapshot.py).
+    """
+    def __init__(self, indptr: array, indices: array, labels: List[Any], data: List[Any],
+                 edge_ptr: array, edge_items: array, item_labels: Optional[List[Any]]=None):
+        self._indptr = indptr
+        self._indices = indices
+        self._indices_view = memoryview(indices)
+        self._labels = labels
+        self._data = data
+        self._edge_ptr = edge_ptr
+        self._edge_items = edge_items
+        self._edge_items_view = memoryview(edge_items)
+        self._item_labels = item_labels
+        self._index = None
+        self._weights = None
+        self._fingerprint = None
+        # The snapshot file the graph is mapped from (set by snapshot.open_snapshot)
+        self.snapshot_path = None
+
+    def __getstate__(self) -> dict:
+        # The memoryviews and the filtered views (see filters.filtered) are made again
+        state = dict(self.__dict__)
+        for name in ("_indices_view", "_edge_items_view", "_filtered_views"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._indices_view = memoryview(self._indices)
+        self._edge_items_view = memoryview(self._edge_items)
+
+    @classmethod
+    def from_edges(cls, labels: List[Any], data: List[Any], src: array, dst: array,
+                   items: array, item_labels: Optional[List[Any]]=None) -> "CSRGraph":
+        """
+        Builds the graph from an undirected edge list
+        :param labels: the vertex keys, by vertex id
+        :param data: the vertex data, by vertex id
+        :param src: the first vertex id of each edge record
+        :param dst: the second vertex id of each edge record
+        :param items: the edge data item of each record (-1 for none)
+        :param item_labels: the labels of the edge data items
+        :return: a CSRGraph
+        """
+        n = len(labels)
+        degree = array(INDPTR_TYPE, bytes(8 * (n + 1)))
+        for v in src:
+            degree[v + 1] += 1
+        for v in dst:
+            degree[v + 1] += 1
+        for v in range(n):
+            degree[v + 1] += degree[v]
+
+        fill = array(INDPTR_TYPE, degree)
+        row_dst = array(INDEX_TYPE, bytes(4 * degree[n]))
+        row_item = array(INDEX_TYPE, bytes(4 * degree[n]))
+        for u, v, item in zip(src, dst, items):
+            row_dst[fill[u]] = v
+            row_item[fill[u]] = item
+            fill[u] += 1
+            row_dst[fill[v]] = u
+            row_item[fill[v]] = item
+            fill[v] += 1
+        del fill
+
+        indptr = array(INDPTR_TYPE, [0])
+        indices = array(INDEX_TYPE)
+        edge_ptr = array(INDPTR_TYPE, [0])
+        edge_items = array(INDEX_TYPE)
+        for v in range(n):
+            row = sorted(zip(row_dst[degree[v]:degree[v + 1]], row_item[degree[v]:degree[v + 1]]))
+            last = -1
+            last_item = -1
+            for w, item in row:
+                if w != last:
+                    if indices:
+                        # closes the data of the previous edge
+                        edge_ptr.append(len(edge_items))
+                    indices.append(w)
+                    last = w
+                    last_item = -1
+                if item >= 0 and item != last_item:
+                    edge_items.append(item)
+                    last_item = item
+            indptr.append(len(indices))
+        if indices:
+            edge_ptr.append(len(edge_items))
+        return cls(indptr, indices, labels, data, edge_ptr, edge_items, item_labels)
+
+    @classmethod
+    def from_graph(cls, graph) -> "CSRGraph":
+        """
+        Builds a frozen copy of a finished Graph. The edge data must be None or
+        an iterable of hashable items, as the loaders produce. Integer items (the
+        movie numbers of load_graph, as graph.integer_items says) are stored as they
+        are; other items are interned.
+        :param graph: the graph
+        :return: a CSRGraph
+        """
+        labels = list(graph.get_vertices())
+        index = {label: i for i, label in enumerate(labels)}
+        data = [graph.get_vertex_data(label) for label in labels]
+        interner = None if getattr(graph, "integer_items", False) else _Interner()
+        src, dst, items = array(INDEX_TYPE), array(INDEX_TYPE), array(INDEX_TYPE)
+        for u, label in enumerate(labels):
+            for neighbor in graph.get_neighbors(label):
+                v = index[neighbor]
+                if v < u:
+                    continue
+                edge_data = graph.get_edge_data(label, neighbor)
+                for item in (edge_data if edge_data is not None else ()):
+                    src.append(u)
+                    dst.append(v)
+                    items.append(item if interner is None else interner.intern(item))
+                src.append(u)
+                dst.append(v)
+                items.append(-1)
+        return cls.from_edges(labels, data, src, dst, items, None if interner is None else interner.labels)
+
+    @classmethod
+    def from_read_data(cls, movies_by_id, actors_by_movie, actor_names_by_id,
+                       bipartite: bool=False) -> "CSRGraph":
+        """
+        Builds the graph directly from read_data output, without going through Graph.
+        The result matches load_graph (co-star, whose edge data are movie numbers)
+        or load_graph_b (bipartite).
+        :param movies_by_id: the movies data by id as dict
+        :param actors_by_movie: the actors data by movie
+        :param actor_names_by_id: the actors names by their ids
+        :param bipartite: build the actor-movie graph instead of the co-star graph
+        :return: a CSRGraph
+        """
+        from loader import parse_id
+
+        labels, data, index = [], [], {}
+        kinds, years, genres = array(KIND_TYPE), array(YEAR_TYPE), array(GENRE_TYPE)
+        genre_codes, title_type_codes = Codes(), Codes()
+        title_types = array(TITLE_TYPE_CODE)
+
+        def vertex_id(key, name, row=None):
+            if key not in index:
+                index[key] = len(labels)
+                labels.append(key)
+                data.append(name)
+                kinds.append(ACTOR if row is None else MOVIE)
+                years.append(NO_YEAR if row is None else parse_year(row.get('startYear')))
+                genres.append(0 if row is None else genre_codes.genre_mask(row.get('genres')))
+                title_types.append(0 if row is None else title_type_codes.code(row['titleType']))
+            return index[key]
+
+        interner = _Interner()
+        src, dst, items = array(INDEX_TYPE), array(INDEX_TYPE), array(INDEX_TYPE)
+        for movie_id in movies_by_id.keys():
+            movie_title = movies_by_id[movie_id]['primaryTitle']
+            if bipartite:
+                item = interner.intern(" ")
+                for actor in actors_by_movie[movie_id]:
+                    a = vertex_id(actor, actor_names_by_id.get(actor, "ERROR"))
+                    m = vertex_id(movie_id, movie_title, movies_by_id[movie_id])
+                    src.append(a)
+                    dst.append(m)
+                    items.append(item)
+            else:
+                item = parse_id(movie_id)
+                for actor1, actor2 in combinations(actors_by_movie[movie_id], 2):
+                    a1 = vertex_id(actor1, actor_names_by_id.get(actor1, "ERROR"))
+                    a2 = vertex_id(actor2, actor_names_by_id.get(actor2, "ERROR"))
+                    src.append(a1)
+                    dst.append(a2)
+                    items.append(item)
+        if bipartite:
+            metadata = VertexMetadata(kinds, StringPool.from_strings(data), years, genres, title_types,
+                                      genre_codes.labels, title_type_codes.labels)
+        else:
+            metadata = VertexMetadata(kinds, StringPool.from_strings(data),
+                                      movies=MovieTable.from_read_data(movies_by_id))
+        return cls.from_edges(labels, metadata, src, dst, items, interner.labels if bipartite else None)
+
+    @classmethod
+    def from_imdb_data(cls, imdb_data, bipartite: bool=False) -> "CSRGraph":
+        """
+        Builds the graph from read_data_compact output. Vertex labels are the IMDb ids,
+        generated on demand from their numeric parts.
+        :param imdb_data: the IMDbData
+        :param bipartite: build the actor-movie graph instead of the co-star graph
+        :return: a CSRGraph
+        """
+        from loader import IdLabels, MOVIE_TITLE_TYPE
+
+        min_cast = 1 if bipartite else 2
+        cast_ptr = imdb_data.cast_ptr
+        vertex_of = array(INDEX_TYPE, [-1]) * imdb_data.num_actors()
+        numbers = array('q')
+        names = []
+        for m in range(imdb_data.num_movies()):
+            if cast_ptr[m + 1] - cast_ptr[m] < min_cast:
+                continue
+            for a in imdb_data.movie_cast(m):
+                if vertex_of[a] < 0:
+                    vertex_of[a] = len(numbers)
+                    numbers.append(imdb_data.actor_ids[a])
+                    name = imdb_data.actor_names[a]
+                    names.append(name if name is not None else "ERROR")
+        movie_start = len(numbers)
+        years = array(YEAR_TYPE, [NO_YEAR]) * movie_start
+        genres = array(GENRE_TYPE, [0]) * movie_start
+
+        interner = _Interner()
+        src, dst, items = array(INDEX_TYPE), array(INDEX_TYPE), array(INDEX_TYPE)
+        for m in range(imdb_data.num_movies()):
+            if cast_ptr[m + 1] - cast_ptr[m] < min_cast:
+                continue
+            cast = [vertex_of[a] for a in imdb_data.movie_cast(m)]
+            if bipartite:
+                movie = len(numbers)
+                numbers.append(imdb_data.movie_ids[m])
+                names.append(imdb_data.movie_titles[m])
+                years.append(imdb_data.movie_years[m])
+                genres.append(imdb_data.movie_genres[m])
+                item = interner.intern(" ")
+                for actor in cast:
+                    src.append(actor)
+                    dst.append(movie)
+                    items.append(item)
+            else:
+                item = imdb_data.movie_ids[m]
+                for actor1, actor2 in combinations(cast, 2):
+                    src.append(actor1)
+                    dst.append(actor2)
+                    items.append(item)
+        kinds = array(KIND_TYPE, [ACTOR]) * movie_start + array(KIND_TYPE, [MOVIE]) * (len(numbers) - movie_start)
+        if bipartite:
+            metadata = VertexMetadata(kinds, StringPool.from_strings(names), years, genres,
+                                      array(TITLE_TYPE_CODE, [0]) * len(numbers),
+                                      imdb_data.genre_labels, [MOVIE_TITLE_TYPE])
+        else:
+            metadata = VertexMetadata(kinds, StringPool.from_strings(names),
+                                      movies=MovieTable.from_imdb_data(imdb_data))
+        return cls.from_edges(IdLabels(numbers, movie_start), metadata, src, dst, items,
+                              interner.labels if bipartite else None)
+
+    def neighbor_range(self, vertex: int) -> (int, int):
+        """
+        Gets the slice of indices holding the vertex neighbors
+        :param vertex: the vertex id
+        :return: the start and end positions
+        """
+        return self._indptr[vertex], self._indptr[vertex + 1]
+
+    def neighbor_slice(self, vertex: int) -> memoryview:
+        """
+        Gets the vertex neighbors as a read-only view over indices, without copying
+        :param vertex: the vertex id
+        :return: the neighbor ids
+        """
+        return self._indices_view[self._indptr[vertex]:self._indptr[vertex + 1]]
+
+    def get_neighbors(self, vertex: int) -> memoryview:
+        """
+        Get the vertex neighbors
+        :param vertex: the vertex to query
+        :return: the neighbor ids, as a zero-copy view
+        """
+        if self.vertex_exists(vertex):
+            return self.neighbor_slice(vertex)
+        return self._indices_view[0:0]
+
+    def degree(self, vertex: int) -> int:
+        """
+        Gets the number of neighbors of a vertex
+        :param vertex: the vertex id
+        :return: the degree
+        """
+        return self._indptr[vertex + 1] - self._indptr[vertex]
+
+    def get_vertex_data(self, vertex: int) -> Optional[Any]:
+        """
+        Gets vertex associated data
+        :param vertex: the vertex id
+        :return: the vertex data
+        """
+        if self.vertex_exists(vertex):
+            return self._data[vertex]
+        return None
+
+    def _edge_position(self, vertex1: int, vertex2: int) -> int:
+        """
+        Finds the position of an edge in indices
+        :param vertex1: the vertex1 id
+        :param vertex2: the vertex2 id
+        :return: the position, or -1 if the edge does not exist
+        """
+        if not self.vertex_exists(vertex1) or not self.vertex_exists(vertex2):
+            return -1
+        lo, hi = self._indptr[vertex1], self._indptr[vertex1 + 1]
+        pos = bisect_left(self._indices, vertex2, lo, hi)
+        if pos < hi and self._indices[pos] == vertex2:
+            return pos
+        return -1
+
+    def get_edge_data(self, vertex1: int, vertex2: int) -> Any:
+        """
+        Gets the vertexes edge data
+        :param vertex1: the vertex1 id
+        :param vertex2: the vertex2 id
+        :return: the edge data: the set of items, or a view over the item numbers
+        (the movie numbers of a co-star graph) when the items have no labels
+        """
+        pos = self._edge_position(vertex1, vertex2)
+        if pos < 0:
+            raise ValueError("The edge does not exist")
+        items = self._edge_items_view[self._edge_ptr[pos]:self._edge_ptr[pos + 1]]
+        if self._item_labels is None:
+            return items
+        return {self._item_labels[item] for item in items}
+
+    def edge_weights(self) -> memoryview:
+        """
+        Gets the weight of every edge (its number of data items, as functions.weight),
+        aligned with indices. The array is calculated on the first call.
+        :return: the weights
+        """
+        if self._weights is None:
+            edge_ptr = self._edge_ptr
+            self._weights = memoryview(array(INDEX_TYPE, [edge_ptr[p + 1] - edge_ptr[p]
+                                                          for p in range(len(self._indices))]))
+        return self._weights
+
+    def vertex_exists(self, vertex: int) -> bool:
+        """
+        If contains a vertex
+        :param vertex: the vertex id
+        :return: boolean
+        """
+        return isinstance(vertex, int) and 0 <= vertex < len(self._labels)
+
+    def edge_exists(self, vertex1: int, vertex2: int) -> bool:
+        """
+        If contains an edge
+        :param vertex1: the vertex1 id
+        :param vertex2: the vertex2 id
+        :return: boolean
+        """
+        return self._edge_position(vertex1, vertex2) >= 0
+
+    def get_vertices(self) -> range:
+        return range(len(self._labels))
+
+    def num_vertices(self) -> int:
+        return len(self._labels)
+
+    def num_edges(self) -> int:
+        return len(self._indices) // 2
+
+    def fingerprint(self) -> str:
+        """
+        Digest of the structure of the graph (its rows and edge items), for the indexes
+        saved to disk to tell they were built from this same graph. It is calculated
+        on the first call.
+        :return: the hex digest
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            for values in (self._indptr, self._indices, self._edge_ptr, self._edge_items):
+                digest.update(memoryview(values).cast('B'))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def vertex_label(self, vertex: int) -> Any:
+        """
+        Gets the original key of a vertex
+        :param vertex: the vertex id
+        :return: the vertex key (e.g. an IMDb id)
+        """
+        return self._labels[vertex]
+
+    def vertex_id(self, label: Any) -> Optional[int]:
+        """
+        Gets the vertex id of an original key
+        :param label: the vertex key (e.g. an IMDb id)
+        :return: the vertex id, or None if the key is not in the graph
+        """
+        if hasattr(self._labels, "lookup"):
+            return self._labels.lookup(label)
+        if self._index is None:
+            self._index = {key: i for i, key in enumerate(self._labels)}
+        return self._index.get(label)
+
+    @property
+    def indptr(self) -> array:
+        return self._indptr
+
+    @property
+    def indices(self) -> array:
+        return self._indices
+
+    @property
+    def labels(self):
+        return self._labels
+
+    @property
+    def vertex_data(self):
+        return self._data
+
+    @property
+    def metadata(self) -> Optional[VertexMetadata]:
+        """
+        The columnar vertex data, if the graph was built with it
+        """
+        return self._data if isinstance(self._data, VertexMetadata) else None
+
+    @property
+    def movies(self) -> Optional[MovieTable]:
+        """
+        The attributes of the movies of the edge data, for a co-star graph built with them
+        """
+        metadata = self.metadata
+        return metadata.movies if metadata is not None else None
+
+    @property
+    def edge_ptr(self) -> array:
+        return self._edge_ptr
+
+    @property
+    def edge_items(self) -> array:
+        return self._edge_items
+
+    @property
+    def item_labels(self) -> Optional[List[Any]]:
+        return self._item_labels
+
+    @property
+    def integer_items(self) -> bool:
+        """
+        If the edge data items are the integers themselves (the movie numbers of a
+        co-star graph) rather than indices into item_labels
+        """
+        return self._item_labels is None
+
+    def print_graph(self) -> None:
+        """
+        Prints the graph
+        """
+        for vertex in self.get_vertices():
+            print("Vertex:", vertex, self._labels[vertex])
+            print("Data:", self._data[vertex])
+            print("Neighbors:", list(self.neighbor_slice(vertex)))
+            print("")
+
+
+class _Interner:
+    """
+    Maps hashable items to dense integer ids
+    """
+    def __init__(self):
+        self.ids = {}
+        self.labels = []
+
+    def intern(self, item: Any) -> int:
+        if item not in self.ids:
+            self.ids[item] = len(self.labels)
+            self.labels.append(item)
+        return self.ids[item]
@@ -0,0 +1,72 @@
+from functions import bfs, is_actor
+
+
+def _farthest(dist, targets):
+    """
+    Finds the farthest target in a BFS result
+    :param dist: the distances from the BFS source
+    :param targets: the target predicate, or None for every vertex
+    :return: the distance and the target vertex
+    """
+    best, farthest = -1, None
+    for vertex, d in dist.items():
+        if d > best and (targets is None or targets(vertex)):
+            best, farthest = d, vertex
+    return best, farthest
+
+
+def exact_diameter (graph, component, bipartite = False):
+    """
+    Calculates the exact diameter of a connected component with iFUB: a double
+    sweep gives a lower bound and a central root, then the vertices are taken
+    by decreasing distance from the root until no remaining pair can beat the
+    lower bound. On small-world graphs this needs few BFS runs.
+    :param graph: the graph
+    :param component: the vertices of the component
+    :param bipartite: the graph is the actor-movie graph; only actor pairs count and
+    the hops are halved as in sep_rate
+    :return: the diameter, a pair of vertices that realise it and the number of BFS runs
+    """
+    targets = (lambda v: is_actor(graph, v)) if bipartite else None
+    runs = 0
+
+    # Double sweep from the highest degree vertex
+    start = max(component, key=lambda v: len(graph.get_neighbors(v)))
+    dist = bfs(graph, start)
+    runs += 1
+    _, a = _farthest(dist, targets)
+    if a is None:
+        return -1, None, runs
+    dist_a = bfs(graph, a)
+    runs += 1
+    lower, b = _farthest(dist_a, targets)
+    endpoints = (a, b)
+    dist_b = bfs(graph, b)
+    runs += 1
+    ecc_b, c = _farthest(dist_b, targets)
+    if ecc_b > lower:
+        lower, endpoints = ecc_b, (b, c)
+
+    # The root is the middle of the a-b path
+    half = dist_a[b] // 2
+    root = next(v for v, d in dist_a.items() if d == half and d + dist_b[v] == dist_a[b])
+    dist_root = bfs(graph, root)
+    runs += 1
+    levels = {}
+    for vertex, d in dist_root.items():
+        if targets is None or targets(vertex):
+            levels.setdefault(d, []).append(vertex)
+
+    # Pairs with both ends within level i of the root are at most 2 * i apart
+    level = max(levels.keys())
+    while level > 0 and lower < 2 * level:
+        for vertex in levels.get(level, ()):
+            ecc, farthest = _farthest(bfs(graph, vertex), targets)
+            runs += 1
+            if ecc > lower:
+                lower, endpoints = ecc, (vertex, farthest)
+        level -= 1
+
+    if bipartite:
+        return int(lower / 2), endpoints, runs
+    return lower, endpoints, runs
@@ -0,0 +1,273 @@
+from array import array
+from collections import OrderedDict
+from itertools import accumulate, compress
+from operator import lt
+from typing import Any, Iterable, List, Optional
+
+from loader import MOVIE_PREFIX
+from metadata import MOVIE, NO_YEAR
+
+VIEW_CACHE_SIZE = 8
+
+
+class MovieFilter:
+    """
+    Condition on the movies of a traversal: at least one of some genres (or all
+    of them), none of other genres, and a range of start years. Movies with an
+    unknown year fail any year bound.
+    """
+    def __init__(self, genres: Iterable[str]=(), all_genres: bool=False, exclude: Iterable[str]=(),
+                 min_year: Optional[int]=None, max_year: Optional[int]=None):
+        self.genres = tuple(genres)
+        self.all_genres = all_genres
+        self.exclude = tuple(exclude)
+        self.min_year = min_year
+        self.max_year = max_year
+
+    def _key(self) -> tuple:
+        return self.genres, self.all_genres, self.exclude, self.min_year, self.max_year
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, MovieFilter) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return "MovieFilter(genres=%r, all_genres=%r, exclude=%r, min_year=%r, max_year=%r)" % (
+            self.genres, self.all_genres, self.exclude, self.min_year, self.max_year)
+
+    def compile(self, genre_labels: List[str]):
+        """
+        Turns the condition into a test over the year and genre bitmask columns
+        :param genre_labels: the genre of each bit of the masks
+        :return: a function of (year, genre mask) to boolean
+        """
+        bits = {label: 1 << bit for bit, label in enumerate(genre_labels)}
+        wanted = 0
+        for genre in self.genres:
+            if genre not in bits and self.all_genres:
+                # No movie has every genre
+                return lambda year, mask: False
+            wanted |= bits.get(genre, 0)
+        if self.genres and not wanted:
+            return lambda year, mask: False
+        excluded = 0
+        for genre in self.exclude:
+            excluded |= bits.get(genre, 0)
+        check_genres = bool(self.genres)
+        all_genres = self.all_genres
+        check_years = self.min_year is not None or self.max_year is not None
+        low = self.min_year if self.min_year is not None else -1
+        high = self.max_year if self.max_year is not None else 1 << 16
+
+        def accepts(year: int, mask: int) -> bool:
+            if check_genres and (mask & wanted != wanted if all_genres else not mask & wanted):
+                return False
+            if mask & excluded:
+                return False
+            if check_years and (year == NO_YEAR or not low <= year <= high):
+                return False
+            return True
+        return accepts
+
+
+class FilteredGraph:
+    """
+    View of a graph with only the movies a MovieFilter accepts, without copying
+    the graph: the filter is evaluated once for every movie when the view is made,
+    into a flag per movie, and the neighbors are filtered as a traversal asks for them.
+
+    In an actor-movie graph the rejected movies disappear as vertices; they are
+    tested on the metadata columns of a CSRGraph or, for a Graph, on its MovieTable.
+    In a co-star graph an edge keeps only its accepted movies and disappears
+    when none is left, tested on the MovieTable of the graph. On a CSRGraph the
+    flags are also laid out by edge position, so a row is filtered in one pass
+    over its slice. A view can be given to the traversals in place of its graph,
+    to reuse it for many queries (filtered also keeps the last views made).
+    """
+    def __init__(self, graph, movie_filter: MovieFilter):
+        self.graph = graph
+        self.movie_filter = movie_filter
+        self._source_version = _version(graph)
+        self._accepted = {}
+        self._edge_ok = None
+        self._vertex_ok = None
+        metadata = getattr(graph, "metadata", None)
+        self._columns = metadata if metadata is not None and metadata.genres is not None else None
+        self._movies = getattr(graph, "movies", None)
+        if self._columns is not None:
+            accepts = movie_filter.compile(metadata.genre_labels)
+            columns = self._columns
+            self._by_edges = False
+            self._vertex_ok = bytearray(kind != MOVIE or accepts(year, genres)
+                                        for kind, year, genres in zip(columns.kinds, columns.years, columns.genres))
+            if hasattr(graph, "indices"):
+                self._edge_ok = bytearray(map(self._vertex_ok.__getitem__, graph.indices))
+        else:
+            if self._movies is None:
+                raise ValueError("The graph has no movie attributes to filter by")
+            accepts = movie_filter.compile(self._movies.genre_labels)
+            self._by_edges = getattr(graph, "integer_items", False)
+            self._movie_ok = bytearray(map(accepts, self._movies.years, self._movies.genres))
+            if self._by_edges and hasattr(graph, "edge_items"):
+                self._edge_ok = self._edges_accepted()
+        if self._edge_ok is not None:
+            self._edge_ok = memoryview(self._edge_ok)
+            self._indptr = graph.indptr
+            self._indices = memoryview(graph.indices)
+            self._num_vertices = graph.num_vertices()
+
+    def _edges_accepted(self) -> bytearray:
+        """
+        Flags the edges of a CSR co-star graph with at least one accepted movie: a
+        running count of the accepted items, read at the edge boundaries
+        """
+        graph, movies = self.graph, self._movies
+        accepted = {number for number, ok in zip(movies.numbers, self._movie_ok) if ok}
+        counts = array('q', [0])
+        counts.extend(accumulate(map(accepted.__contains__, graph.edge_items)))
+        at_edges = array('q', map(counts.__getitem__, graph.edge_ptr))
+        return bytearray(map(lt, memoryview(at_edges)[:-1], memoryview(at_edges)[1:]))
+
+    def _movie_number_accepted(self, number: int) -> bool:
+        accepted = self._accepted.get(number)
+        if accepted is None:
+            i = self._movies.position(number)
+            accepted = self._accepted[number] = i >= 0 and bool(self._movie_ok[i])
+        return accepted
+
+    def _vertex_accepted(self, vertex: Any) -> bool:
+        """
+        Checks if a vertex of an actor-movie graph is in the view (actors always are)
+        """
+        if self._columns is not None:
+            return bool(self._vertex_ok[vertex])
+        if vertex[:2] != MOVIE_PREFIX:
+            return True
+        return self._movie_number_accepted(int(vertex[2:]))
+
+    def get_neighbors(self, vertex: Any) -> List[Any]:
+        """
+        Gets the neighbors of a vertex in the view
+        :param vertex: the vertex
+        :return: the accepted neighbors
+        """
+        edge_ok = self._edge_ok
+        if edge_ok is not None:
+            # A CSRGraph row, filtered in one pass over its flags
+            if (type(vertex) is not int or not 0 <= vertex < self._num_vertices
+                    or (self._vertex_ok is not None and not self._vertex_ok[vertex])):
+                return []
+            first, last = self._indptr[vertex], self._indptr[vertex + 1]
+            return list(compress(self._indices[first:last], edge_ok[first:last]))
+        if not self.vertex_exists(vertex):
+            return []
+        graph = self.graph
+        if not self._by_edges:
+            return [w for w in graph.get_neighbors(vertex) if self._vertex_accepted(w)]
+        accepted = self._movie_number_accepted
+        return [w for w in graph.get_neighbors(vertex)
+                if any(accepted(m) for m in graph.get_edge_data(vertex, w))]
+
+    def get_edge_data(self, vertex1: Any, vertex2: Any) -> Any:
+        """
+        Gets the data of an edge of the view
+        :param vertex1: the first vertex
+        :param vertex2: the second vertex
+        :return: the edge data; in a co-star graph, only the accepted movie numbers
+        """
+        if not self.edge_exists(vertex1, vertex2):
+            raise ValueError("The edge does not exist")
+        data = self.graph.get_edge_data(vertex1, vertex2)
+        if not self._by_edges:
+            return data
+        return [m for m in data if self._movie_number_accepted(m)]
+
+    def edge_exists(self, vertex1: Any, vertex2: Any) -> bool:
+        if not (self.vertex_exists(vertex1) and self.vertex_exists(vertex2)
+                and self.graph.edge_exists(vertex1, vertex2)):
+            return False
+        if not self._by_edges:
+            return True
+        return any(self._movie_number_accepted(m) for m in self.graph.get_edge_data(vertex1, vertex2))
+
+    def vertex_exists(self, vertex: Any) -> bool:
+        if not self.graph.vertex_exists(vertex):
+            return False
+        return self._by_edges or self._vertex_accepted(vertex)
+
+    def get_vertex_data(self, vertex: Any) -> Optional[Any]:
+        return self.graph.get_vertex_data(vertex) if self.vertex_exists(vertex) else None
+
+    def get_vertices(self) -> List[Any]:
+        """
+        Gets the vertices of the view (all of them for a co-star graph, that filters edges)
+        :return: the vertices
+        """
+        if self._by_edges:
+            return self.graph.get_vertices()
+        return [v for v in self.graph.get_vertices() if self._vertex_accepted(v)]
+
+    def vertex_label(self, vertex: Any) -> Any:
+        if hasattr(self.graph, "vertex_label"):
+            return self.graph.vertex_label(vertex)
+        return vertex
+
+    @property
+    def metadata(self):
+        return getattr(self.graph, "metadata", None)
+
+    @property
+    def movies(self):
+        return getattr(self.graph, "movies", None)
+
+    def print_graph(self) -> None:
+        """
+        Prints the graph
+        """
+        for vertex in self.get_vertices():
+            print("Vertex:", vertex)
+            print("Data:", self.get_vertex_data(vertex))
+            print("Neighbors:", self.get_neighbors(vertex))
+            print("")
+
+
+def _version(graph) -> tuple:
+    """
+    Identifies the state of a graph a view is made from: its version and its movies
+    """
+    movies = getattr(graph, "movies", None)
+    return getattr(graph, "version", 0), id(movies), getattr(movies, "version", 0)
+
+
+def filtered (graph, movie_filter: Optional[MovieFilter]):
+    """
+    Gets the view of a graph for a filter. The last VIEW_CACHE_SIZE views are kept
+    on the graph, so repeated queries with the same filter do not evaluate it again,
+    until the graph or its movies change.
+    :param graph: the graph (or a view of it for the same filter)
+    :param movie_filter: the MovieFilter, None for no filter
+    :return: the graph itself without a filter, else a FilteredGraph
+    """
+    if movie_filter is None:
+        return graph
+    if isinstance(graph, FilteredGraph) and graph.movie_filter == movie_filter:
+        return graph
+    views = getattr(graph, "_filtered_views", None)
+    if views is None:
+        views = OrderedDict()
+        try:
+            graph._filtered_views = views
+        except AttributeError:
+            # A graph that takes no attributes gets a new view every time
+            return FilteredGraph(graph, movie_filter)
+    view = views.get(movie_filter)
+    if view is not None and view._source_version == _version(graph):
+        views.move_to_end(movie_filter)
+        return view
+    view = views[movie_filter] = FilteredGraph(graph, movie_filter)
+    views.move_to_end(movie_filter)
+    if len(views) > VIEW_CACHE_SIZE:
+        views.popitem(last=False)
+    return view
@@ -1,43 +1,60 @@
 import csv
 import heapq
 from heapdict import heapdict
+from indexed_heap import IndexedHeap
 from collections import deque
+import instrumentation
+from filters import filtered
+from loader import format_id, MOVIE_PREFIX
 
 MOVIE_TITLE_TYPE = "movie"
-MOVIE_COLUMNS = ["tconst", "titleType", "primaryTitle"]
+MOVIE_COLUMNS = ["tconst", "titleType", "primaryTitle", "startYear", "genres"]
 PRINCIPALS_COLUMNS = ["nconst", "category"]
 MOVIES_DATA_PATH = "./datasets/title-basics-f.tsv"
 ACTORS_DATA_PATH = "./datasets/title-principals-f.tsv"
 ACTORS_NAMES_PATH = "./datasets/name-basics-f.tsv"
 
 
+@instrumentation.phase("read_data")
 def read_data(movies_file, actors_file, actors_name_file):
     print("Reading data")
+    metrics = instrumentation.active()
     movies_by_id = {}
-    with open(movies_file, "r", newline="", encoding="utf-8") as file1:
+    with instrumentation.phase("read_data.movies"), \
+            open(movies_file, "r", newline="", encoding="utf-8") as file1:
         reader = csv.DictReader(file1, delimiter="\t")
         for row in reader:
             if row["titleType"] == MOVIE_TITLE_TYPE:
-                movies_by_id[row['tconst']] = row
+                # Only the used columns, not the whole row
+                movies_by_id[row['tconst']] = {column: row.get(column) for column in MOVIE_COLUMNS}
+        if metrics is not None:
+            metrics.count("read_data.movie_rows", max(reader.line_num - 1, 0))
 
     actors_ids = set()
     actors_by_movie = {m: set() for m in movies_by_id.keys()}
-    with open(actors_file, "r", newline="", encoding="utf-8") as file2:
+    with instrumentation.phase("read_data.principals"), \
+            open(actors_file, "r", newline="", encoding="utf-8") as file2:
         reader = csv.DictReader(file2, delimiter="\t")
         for row in reader:
             if row["tconst"] in actors_by_movie:
                 actors_by_movie[row["tconst"]].update([row["nconst"]])
                 actors_ids.update([row["nconst"]])
+        if metrics is not None:
+            metrics.count("read_data.principal_rows", max(reader.line_num - 1, 0))
 
     actor_names_by_id = {}
-    with open(actors_name_file, "r", newline="", encoding="utf-8") as file2:
+    with instrumentation.phase("read_data.names"), \
+            open(actors_name_file, "r", newline="", encoding="utf-8") as file2:
         reader = csv.DictReader(file2, delimiter="\t")
         for row in reader:
             if row["nconst"] in actors_ids:
                 actor_names_by_id[row["nconst"]] = row["primaryName"]
+        if metrics is not None:
+            metrics.count("read_data.name_rows", max(reader.line_num - 1, 0))
 
     return movies_by_id, actors_by_movie, actor_names_by_id
 
+@instrumentation.phase("dfs")
 def dfs (graph, start_vertx, end_vertx = None):
     """
     Depth First Search
@@ -47,50 +64,157 @@ def dfs (graph, start_vertx, end_vertx = None):
     """
     visited = set()
     stack = [start_vertx]
+    scanned = 0
     while stack:
         v = stack.pop()
         if v == end_vertx:
+            _dfs_metrics(start_vertx, visited, scanned)
             return visited
-        for w in graph.get_neighbors(v):
+        neighbors = graph.get_neighbors(v)
+        scanned += len(neighbors)
+        for w in neighbors:
             if w not in visited:
                 visited.add(w)
                 stack.append(w)
 
+    _dfs_metrics(start_vertx, visited, scanned)
     return visited
 
+def _dfs_metrics (start_vertx, visited, scanned):
+    """
+    Counts, once a dfs is over, the visited vertices (the start is only marked
+    visited if a neighbor reaches it back) and the edges scanned by the loop
+    """
+    metrics = instrumentation.active()
+    if metrics is None:
+        return
+    metrics.count("dfs.vertices_visited", len(visited) + (start_vertx not in visited))
+    metrics.count("dfs.edges_scanned", scanned)
+
 
 
-def bfs (graph, start_vertex, end_vertex = None):
+@instrumentation.phase("bfs")
+def bfs (graph, start_vertex, end_vertex = None, movie_filter = None):
     """
     Breadth First Search
     :param graph: the graph
     :param start_vertex: the starting vertex
+    :param movie_filter: a filters.MovieFilter, to go only through the movies it accepts
     :return: the distance from the starting vertex to the others
     """
+    graph = filtered(graph, movie_filter)
     dist = {}
     visited = set()
     dist [start_vertex] = 0
     queue = deque([start_vertex])
     visited.add(start_vertex)
+    scanned = 0
     while queue:
         v = queue.popleft()
         if v == end_vertex:
+            _bfs_metrics(dist, scanned)
             return dist
-        for w in graph.get_neighbors(v):
+        neighbors = graph.get_neighbors(v)
+        scanned += len(neighbors)
+        for w in neighbors:
             if w not in visited:
                 visited.add(w)
                 dist[w] = dist[v] + 1
                 queue.append(w)
 
+    _bfs_metrics(dist, scanned)
     return dist
 
-def connected (vertices, graph):
+def _bfs_metrics (dist, scanned):
+    """
+    Counts, once a bfs is over, the visited vertices, the edges scanned by the loop and
+    the size of every level
+    """
+    metrics = instrumentation.active()
+    if metrics is None:
+        return
+    metrics.count("bfs.vertices_visited", len(dist))
+    metrics.count("bfs.edges_scanned", scanned)
+    metrics.add_series("bfs.frontier", instrumentation.level_sizes(dist))
+
+def bidirectional_bfs (graph, start_vertex, end_vertex, path = False):
+    """
+    Bidirectional Breadth First Search between two vertices. Grows a frontier
+    from each end, one whole level at a time, always expanding the smaller one,
+    and stops at the level where they meet
+    :param graph: the graph
+    :param start_vertex: the starting vertex
+    :param end_vertex: the ending vertex
+    :param path: also return the vertices of a shortest path
+    :return: the distance between the vertices (-1 if there is no path), and the path if asked
+    """
+    if not graph.vertex_exists(start_vertex) or not graph.vertex_exists(end_vertex):
+        return (-1, None) if path else -1
+    if start_vertex == end_vertex:
+        return (0, [start_vertex]) if path else 0
+
+    dist_f, dist_b = {start_vertex: 0}, {end_vertex: 0}
+    prev_f, prev_b = {start_vertex: None}, {end_vertex: None}
+    frontier_f, frontier_b = [start_vertex], [end_vertex]
+    best, meeting = -1, None
+    while frontier_f and frontier_b and best == -1:
+        forward = len(frontier_f) <= len(frontier_b)
+        if forward:
+            frontier, dist, prev, other = frontier_f, dist_f, prev_f, dist_b
+        else:
+            frontier, dist, prev, other = frontier_b, dist_b, prev_b, dist_f
+        next_frontier = []
+        for v in frontier:
+            d = dist[v] + 1
+            for w in graph.get_neighbors(v):
+                if w in dist:
+                    continue
+                dist[w] = d
+                prev[w] = v
+                next_frontier.append(w)
+                if w in other and (best == -1 or d + other[w] < best):
+                    best = d + other[w]
+                    meeting = w
+        if forward:
+            frontier_f = next_frontier
+        else:
+            frontier_b = next_frontier
+
+    if not path:
+        return best
+    if best == -1:
+        return -1, None
+    vertices = []
+    v = meeting
+    while v is not None:
+        vertices.append(v)
+        v = prev_f[v]
+    vertices.reverse()
+    v = prev_b[meeting]
+    while v is not None:
+        vertices.append(v)
+        v = prev_b[v]
+    return best, vertices
+
+@instrumentation.phase("connected")
+def connected (vertices, graph, components = None, movie_filter = None):
     """
     Finds the connected components
     :param vertices: the vertices
     :param graph: the graph
+    :param components: a prebuilt ComponentIndex, read instead of walking the graph for
+    the components of the vertices (ignored with a filter, as it holds the components of
+    the whole graph)
+    :param movie_filter: a filters.MovieFilter, to go only through the movies it accepts
+    (the vertices left without neighbors are left out, as a graph loaded only from the
+    accepted movies would not have them)
     :return: the connected components (dictionary) and the connected components list
     """
+    if movie_filter is not None:
+        graph = filtered(graph, movie_filter)
+        vertices = [v for v in vertices if len(graph.get_neighbors(v))]
+    elif components is not None:
+        return components.as_connected(vertices)
     visited = set()
     connected_comp = {}
     connected_comp_list = []
@@ -103,8 +227,27 @@ def connected (vertices, graph):
                 connected_comp[v] = cont
             visited.update(vis)
             cont += 1
+    metrics = instrumentation.active()
+    if metrics is not None:
+        metrics.count("connected.components", len(connected_comp_list))
+        metrics.count("connected.vertices", len(connected_comp))
     return connected_comp, connected_comp_list
 
+def is_actor (graph, vertex):
+    """
+    Checks if a vertex is an actor: its kind in the graph metadata or, without
+    it, if its IMDb id starts with nm
+    :param graph: the graph
+    :param vertex: the vertex
+    :return: boolean
+    """
+    metadata = getattr(graph, "metadata", None)
+    if metadata is not None:
+        return metadata.is_actor(vertex)
+    if hasattr(graph, "vertex_label"):
+        vertex = graph.vertex_label(vertex)
+    return vertex[0] == 'n'
+
 def weight (v, w, graph):
     """
     Calculates the weight of an edge
@@ -115,24 +258,31 @@ def weight (v, w, graph):
     """
     return len(graph.get_edge_data(v, w))
 
-def find_component (graph, vertex):
+def find_component (graph, vertex, components = None):
     """
     Finds the connected component of a vertex
     :param graph: the graph
     :param vertex: the vertex
+    :param components: a prebuilt ComponentIndex, read instead of walking the graph
     :return: the component list
     """
     if not graph.vertex_exists(vertex):
         return None
+    if components is not None:
+        return components.members(components.component_of(vertex))
     component = dfs(graph, vertex)
     return component
 
-def dijkstra_heapdict(graph, start):
-    component = find_component(graph, start)
+@instrumentation.phase("dijkstra_heapdict")
+def dijkstra_heapdict(graph, start, components = None):
+    component = find_component(graph, start, components)
     distances = {vertex: float('inf') for vertex in component}
     previous_vertices = {vertex: None for vertex in component}
     distances[start] = 0
     queue = heapdict({start: 0})
+    pushes = 1
+    decrease_keys = 0
+    scanned = 0
 
     while queue:
         current_vertex, current_distance = queue.popitem()
@@ -141,6 +291,7 @@ def dijkstra_heapdict(graph, start):
             continue
 
         neighbors = graph.get_neighbors(current_vertex)
+        scanned += len(neighbors)
         for neighbor in neighbors:
             weight = len(graph.get_edge_data(current_vertex, neighbor))
             distance = current_distance + weight
@@ -148,23 +299,85 @@ def dijkstra_heapdict(graph, start):
             if distance < distances[neighbor]:
                 distances[neighbor] = distance
                 previous_vertices[neighbor] = current_vertex
+                # A key still in the heapdict is lowered in place, else it is pushed
+                if neighbor in queue:
+                    decrease_keys += 1
+                else:
+                    pushes += 1
                 queue[neighbor] = distance
 
+    metrics = instrumentation.active()
+    if metrics is not None:
+        # The heap is emptied, so every push is popped
+        reached = [v for v, d in distances.items() if d != float('inf')]
+        metrics.count("dijkstra_heapdict.vertices_visited", len(reached))
+        metrics.count("dijkstra_heapdict.edges_scanned", scanned)
+        metrics.count("dijkstra_heapdict.heap_pushes", pushes)
+        metrics.count("dijkstra_heapdict.heap_pops", pushes)
+        metrics.count("dijkstra_heapdict.decrease_keys", decrease_keys)
+    return distances, previous_vertices
+
+def dijkstra_indexed (graph, start, components = None):
+    """
+    Dijkstra algorithm with an IndexedHeap built at once over the component, every
+    relaxation lowering the key of its vertex in place. A CSRGraph uses an integer
+    keyed heap and its precomputed edge_weights.
+    :param graph: the graph
+    :param start: the starting vertex
+    :param components: a prebuilt ComponentIndex, to avoid walking the component first
+    :return: the distance from the starting vertex to the others (inf if the vertex is not
+    in the component) and the previous vertex, as dijkstra_heapdict
+    """
+    component = find_component(graph, start, components)
+    distances = {vertex: float('inf') for vertex in component}
+    previous_vertices = {vertex: None for vertex in component}
+    distances[start] = 0
+    if hasattr(graph, "edge_weights"):
+        weights = graph.edge_weights()
+        def edges(v):
+            first, last = graph.neighbor_range(v)
+            return zip(graph.neighbor_slice(v), weights[first:last])
+        capacity = graph.num_vertices()
+    else:
+        def edges(v):
+            return ((w, weight(v, w, graph)) for w in graph.get_neighbors(v))
+        capacity = None
+    queue = IndexedHeap.heapify(distances.keys(), distances.values(), capacity=capacity)
+
+    while queue:
+        current_vertex, current_distance = queue.popitem()
+        if current_distance == float('inf'):
+            break
+        for neighbor, edge_weight in edges(current_vertex):
+            distance = current_distance + edge_weight
+            if distance < distances[neighbor]:
+                distances[neighbor] = distance
+                previous_vertices[neighbor] = current_vertex
+                queue.decrease_key(neighbor, distance)
+
     return distances, previous_vertices
 
-def dijkstra (graph, vertex):
+@instrumentation.phase("dijkstra")
+def dijkstra (graph, vertex, components = None, movie_filter = None):
     """
     Dijkstra algorithm
     :param graph: the graph
     :param vertex: the starting vertex
+    :param components: a prebuilt ComponentIndex, to avoid walking the component first
+    (ignored with a filter)
+    :param movie_filter: a filters.MovieFilter, to go only through the movies it accepts
+    (the weight of a co-star edge counts only its accepted movies)
     :return: the distance from the starting vertex to the others and the previous vertex
     """
+    if movie_filter is not None:
+        graph = filtered(graph, movie_filter)
+        components = None
     visited = set()
     dist = {}
     prev = {}
     dist[vertex] = 0
     prev[vertex] = None
-    for v in find_component(graph, vertex):
+    for v in find_component(graph, vertex, components):
         if (v == vertex):
             continue
         dist[v] = float('inf')
@@ -173,51 +386,148 @@ def dijkstra (graph, vertex):
     q = []
     heapq.heapify(q)
     heapq.heappush(q, [dist[vertex], vertex])
+    pushes = 1
+    scanned = 0
     while q:
         v = heapq.heappop(q)[1]
         if v in visited:
             continue
-        for neigh in graph.get_neighbors(v):
+        neighbors = graph.get_neighbors(v)
+        scanned += len(neighbors)
+        for neigh in neighbors:
             newdist = dist[v] + weight(v, neigh, graph)
             if newdist < dist[neigh]:
                 dist[neigh] = newdist
                 prev[neigh] = v
                 heapq.heappush(q, [dist[neigh], neigh])
+                pushes += 1
         visited.add(v)
 
+    metrics = instrumentation.active()
+    if metrics is not None:
+        # The heap is emptied, so every push is popped
+        metrics.count("dijkstra.vertices_visited", len(visited))
+        metrics.count("dijkstra.edges_scanned", scanned)
+        metrics.count("dijkstra.heap_pushes", pushes)
+        metrics.count("dijkstra.heap_pops", pushes)
     return dist, prev
 
-def put_names (a_set, graph):
+def dijkstra_buckets (graph, vertex, target = None, radius = None):
+    """
+    Dijkstra algorithm with a bucket queue (Dial), for the small integer weights of
+    the movie-count edges. On a CSRGraph the weights come precomputed from edge_weights.
+    Vertices with the same distance are settled in increasing order, so the result is
+    the same as dijkstra's.
+    :param graph: the graph
+    :param vertex: the starting vertex
+    :param target: stop as soon as this vertex is settled
+    :param radius: do not settle vertices farther than this distance
+    :return: the distance from the starting vertex to the others and the previous vertex
+    (only the settled vertices if the search stopped early)
+    """
+    if hasattr(graph, "edge_weights"):
+        weights = graph.edge_weights()
+        def edges(v):
+            start, end = graph.neighbor_range(v)
+            return zip(graph.neighbor_slice(v), weights[start:end])
+    else:
+        def edges(v):
+            return ((w, weight(v, w, graph)) for w in graph.get_neighbors(v))
+
+    dist = {vertex: 0}
+    prev = {vertex: None}
+    settled = set()
+    buckets = {0: [vertex]}
+    pending = 1
+    d = 0
+    while pending:
+        bucket = buckets.pop(d, None)
+        if bucket is None:
+            d += 1
+            continue
+        pending -= len(bucket)
+        if radius is not None and d > radius:
+            break
+        bucket.sort()
+        for v in bucket:
+            if v in settled or dist[v] != d:
+                continue
+            settled.add(v)
+            if v == target:
+                pending = 0
+                break
+            for neigh, w in edges(v):
+                newdist = d + w
+                if newdist < dist.get(neigh, newdist + 1):
+                    dist[neigh] = newdist
+                    prev[neigh] = v
+                    buckets.setdefault(newdist, []).append(neigh)
+                    pending += 1
+        d += 1
+
+    if len(settled) < len(dist):
+        dist = {v: dist[v] for v in settled}
+        prev = {v: prev[v] for v in settled}
+    return dist, prev
+
+def put_names (a_set, graph, index = None):
     """
     Puts the names of the actors in a list
     :param a_set: the set of actors by id
     :param graph: the graph
+    :param index: a NameIndex of the graph, to resolve all the names at once
     :return: the list of actors
     """
+    if index is not None:
+        return index.names(a_set)
+    metadata = getattr(graph, "metadata", None)
+    if metadata is not None:
+        return [metadata.name(id) for id in a_set]
     new_list = []
     a_set = list(a_set)
     for id in a_set:
         new_list.append(graph.get_vertex_data(id))
     return new_list
 
-def put_names_dict (dict, graph):
+def put_titles (movie_numbers, movies_by_id):
+    """
+    Puts the titles of the movies of a co-star edge in a list
+    :param movie_numbers: the edge data (numbers of the movie ids)
+    :param movies_by_id: the movies data by id as dict
+    :return: the list of titles
+    """
+    return [movies_by_id[format_id(MOVIE_PREFIX, number)]['primaryTitle'] for number in movie_numbers]
+
+def put_names_dict (dict, graph, index = None):
     """
     Puts the names of the actors in a dictionary
     :param dict: the dictionary of actors by id
     :param graph: the graph
+    :param index: a NameIndex of the graph, to resolve all the names at once
     :return: the list of actors
     """
+    if index is not None:
+        return index.names_dict(dict)
+    metadata = getattr(graph, "metadata", None)
+    if metadata is not None:
+        return {metadata.name(id): value for id, value in dict.items()}
     new_dict = {}
     for id, value in dict.items():
         new_dict[graph.get_vertex_data(id)] = value
     return new_dict
 
-def put_names_prev (dict, graph):
+def put_names_prev (dict, graph, index = None):
     """
     Puts the names of the actors in a dictionary
     :param dict: the dictionary of actors by id
     :param graph: the graph
+    :param index: a NameIndex of the graph, to resolve all the names at once
     :return: the dictionary of actors"""
+    if index is not None:
+        return {name: index.name(value) for name, value in zip(index.names(dict.keys()), dict.values())}
+    metadata = getattr(graph, "metadata", None)
+    if metadata is not None:
+        return {metadata.name(id): metadata.name(value) for id, value in dict.items()}
     new_dict = {}
     for id, value in dict.items():
         new_dict[graph.get_vertex_data(id)] = graph.get_vertex_data(value)
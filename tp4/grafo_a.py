@@ -1,37 +1,87 @@
 from graph import Graph
 import csv
+from array import array
 from itertools import combinations
 from functions import *
+from loader import parse_id, MOVIE_ID_TYPE
+from snapshot import cached_graph, COSTAR
+from components import ComponentIndex
+from msbfs import msbfs_sweep, BATCH_SIZE
+from diameter import exact_diameter
+from betweenness import exact_betweenness, sampled_betweenness
+from name_index import NameIndex
+import instrumentation
+from metadata import MovieTable
 import random
+import sys
 import time
 from tqdm import tqdm
 
 
+@instrumentation.phase("load_graph")
 def load_graph(movies_by_id, actors_by_movie, actor_names_by_id) -> Graph:
     """
-    Loads the graph
+    Loads the graph. The data of each edge is an array with the numbers of the movies
+    the two actors share (see put_titles), shared by both directions of the edge.
+    Every cast becomes a clique; costar_view.CoStarView gives the same graph over
+    the load_graph_b graph without materialising the cliques.
     :param movies_by_id: the movies data by id as dict
     :param actors_by_movie: the actors data by movie
     :param actor_names_by_id: the actors names by their ids
-    :return: a Graph
+    :return: a Graph, with the movie years and genres in graph.movies for filtered traversals
     """
     graph = Graph()
     print("Loading graph")
+    edges = 0
 
     for movie_id in movies_by_id.keys():
-        movie_title = movies_by_id[movie_id]['primaryTitle']
+        movie_number = parse_id(movie_id)
         for actor1, actor2 in combinations(actors_by_movie[movie_id], 2):
             if not graph.vertex_exists(actor1):
                 graph.add_vertex(actor1, actor_names_by_id.get(actor1, "ERROR"))
             if not graph.vertex_exists(actor2):
                 graph.add_vertex(actor2, actor_names_by_id.get(actor2, "ERROR"))
-            existing_data = set()
             if graph.edge_exists(actor1, actor2):
-                existing_data = graph.get_edge_data(actor1, actor2)
-            graph.add_edge(vertex1=actor1, vertex2=actor2,
-                           data={movie_title} | existing_data)
+                graph.get_edge_data(actor1, actor2).append(movie_number)
+            else:
+                graph.add_edge(vertex1=actor1, vertex2=actor2,
+                               data=array(MOVIE_ID_TYPE, [movie_number]))
+                edges += 1
+    graph.movies = MovieTable.from_read_data(movies_by_id)
+    graph.integer_items = True
+    metrics = instrumentation.active()
+    if metrics is not None:
+        metrics.count("load_graph.movies", len(movies_by_id))
+        metrics.count("load_graph.pairs", sum(len(actors_by_movie[m]) * (len(actors_by_movie[m]) - 1) // 2
+                                              for m in movies_by_id))
+        metrics.count("load_graph.vertices", len(graph.get_vertices()))
+        metrics.count("load_graph.edges", edges)
     return graph
 
+DIJKSTRA_ENGINE = "buckets"
+# Sources of the MS-BFS separations in the main; python grafo_a.py --exact uses all of them
+SEPARATIONS_SAMPLE = 1024
+
+def shortest_paths (graph, vertex, components = None, engine = DIJKSTRA_ENGINE):
+    """
+    Calculates the minimum paths from a vertex with the chosen Dijkstra implementation
+    :param graph: the graph
+    :param vertex: the starting vertex
+    :param components: a prebuilt ComponentIndex, used by the heap implementations
+    :param engine: "buckets" (dijkstra_buckets), "heapq" (dijkstra), "indexed" (dijkstra_indexed)
+    or "heapdict" (dijkstra_heapdict)
+    :return: the distance from the starting vertex to the others and the previous vertex
+    """
+    if engine == "buckets":
+        return dijkstra_buckets(graph, vertex)
+    if engine == "indexed":
+        return dijkstra_indexed(graph, vertex, components)
+    if engine == "heapdict":
+        return dijkstra_heapdict(graph, vertex, components)
+    if engine == "heapq":
+        return dijkstra(graph, vertex, components)
+    raise ValueError("Unknown Dijkstra engine: " + engine)
+
 def order_list (a_list):
     """
     Orders a list by length of its elements
@@ -162,70 +212,103 @@ def avg_separations (biggest_component, graph):
 
     return avg
 
-def betweenness_centrality (graph, top=10, iter = 20):
+def component_separations (biggest_component, graph, sample = None, batch_size = BATCH_SIZE):
+    """
+    Calculates the eccentricities and average separations in the principal component with
+    multi-source BFS, from every vertex or from a random sample of them
+    :param biggest_component: the biggest component
+    :param graph: the graph, a CSRGraph
+    :param sample: the number of random source vertices (None for all of them)
+    :param batch_size: the number of sources per sweep
+    :return: the biggest eccentricity found and the average separation
     """
-    Calculates the betweenness centrality of each vertex
+    sources = list(biggest_component)
+    if sample is not None and sample < len(sources):
+        sources = random.sample(sources, sample)
+    start_time = time.time()
+    max_value = 0
+    avg = 0
+    for result in tqdm(msbfs_sweep(graph, sources, batch_size), total=len(sources)):
+        max_value = max(max_value, result["eccentricity"])
+        avg += result["total_distance"] / result["reached"]
+    avg /= len(sources)
+    end_time = time.time()
+    print("Tiempo de ejecución para las separaciones con MS-BFS: ", convert_seconds(end_time - start_time))
+    return max_value, avg
+
+def betweenness_centrality (graph, top=10, iter = 20, weighted = False, processes = None):
+    """
+    Calculates the betweenness centrality of each vertex with Brandes' algorithm
     :param graph: the graph
-    :return: the betweenness centrality of each vertex
+    :param top: the number of vertices to return
+    :param iter: the number of random sources (None for the exact value from every source)
+    :param weighted: use the movie-count edge weights instead of hops
+    :param processes: the number of worker processes
+    :return: the top vertices by betweenness centrality
     """
-    betweenness = {}
-    visited = set()
-    
-    for _ in range (iter):
-        vertex = random.choice(list(graph.get_vertices()))
-        while vertex in visited:
-            vertex = random.choice(list(graph.get_vertices()))
-        visited.add(vertex)
-        min_paths = bfs(graph, vertex)
-        for key in min_paths.keys():
-            if key != vertex:
-                if key not in betweenness.keys():
-                    betweenness[key] = 0
-                betweenness[key] += 1
-
-    betweenness = {key: value/iter for key, value in betweenness.items()}
+    if iter is None:
+        betweenness = exact_betweenness(graph, weighted, processes)
+    else:
+        betweenness = sampled_betweenness(graph, iter, weighted, processes)
     betweenness = put_names_dict(betweenness, graph)
     betweenness = sorted(betweenness.items(), key=lambda x: x[1], reverse=True)[:top]
     return betweenness
 
 if __name__ == "__main__":
+    # IMDB_METRICS=metrics.json writes the counters and timings of every phase at the end
+    instrumentation.enable_from_environment()
+
     # Define the paths to the datasets
 
-    movies_by_id, actors_by_movie, actor_names_by_id = read_data(MOVIES_DATA_PATH, ACTORS_DATA_PATH, ACTORS_NAMES_PATH)
-    graph = load_graph(movies_by_id, actors_by_movie, actor_names_by_id)
+    # The graph is mapped from a snapshot, rebuilt only when the datasets change
+    graph = cached_graph(COSTAR, MOVIES_DATA_PATH, ACTORS_DATA_PATH, ACTORS_NAMES_PATH)
     #graph.print_graph()
 
     """EJERCICIO 1"""
-    connected_components, connected_components_list = connected (graph.get_vertices(), graph)
+    components = ComponentIndex.from_graph(graph)
+    names = NameIndex.from_graph(graph)
+    connected_components, connected_components_list = connected (graph.get_vertices(), graph, components)
     cant = max(connected_components.values())
     print("Cantidad de componentes conexas: ", cant)
 
     connected_components_list = order_list(connected_components_list)
-    second_biggest = put_names(connected_components_list[1], graph)
+    second_biggest = put_names(connected_components_list[1], graph, names)
     print(f"Segunda componente conexa mas grande ({len(connected_components_list[1])} componentes): ", second_biggest)
 
-    smallest = put_names(connected_components_list[-1], graph)
+    smallest = put_names(connected_components_list[-1], graph, names)
     print(f"Componente conexa mas chica ({len(connected_components_list[-1])} componentes): ", smallest)
 
     """EJERCICIO 4"""
     actor = random.choice(list(graph.get_vertices()))
-    min_paths , prev = dijkstra(graph, actor)
-    print(f"Caminos minimos desde {graph.get_vertex_data(actor)}", put_names_dict (min_paths, graph))
-    print("Actores previos", put_names_prev(prev, graph))
+    min_paths , prev = shortest_paths(graph, actor, components)
+    print(f"Caminos minimos desde {graph.get_vertex_data(actor)}", put_names_dict (min_paths, graph, names))
+    print("Actores previos", put_names_prev(prev, graph, names))
     
     """EJERCICIO 5"""
-    # Si se quisiera calcular se debe llamar a la funcion all_min_paths(graph)
+    # Si se quisiera calcular se debe llamar a la funcion all_min_paths(graph), o a
+    # apsp.build_distance_store(graph, directorio, WEIGHTED, procesos) para guardarlos en disco
     time_dijkstra = all_min_paths_time(graph)
     print("Tiempo de ejecucion de Dijkstra para todos los vertices: ", time_dijkstra)
 
     """EJERCICIO 6"""
     max_min_path = max_min_paths(connected_components_list[0], graph)
     print("Camino minimo mas largo de la componente conexa principal: ", max_min_path)
+    diameter, (u, v), runs = exact_diameter(graph, connected_components_list[0])
+    print(f"Diametro exacto de la componente conexa principal ({runs} BFS): ", diameter,
+          "entre", graph.get_vertex_data(u), "y", graph.get_vertex_data(v))
 
     """EJERCICIO 7"""
     separations = avg_separations(connected_components_list[0], graph)
     print("Separacion promedio de la componente conexa principal: ", separations)
 
+    # A sample of sources: from all of them it takes hours on the whole dataset
+    exact = "--exact" in sys.argv[1:]
+    max_min_path, separations = component_separations(connected_components_list[0], graph,
+                                                      None if exact else SEPARATIONS_SAMPLE)
+    kind = "exacto" if exact else "%d fuentes" % SEPARATIONS_SAMPLE
+    print(f"Camino minimo mas largo ({kind}) de la componente conexa principal: ", max_min_path)
+    print(f"Separacion promedio ({kind}) de la componente conexa principal: ", separations)
+
     """EJERCICIO 9"""
     betweenness = betweenness_centrality(graph)
     print("Betweenness centrality: ", betweenness)
@@ -1,17 +1,28 @@
 from graph import Graph
 from functions import *
+from snapshot import cached_graph, BIPARTITE
+from components import ComponentIndex
+from diameter import exact_diameter
+from name_index import NameIndex
+from walks import actor_mask, batch_random_walks, pagerank, top_vertices
+import instrumentation
+from metadata import MovieTable
+from filters import MovieFilter, filtered
+from timeline import Timeline
 import random
 
+@instrumentation.phase("load_graph_b")
 def load_graph_b(movies_by_id, actors_by_movie, actor_names_by_id) -> Graph:
     """
     Loads the graph
     :param movies_by_id: the movies data by id as dict
     :param actors_by_movie: the actors data by movie
     :param actor_names_by_id: the actors names by their ids
-    :return: a Graph
+    :return: a Graph, with the movie years and genres in graph.movies for filtered traversals
     """
     graph = Graph()
     print("Loading graph")
+    edges = 0
     
     for movie_id in movies_by_id.keys():
         movie_title = movies_by_id[movie_id]['primaryTitle']
@@ -22,7 +33,14 @@ def load_graph_b(movies_by_id, actors_by_movie, actor_names_by_id) -> Graph:
                 graph.add_vertex(movie_id, movie_title)
             if not graph.edge_exists(actor, movie_id):
                 graph.add_edge(actor, movie_id, {" "})
+                edges += 1
 
+    graph.movies = MovieTable.from_read_data(movies_by_id)
+    metrics = instrumentation.active()
+    if metrics is not None:
+        metrics.count("load_graph_b.movies", len(movies_by_id))
+        metrics.count("load_graph_b.vertices", len(graph.get_vertices()))
+        metrics.count("load_graph_b.edges", edges)
     return graph
 
 def sep_rate (vertex2, min_paths):
@@ -36,59 +54,86 @@ def sep_rate (vertex2, min_paths):
         return -1
     return int(min_paths[vertex2]/2)
 
-def separation_rate (vertex1, vertex2, graph):
+def separation_rate (vertex1, vertex2, graph, movie_filter = None):
     """
     Calculates the separation rate between two vertices
     :param vertex1: the first vertex
     :param vertex2: the second vertex
     :param graph: the graph
+    :param movie_filter: a filters.MovieFilter, to join them only through the movies it accepts
     :return: the separation rate
     """
-    if not graph.vertex_exists(vertex1) or not graph.vertex_exists(vertex2):
+    distance = bidirectional_bfs(filtered(graph, movie_filter), vertex1, vertex2)
+    if distance == -1:
         return -1
-    min_paths = bfs(graph, vertex1, vertex2)
-    return sep_rate(vertex2, min_paths)
+    return int(distance/2)
 
-def choose_actor (actors_id, graph):
+def separation_path (vertex1, vertex2, graph):
+    """
+    Calculates the separation rate between two vertices and the actors and movies that join them
+    :param vertex1: the first vertex
+    :param vertex2: the second vertex
+    :param graph: the graph
+    :return: the separation rate and the path (None if there is no path)
+    """
+    distance, path = bidirectional_bfs(graph, vertex1, vertex2, path=True)
+    if distance == -1:
+        return -1, None
+    return int(distance/2), path
+
+def choose_actor (actors_id, graph, components = None):
     """
     Chooses two actors from the graph, both in the same connected component
     :param actors_id: the actors ids
     :param graph: the graph
+    :param components: a prebuilt ComponentIndex, to sample the second actor from directly
     :return: the two actors ids
     """
     actor = random.choice(actors_id)
     while not graph.vertex_exists(actor):
         actor = random.choice(actors_id)
+    if components is not None:
+        component = components.component_of(actor)
+        actor2 = components.sample(component)
+        while not is_actor(graph, actor2):
+            actor2 = components.sample(component)
+        return actor, actor2
     component = find_component(graph, actor)
     actor2 = random.choice(actors_id)
     while actor2 not in component:
         actor2 = random.choice(actors_id)
     return actor, actor2
 
-def find_vertex (graph, vertex_name):
+def find_vertex (graph, vertex_name, index = None):
     """
     Finds a vertex by its id
     :param graph: the graph
     :param vertex_name: the vertex name
+    :param index: a NameIndex of the graph, to look the name up instead of walking the vertices
     :return: the vertex
     """
+    if index is not None:
+        matches = index.lookup(vertex_name)
+        return matches[0] if matches else None
     for vertex in graph.get_vertices():
         if vertex_name == graph.get_vertex_data(vertex):
             return vertex
         
     return None
 
-def sep_rate_kevin_bacon (graph):
+def sep_rate_kevin_bacon (graph, components = None, index = None):
     """
     Calculates the separation rate between Kevin Bacon and the actor with the highest separation rate
     :param graph: the graph
+    :param components: a prebuilt ComponentIndex, to avoid walking the component first
+    :param index: a NameIndex of the graph, to find Kevin Bacon
     :return: the actor name and the separation rate
     """
-    kevin_bacon = find_vertex(graph, "Kevin Bacon")
+    kevin_bacon = find_vertex(graph, "Kevin Bacon", index)
     maximums = []
     if kevin_bacon is None:
         return -1, None
-    connected_comp = find_component(graph, kevin_bacon)
+    connected_comp = find_component(graph, kevin_bacon, components)
     if connected_comp is None:
         return -1, None
 
@@ -96,7 +141,7 @@ def sep_rate_kevin_bacon (graph):
     max_rate = -1
     max_name = None
     for vertex in connected_comp:
-        if vertex != kevin_bacon and vertex[0] == 'n':
+        if vertex != kevin_bacon and is_actor(graph, vertex):
             rate = sep_rate(vertex, min_paths)
             if rate >= max_rate:
                 if rate > max_rate:
@@ -127,29 +172,38 @@ def random_walks (graph, walks, num_steps):
     """
     visited_a = {}
     visited_m = {}
+    vertices = list(graph.get_vertices())
     for _ in range (walks):
-        vertex = random.choice(list(graph.get_vertices()))
+        vertex = random.choice(vertices)
 
         for _ in range (num_steps):
             neighbors = graph.get_neighbors(vertex)
             if len(neighbors) == 0:
                 break
             vertex = random.choice(list(neighbors))
-            if vertex[0] == 'n':
+            if is_actor(graph, vertex):
                 update(visited_a, vertex)
             else:
                 update(visited_m, vertex)
 
     return visited_a, visited_m
 
-def centrality (graph, walks, num_steps):
+def centrality (graph, walks, num_steps, seed = None):
     """
     Calculates the centrality of the graph
     :param graph: the graph
     :param walks: the number of walks
     :param num_steps: the number of steps of each walk
+    :param seed: the random seed (a CSRGraph is walked with batch_random_walks)
     :return: the top 10 actors and movies
     """
+    if hasattr(graph, "indptr"):
+        mask = actor_mask(graph)
+        actor_visits, movie_visits = batch_random_walks(graph, walks, num_steps, seed, actors=mask)
+        top10_a = top_vertices(actor_visits, 10, mask, 1)
+        top10_m = top_vertices(movie_visits, 10, mask, 0)
+        return ([(graph.get_vertex_data(v), count) for v, count in top10_a if count],
+                [(graph.get_vertex_data(v), count) for v, count in top10_m if count])
     actors, movies = random_walks(graph, walks, num_steps)
     actors = put_names_dict(actors, graph)
     movies = put_names_dict(movies, graph)
@@ -158,34 +212,69 @@ def centrality (graph, walks, num_steps):
 
     return top10_a, top10_m
 
+def pagerank_centrality (graph, top = 10, personalization = None):
+    """
+    Calculates the centrality of the graph with PageRank, deterministic unlike the random walks
+    :param graph: the graph, a CSRGraph
+    :param top: the number of actors and movies
+    :param personalization: the teleport weight of some vertices, for a personalised PageRank
+    :return: the top actors and movies with their scores
+    """
+    scores = pagerank(graph, personalization=personalization)
+    mask = actor_mask(graph)
+    top_a = [(graph.get_vertex_data(v), score) for v, score in top_vertices(scores, top, mask, 1)]
+    top_m = [(graph.get_vertex_data(v), score) for v, score in top_vertices(scores, top, mask, 0)]
+    return top_a, top_m
+
   
 
 if __name__ == '__main__':
-    movies_by_id, actors_by_movie, actor_names_by_id = read_data(MOVIES_DATA_PATH, ACTORS_DATA_PATH, ACTORS_NAMES_PATH)
-    graph = load_graph_b(movies_by_id, actors_by_movie, actor_names_by_id)
+    # IMDB_METRICS=metrics.json writes the counters and timings of every phase at the end
+    instrumentation.enable_from_environment()
+    # The graph is mapped from a snapshot, rebuilt only when the datasets change
+    graph = cached_graph(BIPARTITE, MOVIES_DATA_PATH, ACTORS_DATA_PATH, ACTORS_NAMES_PATH)
+    components = ComponentIndex.from_graph(graph)
+    names = NameIndex.from_graph(graph)
 
     """EJERCICIO 2"""
-    actors_id = list(actor_names_by_id.keys())
-    ac1, ac2 = choose_actor(actors_id, graph)
+    actors_id = [vertex for vertex in graph.get_vertices() if is_actor(graph, vertex)]
+    ac1, ac2 = choose_actor(actors_id, graph, components)
     sepa_rate = separation_rate(ac1, ac2, graph)
 
     if (sepa_rate == -1):
-        print(f"There is no path between {actor_names_by_id[ac1]} and {actor_names_by_id[ac2]}")
+        print(f"There is no path between {graph.get_vertex_data(ac1)} and {graph.get_vertex_data(ac2)}")
     else:
-        print(f"Separation rate between {actor_names_by_id[ac1]} and {actor_names_by_id[ac2]} is {sepa_rate}")
+        print(f"Separation rate between {graph.get_vertex_data(ac1)} and {graph.get_vertex_data(ac2)} is {sepa_rate}")
+    for movie_filter in (MovieFilter(genres=["Drama"]), MovieFilter(min_year=1990)):
+        print(f"Separation rate with only {movie_filter}: {separation_rate(ac1, ac2, graph, movie_filter)}")
+
+    # How the graph grew: the components at the end of every decade, in one union-find pass
+    timeline = Timeline.build(graph)
+    decades = sorted({year - year % 10 + 9 for year in timeline.years()})
+    for row in timeline.sweep(decades, [(ac1, ac2)]):
+        print(f"Until {row['year']}: {row['components']} components, the biggest with {row['giant_actors']} actors, "
+              f"separation rate {row['separations'][0]}")
 
 
     """EJERCICIO 3"""
-    max_rate, actors = sep_rate_kevin_bacon(graph)
+    max_rate, actors = sep_rate_kevin_bacon(graph, components, names)
     if max_rate == -1:
         print(f"There is no path between Kevin Bacon and other actors")
     else:
         print(f"Actor(s) with the highest separation rate ({max_rate}) from Kevin Bacon is {actors}")
 
-    
+
+    biggest_component = components.members(components.components()[0])
+    diameter, (u, v), runs = exact_diameter(graph, biggest_component, bipartite=True)
+    print(f"Highest separation rate in the biggest component ({runs} BFS): {diameter}, "
+          f"between {graph.get_vertex_data(u)} and {graph.get_vertex_data(v)}")
+
     """EJERCICIO 8"""
     centrality_a, centrality_m = centrality(graph, 500, 50)
     print(f"Top 10 actors with the highest centrality:", centrality_a)
     print(f"Top 10 movies with the highest centrality:", centrality_m)
+    pagerank_a, pagerank_m = pagerank_centrality(graph)
+    print(f"Top 10 actors by PageRank:", pagerank_a)
+    print(f"Top 10 movies by PageRank:", pagerank_m)
 
 
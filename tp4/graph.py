@@ -7,6 +7,18 @@ class Graph:
     """
     def __init__(self):
         self._graph = {}
+        # The attributes of the movies (a metadata.MovieTable), kept by the loaders
+        self.movies = None
+        # If the edge data are integer items, the movie numbers of load_graph (set by the loader)
+        self.integer_items = False
+        # Bumped by every change of the vertices or edges, so the views made before can tell
+        self.version = 0
+
+    def __getstate__(self) -> dict:
+        # The filtered views (see filters.filtered) are not sent along
+        state = dict(self.__dict__)
+        state.pop("_filtered_views", None)
+        return state
 
     def add_vertex(self, vertex: str, data: Optional[Any]=None) -> None:
         """
@@ -16,6 +28,7 @@ class Graph:
         """
         if vertex not in self._graph:
             self._graph[vertex] = {'data': data, 'neighbors': {}}
+            self.version += 1
 
     def add_edge(self, vertex1: str, vertex2: str, data: Optional[Any]=None) -> None:
         """
@@ -28,6 +41,41 @@ class Graph:
             raise ValueError("The vertexes do not exist")
         self._graph[vertex1]['neighbors'][vertex2] = data
         self._graph[vertex2]['neighbors'][vertex1] = data
+        self.version += 1
+
+    def remove_edge(self, vertex1: str, vertex2: str) -> None:
+        """
+        Removes an edge from the graph
+        :param vertex1: vertex1 key
+        :param vertex2: vertex2 key
+        """
+        if not self.edge_exists(vertex1, vertex2):
+            raise ValueError("The edge does not exist")
+        del self._graph[vertex1]['neighbors'][vertex2]
+        del self._graph[vertex2]['neighbors'][vertex1]
+        self.version += 1
+
+    def remove_vertex(self, vertex: str) -> None:
+        """
+        Removes a vertex and its edges from the graph
+        :param vertex: the vertex name
+        """
+        if vertex not in self._graph:
+            raise ValueError("The vertex does not exist")
+        for neighbor in self._graph[vertex]['neighbors']:
+            del self._graph[neighbor]['neighbors'][vertex]
+        del self._graph[vertex]
+        self.version += 1
+
+    def set_vertex_data(self, vertex: str, data: Optional[Any]) -> None:
+        """
+        Replaces the data associated with a vertex
+        :param vertex: the vertex name
+        :param data: the new data
+        """
+        if vertex not in self._graph:
+            raise ValueError("The vertex does not exist")
+        self._graph[vertex]['data'] = data
 
     def get_neighbors(self, vertex) -> List[str]:
         """
@@ -92,4 +140,12 @@ class Graph:
     def get_vertices (self):
         return self._graph.keys()
 
+    def freeze(self):
+        """
+        Builds a frozen compressed sparse row copy of the graph
+        :return: a CSRGraph with integer vertex ids
+        """
+        from csr_graph import CSRGraph
+        return CSRGraph.from_graph(self)
+
         
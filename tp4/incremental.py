@@ -0,0 +1,350 @@
+from array import array
+from typing import Any, Optional
+
+from components import ComponentIndex
+from functions import MOVIE_TITLE_TYPE, bfs, dijkstra_buckets
+from loader import MOVIE_ID_TYPE, parse_id, read_columns
+
+
+class DistanceCache:
+    """
+    Cached single-source results (bfs hop distances and dijkstra_buckets distances and
+    previous vertices) that are dropped only when an edge change can alter them.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self._hops = {}
+        self._weighted = {}
+
+    def hops(self, source: Any) -> dict:
+        """
+        Gets the bfs distances from a source
+        :param source: the source vertex
+        :return: the distance to each reachable vertex
+        """
+        if source not in self._hops:
+            self._hops[source] = bfs(self.graph, source)
+        return self._hops[source]
+
+    def weighted(self, source: Any):
+        """
+        Gets the dijkstra_buckets result from a source
+        :param source: the source vertex
+        :return: the distances and the previous vertices
+        """
+        if source not in self._weighted:
+            self._weighted[source] = dijkstra_buckets(self.graph, source)
+        return self._weighted[source]
+
+    def __len__(self) -> int:
+        return len(self._hops) + len(self._weighted)
+
+    def edge_changed(self, vertex1: Any, vertex2: Any, old_weight: Optional[int],
+                     new_weight: Optional[int]) -> int:
+        """
+        Drops the cached results that an edge change can alter
+        :param vertex1: the first vertex
+        :param vertex2: the second vertex
+        :param old_weight: the previous edge weight (None if the edge is new)
+        :param new_weight: the new edge weight (None if the edge was removed)
+        :return: the number of dropped results
+        """
+        dropped = 0
+        if old_weight is None or new_weight is None:
+            for source in list(self._hops):
+                dist = self._hops[source]
+                d1, d2 = dist.get(vertex1), dist.get(vertex2)
+                if d1 is None and d2 is None:
+                    continue
+                if new_weight is None:
+                    # A removed edge matters only if it was on a shortest path
+                    stale = d1 is not None and d2 is not None and abs(d1 - d2) == 1
+                else:
+                    stale = d1 is None or d2 is None or abs(d1 - d2) > 1
+                if stale:
+                    del self._hops[source]
+                    dropped += 1
+        for source in list(self._weighted):
+            dist, prev = self._weighted[source]
+            d1, d2 = dist.get(vertex1), dist.get(vertex2)
+            if d1 is None and d2 is None:
+                continue
+            if new_weight is None or (old_weight is not None and new_weight > old_weight):
+                # A removed or heavier edge matters only if it is in the shortest path tree
+                stale = prev.get(vertex1) == vertex2 or prev.get(vertex2) == vertex1
+            elif new_weight == old_weight:
+                stale = False
+            else:
+                # An equal path matters too: it can change the previous vertex dijkstra_buckets picks
+                stale = (d1 is None or d2 is None or d1 + new_weight <= d2 or d2 + new_weight <= d1)
+            if stale:
+                del self._weighted[source]
+                dropped += 1
+        return dropped
+
+    def vertex_removed(self, vertex: Any) -> None:
+        """
+        Drops the results whose source was removed from the graph
+        :param vertex: the removed vertex
+        """
+        self._hops.pop(vertex, None)
+        self._weighted.pop(vertex, None)
+
+
+class GraphUpdater:
+    """
+    Applies IMDb delta rows to a Graph built by load_graph (co-star) or load_graph_b
+    (bipartite), keeping the read_data dictionaries, a ComponentIndex and a
+    DistanceCache in step. Every change only touches the cast of the movies in the delta.
+    A CSRGraph is frozen: rebuild its snapshot instead.
+    """
+    def __init__(self, graph, movies_by_id, actors_by_movie, actor_names_by_id,
+                 bipartite: bool=False, components: Optional[ComponentIndex]=None,
+                 actors_file: Optional[str]=None, actors_name_file: Optional[str]=None):
+        """
+        :param graph: the graph
+        :param movies_by_id: the movies data by id the graph was loaded from
+        :param actors_by_movie: the actors data by movie the graph was loaded from
+        :param actor_names_by_id: the actors names by their ids the graph was loaded from
+        :param bipartite: if the graph was built by load_graph_b
+        :param components: a prebuilt ComponentIndex of the graph
+        :param actors_file: the title-principals file the graph was loaded from, so a
+        delta row replaces the base row with its tconst and ordering
+        :param actors_name_file: the name-basics file the graph was loaded from, to name
+        the new actors that the name-basics delta does not
+        """
+        self.graph = graph
+        self.movies_by_id = movies_by_id
+        self.actors_by_movie = actors_by_movie
+        self.actor_names_by_id = actor_names_by_id
+        self.bipartite = bipartite
+        self.components = components if components is not None else ComponentIndex.from_graph(graph)
+        self.cache = DistanceCache(graph)
+        self.movies_by_actor = {}
+        for movie_id, actors in actors_by_movie.items():
+            for actor in actors:
+                self.movies_by_actor.setdefault(actor, set()).add(movie_id)
+        self._principals = {}
+        self._dirty = set()
+        self._unnamed = set()
+        self.actors_name_file = actors_name_file
+        self.stats = {}
+        if actors_file is not None:
+            for movie_id, ordering, actor in read_columns(actors_file, ["tconst", "ordering", "nconst"]):
+                if movie_id in movies_by_id:
+                    self._principals.setdefault(movie_id, {})[ordering] = actor
+
+    def _count(self, key: str, amount: int=1) -> None:
+        self.stats[key] = self.stats.get(key, 0) + amount
+
+    def _edge_data(self, actor1: Any, actor2: Any) -> array:
+        """
+        Calculates the co-star edge data of two actors, as load_graph builds it
+        """
+        shared = self.movies_by_actor.get(actor1, set()) & self.movies_by_actor.get(actor2, set())
+        return array(MOVIE_ID_TYPE, sorted(parse_id(movie_id) for movie_id in shared))
+
+    def _actor_name(self, actor: Any) -> Optional[str]:
+        """
+        Gets the name of an actor; an unknown one is None until a name-basics row names it
+        """
+        name = self.actor_names_by_id.get(actor)
+        if name is None:
+            self._unnamed.add(actor)
+        return name
+
+    def _ensure_vertex(self, vertex: Any, data: Any) -> None:
+        if not self.graph.vertex_exists(vertex):
+            self.graph.add_vertex(vertex, data)
+            self.components.add_vertex(vertex)
+            self._count("vertices_added")
+
+    def _set_edge(self, vertex1: Any, vertex2: Any, data) -> None:
+        """
+        Creates, updates or (with empty data) removes an edge, updating the derived structures
+        """
+        graph = self.graph
+        old_weight = len(graph.get_edge_data(vertex1, vertex2)) if graph.edge_exists(vertex1, vertex2) else None
+        if data:
+            graph.add_edge(vertex1, vertex2, data)
+            self.components.union(vertex1, vertex2)
+            new_weight = len(data)
+        elif old_weight is not None:
+            graph.remove_edge(vertex1, vertex2)
+            self._dirty.add(vertex1)
+            new_weight = None
+        else:
+            return
+        if old_weight != new_weight:
+            self._count("edges_changed")
+            self._count("cache_dropped", self.cache.edge_changed(vertex1, vertex2, old_weight, new_weight))
+
+    def _drop_if_isolated(self, vertex: Any) -> None:
+        if self.graph.vertex_exists(vertex) and not self.graph.get_neighbors(vertex):
+            self.graph.remove_vertex(vertex)
+            self.cache.vertex_removed(vertex)
+            self._dirty.add(vertex)
+            self._count("vertices_removed")
+
+    def _refresh_cast(self, movie_id: Any) -> None:
+        """
+        Recalculates the edge data among the cast of a movie (after a title change)
+        """
+        if self.bipartite:
+            if self.graph.vertex_exists(movie_id):
+                self.graph.set_vertex_data(movie_id, self.movies_by_id[movie_id]['primaryTitle'])
+            return
+        cast = list(self.actors_by_movie[movie_id])
+        for i, actor1 in enumerate(cast):
+            for actor2 in cast[i + 1:]:
+                self._set_edge(actor1, actor2, self._edge_data(actor1, actor2))
+
+    def set_movie(self, movie_id: Any, title_type: str, title: str, start_year: Optional[str]=None,
+                  genres: Optional[str]=None) -> None:
+        """
+        Applies a title-basics row: a new movie, a changed title, year or genres, or a title
+        that stopped being a movie. The graph MovieTable is kept in step, for the filters.
+        :param movie_id: the tconst
+        :param title_type: the titleType
+        :param title: the primaryTitle
+        :param start_year: the startYear
+        :param genres: the genres
+        """
+        movies = getattr(self.graph, "movies", None)
+        if title_type != MOVIE_TITLE_TYPE:
+            if movie_id in self.movies_by_id:
+                for actor in list(self.actors_by_movie[movie_id]):
+                    self.remove_cast(movie_id, actor)
+                del self.movies_by_id[movie_id]
+                del self.actors_by_movie[movie_id]
+                if movies is not None:
+                    movies.remove_movie(parse_id(movie_id))
+                self._count("movies_removed")
+            return
+        row = self.movies_by_id.get(movie_id)
+        if row is None:
+            self.movies_by_id[movie_id] = {'tconst': movie_id, 'titleType': title_type, 'primaryTitle': title,
+                                           'startYear': start_year, 'genres': genres}
+            self.actors_by_movie[movie_id] = set()
+            self._count("movies_added")
+        else:
+            changed = (row.get('startYear'), row.get('genres')) != (start_year, genres)
+            row['startYear'], row['genres'] = start_year, genres
+            if row['primaryTitle'] != title:
+                row['primaryTitle'] = title
+                self._refresh_cast(movie_id)
+                changed = True
+            if not changed:
+                return
+            self._count("movies_changed")
+        if movies is not None:
+            movies.set_movie(parse_id(movie_id), start_year, genres)
+
+    def add_cast(self, movie_id: Any, actor: Any) -> None:
+        """
+        Adds an actor to the cast of a movie
+        :param movie_id: the tconst
+        :param actor: the nconst
+        """
+        if movie_id not in self.movies_by_id or actor in self.actors_by_movie[movie_id]:
+            return
+        self.actors_by_movie[movie_id].add(actor)
+        self.movies_by_actor.setdefault(actor, set()).add(movie_id)
+        self._count("cast_added")
+        name = self._actor_name(actor)
+        if self.bipartite:
+            self._ensure_vertex(actor, name)
+            self._ensure_vertex(movie_id, self.movies_by_id[movie_id]['primaryTitle'])
+            self._set_edge(actor, movie_id, {" "})
+            return
+        for other in self.actors_by_movie[movie_id]:
+            if other == actor:
+                continue
+            self._ensure_vertex(actor, name)
+            self._ensure_vertex(other, self._actor_name(other))
+            self._set_edge(actor, other, self._edge_data(actor, other))
+
+    def remove_cast(self, movie_id: Any, actor: Any) -> None:
+        """
+        Removes an actor from the cast of a movie
+        :param movie_id: the tconst
+        :param actor: the nconst
+        """
+        if movie_id not in self.movies_by_id or actor not in self.actors_by_movie[movie_id]:
+            return
+        self.actors_by_movie[movie_id].discard(actor)
+        self.movies_by_actor[actor].discard(movie_id)
+        self._count("cast_removed")
+        if self.bipartite:
+            self._set_edge(actor, movie_id, set())
+            self._drop_if_isolated(actor)
+            self._drop_if_isolated(movie_id)
+            return
+        for other in self.actors_by_movie[movie_id]:
+            self._set_edge(actor, other, self._edge_data(actor, other))
+            self._drop_if_isolated(other)
+        self._drop_if_isolated(actor)
+
+    def set_actor_name(self, actor: Any, name: str) -> None:
+        """
+        Applies a name-basics row
+        :param actor: the nconst
+        :param name: the primaryName
+        """
+        if actor not in self.movies_by_actor:
+            return
+        self.actor_names_by_id[actor] = name
+        self._unnamed.discard(actor)
+        if self.graph.vertex_exists(actor):
+            self.graph.set_vertex_data(actor, name)
+
+    def finish(self) -> dict:
+        """
+        Recalculates the components that lost edges or vertices
+        :return: the counters of the applied changes
+        """
+        components = {self.components.component_of(v) for v in self._dirty}
+        self._dirty.clear()
+        for component in components:
+            if component is not None:
+                self.components.rebuild(component, self.graph)
+                self._count("components_rebuilt")
+        stats, self.stats = self.stats, {}
+        return stats
+
+    def apply_delta(self, movies_file: Optional[str]=None, actors_file: Optional[str]=None,
+                    actors_name_file: Optional[str]=None) -> dict:
+        """
+        Applies delta files with rows in the format of the datasets (title-basics,
+        title-principals and name-basics; .gz is accepted). A principals row with the same
+        tconst and ordering as a previous row replaces it: a previous delta row or, if the
+        updater was given the base actors_file, a row of the base data (without it, the
+        actor of a changed base row is added to the cast next to the previous one).
+        The new actors that the name-basics delta leaves without a name are looked up in
+        the base actors_name_file, if the updater was given it; otherwise their data is None.
+        :param movies_file: the title-basics delta
+        :param actors_file: the title-principals delta
+        :param actors_name_file: the name-basics delta
+        :return: the counters of the applied changes
+        """
+        if movies_file is not None:
+            columns = ["tconst", "titleType", "primaryTitle", "startYear", "genres"]
+            for movie_id, title_type, title, start_year, genres in read_columns(movies_file, columns):
+                self.set_movie(movie_id, title_type, title, start_year, genres)
+        if actors_file is not None:
+            for movie_id, ordering, actor in read_columns(actors_file, ["tconst", "ordering", "nconst"]):
+                orderings = self._principals.setdefault(movie_id, {})
+                previous = orderings.get(ordering)
+                orderings[ordering] = actor
+                if previous is not None and previous != actor and previous not in orderings.values():
+                    self.remove_cast(movie_id, previous)
+                self.add_cast(movie_id, actor)
+        if actors_name_file is not None:
+            for actor, name in read_columns(actors_name_file, ["nconst", "primaryName"]):
+                self.set_actor_name(actor, name)
+        if self._unnamed and self.actors_name_file is not None:
+            for actor, name in read_columns(self.actors_name_file, ["nconst", "primaryName"]):
+                if actor in self._unnamed:
+                    self.set_actor_name(actor, name)
+        self._unnamed.clear()
+        return self.finish()
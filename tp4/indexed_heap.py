@@ -0,0 +1,202 @@
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Iterable, Optional
+
+ARITY = 4
+POSITION_TYPE = 'i'
+
+
+class IndexedHeap(MutableMapping):
+    """
+    Priority queue with the mapping interface of heapdict: queue[key] = priority
+    inserts or updates a key, popitem removes the key with the lowest priority.
+
+    The heap is d-ary (4 children per node by default, a shallower tree than a
+    binary one) and kept in two parallel lists, keys and priorities. A position
+    index maps every key to its slot, so an update moves the entry in place
+    instead of removing and inserting it again. With a capacity the keys must be
+    the integers below it (as CSRGraph vertex ids) and the index is an array;
+    without one any hashable key is accepted and the index is a dict.
+    """
+    def __init__(self, *args, arity: int=ARITY, capacity: Optional[int]=None, **kw):
+        if arity < 2:
+            raise ValueError("The heap arity must be at least 2")
+        self.arity = arity
+        self._keys = []
+        self._priorities = []
+        self._capacity = capacity
+        self._position = {} if capacity is None else array(POSITION_TYPE, [-1]) * capacity
+        self.update(*args, **kw)
+
+    @classmethod
+    def heapify(cls, keys: Iterable[Any], priorities: Iterable[Any], arity: int=ARITY,
+                capacity: Optional[int]=None) -> "IndexedHeap":
+        """
+        Builds a heap from its initial entries in linear time
+        :param keys: the keys (without repetitions)
+        :param priorities: the priority of each key
+        :param arity: the number of children per node
+        :param capacity: the integer key bound (None for any hashable key)
+        :return: an IndexedHeap
+        """
+        heap = cls(arity=arity, capacity=capacity)
+        heap._keys = list(keys)
+        heap._priorities = list(priorities)
+        if len(heap._keys) != len(heap._priorities):
+            raise ValueError("There must be one priority per key")
+        position = heap._position
+        for i, key in enumerate(heap._keys):
+            position[key] = i
+        for i in range((len(heap._keys) - 2) // arity, -1, -1):
+            heap._sift_down(i)
+        if capacity is None and len(position) != len(heap._keys):
+            raise ValueError("The keys must not repeat")
+        return heap
+
+    def _slot(self, key: Any) -> int:
+        if self._capacity is None:
+            return self._position.get(key, -1)
+        if not isinstance(key, int) or not 0 <= key < self._capacity:
+            return -1
+        return self._position[key]
+
+    def _sift_up(self, i: int) -> None:
+        keys, priorities, position, arity = self._keys, self._priorities, self._position, self.arity
+        key, priority = keys[i], priorities[i]
+        while i:
+            parent = (i - 1) // arity
+            if not priority < priorities[parent]:
+                break
+            keys[i] = keys[parent]
+            priorities[i] = priorities[parent]
+            position[keys[i]] = i
+            i = parent
+        keys[i] = key
+        priorities[i] = priority
+        position[key] = i
+
+    def _sift_down(self, i: int) -> None:
+        keys, priorities, position, arity = self._keys, self._priorities, self._position, self.arity
+        n = len(keys)
+        key, priority = keys[i], priorities[i]
+        while True:
+            first = i * arity + 1
+            if first >= n:
+                break
+            best = first
+            for child in range(first + 1, min(first + arity, n)):
+                if priorities[child] < priorities[best]:
+                    best = child
+            if not priorities[best] < priority:
+                break
+            keys[i] = keys[best]
+            priorities[i] = priorities[best]
+            position[keys[i]] = i
+            i = best
+        keys[i] = key
+        priorities[i] = priority
+        position[key] = i
+
+    def push(self, key: Any, priority: Any) -> None:
+        """
+        Inserts a key that is not in the heap
+        :param key: the key
+        :param priority: its priority
+        """
+        if self._capacity is not None and not (isinstance(key, int) and 0 <= key < self._capacity):
+            raise KeyError(key)
+        self._keys.append(key)
+        self._priorities.append(priority)
+        self._sift_up(len(self._keys) - 1)
+
+    def decrease_key(self, key: Any, priority: Any) -> None:
+        """
+        Lowers the priority of a key in place
+        :param key: the key, already in the heap
+        :param priority: the new priority, not greater than the current one
+        """
+        i = self._slot(key)
+        if i < 0:
+            raise KeyError(key)
+        if self._priorities[i] < priority:
+            raise ValueError("The new priority is greater than the current one")
+        self._priorities[i] = priority
+        self._sift_up(i)
+
+    def __setitem__(self, key: Any, priority: Any) -> None:
+        i = self._slot(key)
+        if i < 0:
+            self.push(key, priority)
+            return
+        old = self._priorities[i]
+        self._priorities[i] = priority
+        if priority < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def __getitem__(self, key: Any) -> Any:
+        i = self._slot(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._priorities[i]
+
+    def __delitem__(self, key: Any) -> None:
+        i = self._slot(key)
+        if i < 0:
+            raise KeyError(key)
+        self._remove(i)
+
+    def _remove(self, i: int):
+        keys, priorities = self._keys, self._priorities
+        key, priority = keys[i], priorities[i]
+        last_key, last_priority = keys.pop(), priorities.pop()
+        if self._capacity is None:
+            del self._position[key]
+        else:
+            self._position[key] = -1
+        if i < len(keys):
+            keys[i] = last_key
+            priorities[i] = last_priority
+            self._position[last_key] = i
+            if last_priority < priority:
+                self._sift_up(i)
+            else:
+                self._sift_down(i)
+        return key, priority
+
+    def __contains__(self, key: Any) -> bool:
+        return self._slot(key) >= 0
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def clear(self) -> None:
+        if self._capacity is None:
+            self._position.clear()
+        else:
+            for key in self._keys:
+                self._position[key] = -1
+        del self._keys[:]
+        del self._priorities[:]
+
+    def popitem(self):
+        """
+        Removes the key with the lowest priority
+        :return: the (key, priority) pair; KeyError if the heap is empty
+        """
+        if not self._keys:
+            raise KeyError("popitem(): heap is empty")
+        return self._remove(0)
+
+    def peekitem(self):
+        """
+        Gets the key with the lowest priority without removing it
+        :return: the (key, priority) pair; KeyError if the heap is empty
+        """
+        if not self._keys:
+            raise KeyError("peekitem(): heap is empty")
+        return self._keys[0], self._priorities[0]
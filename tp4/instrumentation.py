@@ -0,0 +1,214 @@
+import atexit
+import functools
+import json
+import os
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+METRICS_ENV = "IMDB_METRICS"
+METRICS_MEMORY_ENV = "IMDB_METRICS_MEMORY"
+
+# The collecting Metrics, None while the instrumentation is disabled
+_metrics = None
+
+
+class Metrics:
+    """
+    Counters, per-level series and per-phase timings collected while enabled.
+
+    A phase is a named stretch of code (a decorated function or a with block);
+    every phase records its number of calls, its total seconds and, when memory
+    is on, the highest tracemalloc peak of a call above the memory in use when
+    it started. Phases may nest (connected runs a dfs per component), each one
+    measured on its own. The callback, if any, is called at the end of every
+    phase with its name, seconds and peak bytes (None without memory).
+    """
+    def __init__(self, memory: bool=False, callback: Optional[Callable]=None):
+        self.memory = memory
+        self.callback = callback
+        self.counters = {}
+        self.series = {}
+        self.phases = {}
+        self._stack = []
+
+    def count(self, name: str, value: int=1) -> None:
+        """
+        Adds to a counter
+        :param name: the counter, like bfs.vertices_visited
+        :param value: the amount
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_series(self, name: str, values: List[int]) -> None:
+        """
+        Adds values to a series position by position, as the frontier size of every BFS level
+        :param name: the series
+        :param values: the value of each position
+        """
+        series = self.series.setdefault(name, [])
+        if len(series) < len(values):
+            series.extend([0] * (len(values) - len(series)))
+        for i, value in enumerate(values):
+            series[i] += value
+
+    def enter(self, name: str) -> None:
+        current = 0
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            for frame in self._stack:
+                frame[3] = max(frame[3], peak)
+            tracemalloc.reset_peak()
+        self._stack.append([name, time.perf_counter(), current, current])
+
+    def exit(self, name: str) -> None:
+        if not self._stack or self._stack[-1][0] != name:
+            return
+        name, start, current, peak = self._stack.pop()
+        seconds = time.perf_counter() - start
+        peak_bytes = None
+        if self.memory:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            for frame in self._stack:
+                frame[3] = max(frame[3], peak)
+            peak_bytes = peak - current
+        record = self.phases.get(name)
+        if record is None:
+            record = self.phases[name] = {"calls": 0, "seconds": 0.0, "peak_bytes": peak_bytes}
+        record["calls"] += 1
+        record["seconds"] += seconds
+        if peak_bytes is not None:
+            record["peak_bytes"] = max(record["peak_bytes"] or 0, peak_bytes)
+        if self.callback is not None:
+            self.callback(name, seconds, peak_bytes)
+
+    def as_dict(self) -> Dict:
+        return {"phases": self.phases, "counters": self.counters, "series": self.series}
+
+    def to_json(self, path: Optional[str]=None) -> str:
+        """
+        Dumps the metrics as JSON
+        :param path: the file to write (None to only return the text)
+        :return: the JSON text
+        """
+        text = json.dumps(self.as_dict(), indent=1, sort_keys=True)
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(text)
+        return text
+
+
+def active() -> Optional[Metrics]:
+    """
+    Gets the collecting Metrics; the instrumented functions call it once, out of their loops
+    :return: the Metrics, or None while disabled
+    """
+    return _metrics
+
+
+def enable(metrics: Optional[Metrics]=None) -> Metrics:
+    """
+    Starts collecting (and tracing memory allocations if the metrics measure memory)
+    :param metrics: the Metrics to collect into (a new one by default)
+    :return: the Metrics
+    """
+    global _metrics
+    metrics = metrics if metrics is not None else Metrics()
+    if metrics.memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _metrics = metrics
+    return metrics
+
+
+def disable() -> Optional[Metrics]:
+    """
+    Stops collecting
+    :return: the Metrics that were collecting, if any
+    """
+    global _metrics
+    metrics, _metrics = _metrics, None
+    if metrics is not None and metrics.memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return metrics
+
+
+class collect:
+    """
+    Collects metrics inside a with block:
+        with collect(memory=True) as metrics:
+            read_data(...)
+        metrics.to_json("metrics.json")
+    """
+    def __init__(self, memory: bool=False, callback: Optional[Callable]=None):
+        self.metrics = Metrics(memory, callback)
+
+    def __enter__(self) -> Metrics:
+        self._previous = _metrics
+        return enable(self.metrics)
+
+    def __exit__(self, *exc):
+        global _metrics
+        disable()
+        _metrics = self._previous
+
+
+class phase:
+    """
+    Times a phase, as a with block or as a function decorator. While disabled it
+    only checks that there is nothing collecting.
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._metrics = _metrics
+        if self._metrics is not None:
+            self._metrics.enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        if self._metrics is not None:
+            self._metrics.exit(self.name)
+
+    def __call__(self, function: Callable) -> Callable:
+        name = self.name
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics = _metrics
+            if metrics is None:
+                return function(*args, **kwargs)
+            metrics.enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.exit(name)
+        return wrapper
+
+
+def enable_from_environment() -> Optional[Metrics]:
+    """
+    Enables the metrics if the IMDB_METRICS variable names an output file, which is
+    written as JSON when the program ends (IMDB_METRICS_MEMORY=1 also measures memory)
+    :return: the Metrics, or None if the variable is not set
+    """
+    path = os.environ.get(METRICS_ENV)
+    if not path:
+        return None
+    metrics = enable(Metrics(memory=os.environ.get(METRICS_MEMORY_ENV) == "1"))
+    atexit.register(metrics.to_json, path)
+    return metrics
+
+
+def level_sizes(dist) -> List[int]:
+    """
+    Counts the vertices at every distance of a BFS result
+    :param dist: the distance of each vertex
+    :return: the number of vertices at each distance
+    """
+    sizes = []
+    for d in dist.values():
+        if d >= len(sizes):
+            sizes.extend([0] * (d + 1 - len(sizes)))
+        sizes[d] += 1
+    return sizes
@@ -0,0 +1,259 @@
+import heapq
+import json
+import mmap
+import os
+from array import array
+from typing import List, Optional, Tuple
+
+from apsp import HOPS, WEIGHTED
+from functions import bfs, dijkstra_buckets
+
+LANDMARKS = "landmarks.json"
+TABLE = "landmarks.bin"
+TABLE_TYPE = 'i'
+UNREACHABLE = -1
+DEGREE = "degree"
+FARTHEST = "farthest"
+
+
+def _distances (graph, source, metric):
+    if metric == HOPS:
+        return bfs(graph, source)
+    return dijkstra_buckets(graph, source)[0]
+
+
+def choose_landmarks (graph, count, strategy = DEGREE) -> List[int]:
+    """
+    Chooses the landmark vertices
+    :param graph: the graph, a CSRGraph
+    :param count: the number of landmarks
+    :param strategy: DEGREE (the vertices with most neighbors) or FARTHEST (each one
+    the farthest from the ones already chosen, starting from the highest degree vertex;
+    a vertex not reached by any of them counts as the farthest, so every component gets one)
+    :return: the landmarks
+    """
+    n = graph.num_vertices()
+    count = min(count, n)
+    by_degree = sorted(range(n), key=graph.degree, reverse=True)
+    if strategy == DEGREE:
+        return by_degree[:count]
+    if strategy != FARTHEST:
+        raise ValueError("Unknown landmark strategy: %s" % strategy)
+    landmarks = []
+    closest = array('i', [-1]) * n
+    candidate = by_degree[0] if n else None
+    while len(landmarks) < count and candidate is not None:
+        landmarks.append(candidate)
+        for vertex, d in bfs(graph, candidate).items():
+            if closest[vertex] == -1 or d < closest[vertex]:
+                closest[vertex] = d
+        # Unreached vertices first (by degree), then the farthest reached one
+        candidate = next((v for v in by_degree if closest[v] == -1), None)
+        if candidate is None:
+            best = max(range(n), key=lambda v: closest[v])
+            candidate = best if closest[best] > 0 else None
+    return landmarks
+
+
+class LandmarkIndex:
+    """
+    Distances from a few landmark vertices to every vertex, one row per landmark
+    (UNREACHABLE where the landmark does not reach). By the triangle inequality,
+    |d(L, u) - d(L, v)| <= d(u, v) <= d(L, u) + d(L, v) for every landmark L,
+    which gives distance bounds in O(landmarks) and the ALT heuristic for A*.
+    The tables are saved in a directory and mapped back from it, with the strategy
+    and count that chose the landmarks (FARTHEST can give fewer than asked for) and
+    the fingerprint of the graph they were calculated on.
+    """
+    def __init__(self, landmarks: List[int], metric: str, table, num_vertices: int, num_edges: int,
+                 strategy: Optional[str]=None, fingerprint: Optional[str]=None, count: Optional[int]=None):
+        self.landmarks = list(landmarks)
+        self.metric = metric
+        self.num_vertices = num_vertices
+        self.num_edges = num_edges
+        self.strategy = strategy
+        self.fingerprint = fingerprint
+        self.count = count if count is not None else len(self.landmarks)
+        self._table = table
+
+    @classmethod
+    def build(cls, graph, landmarks: List[int], metric: str=HOPS, strategy: Optional[str]=None,
+              count: Optional[int]=None) -> "LandmarkIndex":
+        """
+        Calculates the landmark distances
+        :param graph: the graph, a CSRGraph
+        :param landmarks: the landmarks (see choose_landmarks)
+        :param metric: HOPS (bfs) or WEIGHTED (movie-count weights)
+        :param strategy: the strategy that chose the landmarks, if any
+        :param count: the number of landmarks asked for (by default as many as given)
+        :return: a LandmarkIndex
+        """
+        if metric not in (HOPS, WEIGHTED):
+            raise ValueError("Unknown metric: %s" % metric)
+        n = graph.num_vertices()
+        table = array(TABLE_TYPE)
+        for landmark in landmarks:
+            row = array(TABLE_TYPE, [UNREACHABLE]) * n
+            for vertex, d in _distances(graph, landmark, metric).items():
+                row[vertex] = d
+            table.extend(row)
+        return cls(landmarks, metric, memoryview(table), n, graph.num_edges(), strategy, graph.fingerprint(), count)
+
+    def save(self, directory: str) -> None:
+        """
+        Writes the tables and their description into a directory
+        :param directory: the directory
+        """
+        os.makedirs(directory, exist_ok=True)
+        description = os.path.join(directory, LANDMARKS)
+        if os.path.exists(description):
+            os.remove(description)
+        with open(os.path.join(directory, TABLE), "wb") as file:
+            file.write(self._table)
+        # The description goes last: its presence means the table is complete
+        with open(description, "w") as file:
+            json.dump({"landmarks": self.landmarks, "metric": self.metric,
+                       "vertices": self.num_vertices, "edges": self.num_edges,
+                       "strategy": self.strategy, "count": self.count, "graph": self.fingerprint}, file)
+
+    @classmethod
+    def load(cls, directory: str) -> "LandmarkIndex":
+        """
+        Maps the tables saved in a directory
+        :param directory: the directory
+        :return: a LandmarkIndex
+        """
+        with open(os.path.join(directory, LANDMARKS), "r") as file:
+            description = json.load(file)
+        with open(os.path.join(directory, TABLE), "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                table = memoryview(array(TABLE_TYPE))
+            else:
+                table = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)).cast(TABLE_TYPE)
+        return cls(description["landmarks"], description["metric"], table,
+                   description["vertices"], description["edges"],
+                   description.get("strategy"), description.get("graph"), description.get("count"))
+
+    def distances(self, vertex: int) -> List[int]:
+        """
+        Gets the distance of each landmark to a vertex
+        :param vertex: the vertex id
+        :return: the distances (UNREACHABLE where the landmark does not reach the vertex)
+        """
+        n, table = self.num_vertices, self._table
+        return [table[i * n + vertex] for i in range(len(self.landmarks))]
+
+    def bounds(self, vertex1: int, vertex2: int) -> Tuple[int, Optional[int]]:
+        """
+        Bounds the distance between two vertices with the landmark distances
+        :param vertex1: the first vertex id
+        :param vertex2: the second vertex id
+        :return: the lower and upper bounds; (-1, -1) if the vertices are not connected
+        (a landmark reaches only one of them) and an upper bound of None if no landmark
+        reaches them
+        """
+        if vertex1 == vertex2:
+            return 0, 0
+        lower, upper = 0, None
+        for d1, d2 in zip(self.distances(vertex1), self.distances(vertex2)):
+            if (d1 == UNREACHABLE) != (d2 == UNREACHABLE):
+                return -1, -1
+            if d1 == UNREACHABLE:
+                continue
+            lower = max(lower, abs(d1 - d2))
+            if upper is None or d1 + d2 < upper:
+                upper = d1 + d2
+        return lower, upper
+
+    def estimate(self, vertex1: int, vertex2: int) -> int:
+        """
+        Approximates the distance between two vertices by its upper bound
+        :param vertex1: the first vertex id
+        :param vertex2: the second vertex id
+        :return: the approximate distance, -1 if they are not connected or no landmark reaches them
+        """
+        upper = self.bounds(vertex1, vertex2)[1]
+        return -1 if upper is None else upper
+
+    def shortest_path(self, graph, start: int, end: int, stats: Optional[dict]=None):
+        """
+        Exact shortest path with A* and the landmark lower bounds as heuristic (ALT),
+        in the metric of the index
+        :param graph: the graph the index was built on
+        :param start: the starting vertex id
+        :param end: the ending vertex id
+        :param stats: a dictionary to fill with the number of settled vertices
+        :return: the distance (-1 if there is no path) and the path (None if there is no path)
+        """
+        n, table, rows = self.num_vertices, self._table, range(len(self.landmarks))
+        target = [table[i * n + end] for i in rows]
+        if self.metric == WEIGHTED:
+            weights = graph.edge_weights()
+        else:
+            weights = None
+
+        known = {}
+
+        def heuristic(vertex):
+            # A vertex is pushed once per improvement; its bound is calculated once
+            h = known.get(vertex)
+            if h is None:
+                h = 0
+                for i in rows:
+                    d1, d2 = table[i * n + vertex], target[i]
+                    if d1 != UNREACHABLE and d2 != UNREACHABLE and abs(d1 - d2) > h:
+                        h = abs(d1 - d2)
+                known[vertex] = h
+            return h
+
+        dist = {start: 0}
+        prev = {start: None}
+        settled = set()
+        queue = [(heuristic(start), 0, start)]
+        while queue:
+            _, d, v = heapq.heappop(queue)
+            if v in settled:
+                continue
+            settled.add(v)
+            if v == end:
+                break
+            first, last = graph.neighbor_range(v)
+            neighbors = graph.neighbor_slice(v)
+            for k in range(last - first):
+                w = neighbors[k]
+                newdist = d + (1 if weights is None else weights[first + k])
+                if w not in settled and newdist < dist.get(w, newdist + 1):
+                    dist[w] = newdist
+                    prev[w] = v
+                    heapq.heappush(queue, (newdist + heuristic(w), newdist, w))
+        if stats is not None:
+            stats["settled"] = len(settled)
+        if end not in settled:
+            return -1, None
+        path = [end]
+        while prev[path[-1]] is not None:
+            path.append(prev[path[-1]])
+        return dist[end], path[::-1]
+
+
+def build_landmarks (graph, directory, count = 16, metric = HOPS, strategy = FARTHEST) -> LandmarkIndex:
+    """
+    Chooses the landmarks, calculates their distances and saves them, or loads the saved
+    ones if the directory holds an index of the same graph, metric, strategy and count
+    :param graph: the graph, a CSRGraph
+    :param directory: the index directory
+    :param count: the number of landmarks
+    :param metric: HOPS or WEIGHTED
+    :param strategy: DEGREE or FARTHEST
+    :return: the LandmarkIndex
+    """
+    try:
+        index = LandmarkIndex.load(directory)
+        if (index.metric == metric and index.strategy == strategy and index.count == count
+                and index.num_vertices == graph.num_vertices() and index.fingerprint == graph.fingerprint()):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    index = LandmarkIndex.build(graph, choose_landmarks(graph, count, strategy), metric, strategy, count)
+    index.save(directory)
+    return index
@@ -0,0 +1,266 @@
+import gzip
+from array import array
+from typing import List, Optional
+
+import instrumentation
+from metadata import Codes, parse_year, YEAR_TYPE, GENRE_TYPE, NO_YEAR, MISSING
+
+MOVIE_TITLE_TYPE = "movie"
+ID_TYPE = 'q'
+# Movie numbers kept as edge data (IMDb tconst numbers fit in 32 bits)
+MOVIE_ID_TYPE = 'i'
+ACTOR_PREFIX = "nm"
+MOVIE_PREFIX = "tt"
+
+
+def parse_id(imdb_id: str) -> int:
+    """
+    Parses the numeric part of an IMDb id
+    :param imdb_id: the id, like nm0000102 or tt0087277
+    :return: the number, like 102
+    """
+    return int(imdb_id[2:])
+
+
+def format_id(prefix: str, number: int) -> str:
+    """
+    Formats an IMDb id back from its numeric part
+    :param prefix: the id prefix (nm or tt)
+    :param number: the numeric part
+    :return: the id, like nm0000102
+    """
+    return "%s%07d" % (prefix, number)
+
+
+def open_tsv(path: str):
+    """
+    Opens a TSV file for reading, decompressing it on the fly if it ends in .gz
+    :param path: the file path
+    :return: a text file object
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    return open(path, "r", newline="", encoding="utf-8")
+
+
+def read_columns(path: str, columns: List[str]):
+    """
+    Streams the requested columns of a TSV file, splitting each line only as
+    far as the last requested column. Short or blank lines, without all the
+    requested columns, are skipped.
+    :param path: the file path
+    :param columns: the column names
+    :return: an iterator of tuples with the column values, in the requested order
+    """
+    with open_tsv(path) as file:
+        header = file.readline().rstrip("\r\n").split("\t")
+        positions = [header.index(column) for column in columns]
+        maxsplit = max(positions) + 1
+        for line in file:
+            fields = line.rstrip("\r\n").split("\t", maxsplit)
+            if len(fields) < maxsplit:
+                continue
+            yield tuple(fields[p] for p in positions)
+
+
+class IMDbData:
+    """
+    Compact result of read_data_compact.
+
+    Movies and actors have dense integer ids. Movie m has IMDb number
+    movie_ids[m], title movie_titles[m] and cast
+    cast[cast_ptr[m]:cast_ptr[m + 1]] (dense actor ids, without repetitions).
+    Actor a has IMDb number actor_ids[a] and name actor_names[a] (None if it
+    is not in the names file). The start year of movie m is movie_years[m]
+    (NO_YEAR when unknown) and its genres the bitmask movie_genres[m] over
+    genre_labels.
+    """
+    def __init__(self, movie_ids: array, movie_titles: List[str], cast_ptr: array, cast: array,
+                 actor_ids: array, actor_names: List[Optional[str]], movie_years: Optional[array]=None,
+                 movie_genres: Optional[array]=None, genre_labels: Optional[List[str]]=None):
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.cast_ptr = cast_ptr
+        self.cast = cast
+        self.actor_ids = actor_ids
+        self.actor_names = actor_names
+        self.movie_years = movie_years if movie_years is not None else array(YEAR_TYPE, [NO_YEAR]) * len(movie_ids)
+        self.movie_genres = movie_genres if movie_genres is not None else array(GENRE_TYPE, [0]) * len(movie_ids)
+        self.genre_labels = genre_labels if genre_labels is not None else []
+
+    def num_movies(self) -> int:
+        return len(self.movie_ids)
+
+    def num_actors(self) -> int:
+        return len(self.actor_ids)
+
+    def movie_cast(self, movie: int) -> memoryview:
+        """
+        Gets the cast of a movie without copying
+        :param movie: the dense movie id
+        :return: the dense actor ids
+        """
+        return memoryview(self.cast)[self.cast_ptr[movie]:self.cast_ptr[movie + 1]]
+
+    def to_read_data(self):
+        """
+        Converts the data to the dictionaries returned by read_data
+        :return: movies_by_id, actors_by_movie and actor_names_by_id
+        """
+        movies_by_id = {}
+        actors_by_movie = {}
+        for m, number in enumerate(self.movie_ids):
+            tconst = format_id(MOVIE_PREFIX, number)
+            year, mask = self.movie_years[m], self.movie_genres[m]
+            movies_by_id[tconst] = {"tconst": tconst, "titleType": MOVIE_TITLE_TYPE,
+                                    "primaryTitle": self.movie_titles[m],
+                                    "startYear": str(year) if year != NO_YEAR else MISSING,
+                                    "genres": ",".join(sorted(label for bit, label in enumerate(self.genre_labels)
+                                                              if mask >> bit & 1)) or MISSING}
+            actors_by_movie[tconst] = {format_id(ACTOR_PREFIX, self.actor_ids[a])
+                                       for a in self.movie_cast(m)}
+        actor_names_by_id = {format_id(ACTOR_PREFIX, self.actor_ids[a]): name
+                             for a, name in enumerate(self.actor_names) if name is not None}
+        return movies_by_id, actors_by_movie, actor_names_by_id
+
+
+@instrumentation.phase("read_data_compact")
+def read_data_compact(movies_file: str, actors_file: str, actors_name_file: str) -> IMDbData:
+    """
+    Reads the same data as read_data in a single streaming pass per file,
+    keeping only the needed columns and interning ids as dense integers.
+    The start years and genres of the movies are kept as typed columns.
+    Files ending in .gz are decompressed on the fly.
+    :param movies_file: the title-basics file
+    :param actors_file: the title-principals file
+    :param actors_name_file: the name-basics file
+    :return: the IMDbData
+    """
+    print("Reading data")
+    metrics = instrumentation.active()
+    movie_ids = array(ID_TYPE)
+    movie_titles = []
+    movie_years = array(YEAR_TYPE)
+    movie_genres = array(GENRE_TYPE)
+    genres = Codes()
+    movie_index = {}
+    rows = 0
+    with instrumentation.phase("read_data_compact.movies"):
+        columns = read_columns(movies_file, ["tconst", "titleType", "primaryTitle", "startYear", "genres"])
+        for rows, (tconst, title_type, title, year, genre_field) in enumerate(columns, 1):
+            if title_type == MOVIE_TITLE_TYPE:
+                number = parse_id(tconst)
+                movie_index[number] = len(movie_ids)
+                movie_ids.append(number)
+                movie_titles.append(title)
+                movie_years.append(parse_year(year))
+                movie_genres.append(genres.genre_mask(genre_field))
+    if metrics is not None:
+        metrics.count("read_data_compact.movie_rows", rows)
+
+    actor_ids = array(ID_TYPE)
+    actor_index = {}
+    row_movie = array(ID_TYPE)
+    row_actor = array(ID_TYPE)
+    rows = 0
+    with instrumentation.phase("read_data_compact.principals"):
+        for rows, (tconst, nconst) in enumerate(read_columns(actors_file, ["tconst", "nconst"]), 1):
+            movie = movie_index.get(parse_id(tconst))
+            if movie is None:
+                continue
+            number = parse_id(nconst)
+            actor = actor_index.get(number)
+            if actor is None:
+                actor = actor_index[number] = len(actor_ids)
+                actor_ids.append(number)
+            row_movie.append(movie)
+            row_actor.append(actor)
+    if metrics is not None:
+        metrics.count("read_data_compact.principal_rows", rows)
+    del movie_index
+
+    with instrumentation.phase("read_data_compact.group"):
+        cast_ptr, cast = _group_rows(len(movie_ids), row_movie, row_actor)
+    del row_movie, row_actor
+
+    actor_names = [None] * len(actor_ids)
+    rows = 0
+    with instrumentation.phase("read_data_compact.names"):
+        for rows, (nconst, name) in enumerate(read_columns(actors_name_file, ["nconst", "primaryName"]), 1):
+            actor = actor_index.get(parse_id(nconst))
+            if actor is not None:
+                actor_names[actor] = name
+    if metrics is not None:
+        metrics.count("read_data_compact.name_rows", rows)
+
+    return IMDbData(movie_ids, movie_titles, cast_ptr, cast, actor_ids, actor_names,
+                    movie_years, movie_genres, genres.labels)
+
+
+def _group_rows(num_groups: int, groups: array, values: array):
+    """
+    Groups (group, value) rows with a counting sort, dropping repeated values
+    inside a group
+    :param num_groups: the number of groups
+    :param groups: the group of each row
+    :param values: the value of each row
+    :return: the group offsets and the grouped values
+    """
+    counts = array(ID_TYPE, bytes(8 * (num_groups + 1)))
+    for g in groups:
+        counts[g + 1] += 1
+    for g in range(num_groups):
+        counts[g + 1] += counts[g]
+    fill = array(ID_TYPE, counts)
+    grouped = array(ID_TYPE, bytes(8 * len(values)))
+    for g, value in zip(groups, values):
+        grouped[fill[g]] = value
+        fill[g] += 1
+    del fill
+
+    ptr = array(ID_TYPE, [0])
+    out = array(ID_TYPE)
+    for g in range(num_groups):
+        seen = set()
+        for value in grouped[counts[g]:counts[g + 1]]:
+            if value not in seen:
+                seen.add(value)
+                out.append(value)
+        ptr.append(len(out))
+    return ptr, out
+
+
+class IdLabels:
+    """
+    Read-only sequence of IMDb ids stored as their numeric parts.
+    Positions before movie_start are actors (nm...), the rest are movies (tt...).
+    """
+    def __init__(self, numbers: array, movie_start: int):
+        self.numbers = numbers
+        self.movie_start = movie_start
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __getitem__(self, position: int) -> str:
+        prefix = ACTOR_PREFIX if position < self.movie_start else MOVIE_PREFIX
+        return format_id(prefix, self.numbers[position])
+
+    def __iter__(self):
+        for position in range(len(self.numbers)):
+            yield self[position]
+
+    def lookup(self, imdb_id: str) -> Optional[int]:
+        """
+        Finds the position of an IMDb id
+        :param imdb_id: the id, like nm0000102
+        :return: the position, or None if it is not present
+        """
+        if self._index is None:
+            self._index = {(p >= self.movie_start, number): p for p, number in enumerate(self.numbers)}
+        try:
+            key = (imdb_id[:2] == MOVIE_PREFIX, parse_id(imdb_id))
+        except (TypeError, ValueError):
+            return None
+        return self._index.get(key)
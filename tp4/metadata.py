@@ -0,0 +1,337 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Sequence
+
+from string_pool import StringPool
+
+ACTOR = 0
+MOVIE = 1
+KIND_TYPE = 'B'
+YEAR_TYPE = 'h'
+GENRE_TYPE = 'I'
+TITLE_TYPE_CODE = 'B'
+NO_YEAR = 0
+MAX_GENRES = 32
+MISSING = "\\N"
+NUMBER_TYPE = 'q'
+
+
+def parse_year(field: Optional[str]) -> int:
+    """
+    Parses a startYear field
+    :param field: the field (\\N when unknown)
+    :return: the year, or NO_YEAR
+    """
+    return int(field) if field and field.isdigit() else NO_YEAR
+
+
+class Codes:
+    """
+    Dense codes of a small vocabulary (genres, title types), in order of appearance
+    """
+    def __init__(self, labels: Iterable[str]=()):
+        self.labels = []
+        self.ids = {}
+        for label in labels:
+            self.code(label)
+
+    def code(self, label: str) -> int:
+        code = self.ids.get(label)
+        if code is None:
+            code = self.ids[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def genre_mask(self, field: Optional[str]) -> int:
+        """
+        Parses a genres field into a bitmask, one bit per genre code
+        :param field: the comma separated genres (\\N when there are none)
+        :return: the bitmask
+        """
+        mask = 0
+        if field and field != MISSING:
+            for genre in field.split(","):
+                code = self.code(genre)
+                if code >= MAX_GENRES:
+                    raise ValueError("There are more than %d genres" % MAX_GENRES)
+                mask |= 1 << code
+        return mask
+
+
+def genre_names(mask: int, genre_labels: Sequence[str]) -> List[str]:
+    """
+    Gets the genres of a bitmask
+    :param mask: the bitmask
+    :param genre_labels: the genre of each bit
+    :return: the genre names
+    """
+    return [label for bit, label in enumerate(genre_labels) if mask >> bit & 1]
+
+
+class MovieTable:
+    """
+    Start year and genre bitmask of every movie, by IMDb number: the movie with
+    number numbers[i] (sorted) has years[i] and genres[i], as the VertexMetadata
+    columns. The co-star graphs, whose edges only keep movie numbers, look the
+    movie attributes up here.
+    """
+    def __init__(self, numbers, years, genres, genre_labels: Sequence[str]=()):
+        self.numbers = numbers
+        self.years = years
+        self.genres = genres
+        self.genre_labels = list(genre_labels)
+        # Bumped by set_movie and remove_movie
+        self.version = 0
+
+    @classmethod
+    def from_rows(cls, rows: Iterable, genre_labels: Sequence[str]=()) -> "MovieTable":
+        """
+        Builds the table from (number, year, genre mask) rows in any order
+        :param rows: the rows
+        :param genre_labels: the genre of each bit
+        :return: a MovieTable
+        """
+        rows = sorted(rows)
+        return cls(array(NUMBER_TYPE, (row[0] for row in rows)), array(YEAR_TYPE, (row[1] for row in rows)),
+                   array(GENRE_TYPE, (row[2] for row in rows)), genre_labels)
+
+    @classmethod
+    def from_imdb_data(cls, imdb_data) -> "MovieTable":
+        """
+        Builds the table from read_data_compact output
+        :param imdb_data: the IMDbData
+        :return: a MovieTable
+        """
+        return cls.from_rows(zip(imdb_data.movie_ids, imdb_data.movie_years, imdb_data.movie_genres),
+                             imdb_data.genre_labels)
+
+    @classmethod
+    def from_read_data(cls, movies_by_id) -> "MovieTable":
+        """
+        Builds the table from the read_data movies
+        :param movies_by_id: the movies data by id as dict
+        :return: a MovieTable
+        """
+        genres = Codes()
+        rows = [(int(movie_id[2:]), parse_year(row.get("startYear")), genres.genre_mask(row.get("genres")))
+                for movie_id, row in movies_by_id.items()]
+        return cls.from_rows(rows, genres.labels)
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def position(self, number: int) -> int:
+        """
+        Finds a movie
+        :param number: the IMDb number of the movie
+        :return: its position in the columns, or -1 if it is not in the table
+        """
+        i = bisect_left(self.numbers, number)
+        if i < len(self.numbers) and self.numbers[i] == number:
+            return i
+        return -1
+
+    def year(self, number: int) -> Optional[int]:
+        i = self.position(number)
+        if i < 0 or self.years[i] == NO_YEAR:
+            return None
+        return self.years[i]
+
+    def genre_names(self, number: int) -> List[str]:
+        i = self.position(number)
+        return [] if i < 0 else genre_names(self.genres[i], self.genre_labels)
+
+    def set_movie(self, number: int, start_year: Optional[str], genres: Optional[str]) -> None:
+        """
+        Adds a movie or replaces its attributes (the columns must be arrays, not a snapshot)
+        :param number: the IMDb number of the movie
+        :param start_year: the startYear field
+        :param genres: the genres field
+        """
+        codes = Codes(self.genre_labels)
+        mask = codes.genre_mask(genres)
+        self.genre_labels = codes.labels
+        i = bisect_left(self.numbers, number)
+        if i < len(self.numbers) and self.numbers[i] == number:
+            self.years[i] = parse_year(start_year)
+            self.genres[i] = mask
+        else:
+            self.numbers.insert(i, number)
+            self.years.insert(i, parse_year(start_year))
+            self.genres.insert(i, mask)
+        self.version += 1
+
+    def remove_movie(self, number: int) -> None:
+        """
+        Removes a movie, if it is in the table
+        :param number: the IMDb number of the movie
+        """
+        i = self.position(number)
+        if i >= 0:
+            del self.numbers[i], self.years[i], self.genres[i]
+            self.version += 1
+
+    def sections(self, prefix: str) -> list:
+        return [(prefix + "_numbers", NUMBER_TYPE, self.numbers), (prefix + "_years", YEAR_TYPE, self.years),
+                (prefix + "_genres", GENRE_TYPE, self.genres)]
+
+    @classmethod
+    def from_sections(cls, sections: dict, prefix: str, genre_labels: Sequence[str]) -> "MovieTable":
+        return cls(sections[prefix + "_numbers"], sections[prefix + "_years"], sections[prefix + "_genres"],
+                   genre_labels)
+
+
+class VertexMetadata:
+    """
+    Columnar data of the vertices of a CSRGraph, by vertex id.
+
+    Vertex v is an ACTOR or a MOVIE (kinds[v]) and its name, or title, is names[v],
+    from a StringPool. The movie attributes are optional typed columns: years[v]
+    (NO_YEAR when unknown), genres[v] (a bitmask over genre_labels) and
+    title_types[v] (a code of title_type_labels); the actor entries are 0.
+    A graph without movie vertices (the co-star graph) may keep a MovieTable instead.
+    As a sequence it is the sequence of names, so it can stand as the vertex data
+    of a CSRGraph. The columns can be arrays or memoryviews over a mapped snapshot.
+    """
+    def __init__(self, kinds, names: StringPool, years=None, genres=None, title_types=None,
+                 genre_labels: Sequence[str]=(), title_type_labels: Sequence[str]=(),
+                 movies: Optional[MovieTable]=None):
+        self.kinds = kinds
+        self.names = names
+        self.years = years
+        self.genres = genres
+        self.title_types = title_types
+        self.genre_labels = list(genre_labels)
+        self.title_type_labels = list(title_type_labels)
+        self.movies = movies
+
+    @classmethod
+    def from_columns(cls, kinds: Iterable[int], names: Iterable[Optional[str]],
+                     years: Optional[Iterable[int]]=None, genres: Optional[Iterable[int]]=None,
+                     title_types: Optional[Iterable[int]]=None, genre_labels: Sequence[str]=(),
+                     title_type_labels: Sequence[str]=()) -> "VertexMetadata":
+        """
+        Builds the store from its columns, by vertex id
+        :param kinds: ACTOR or MOVIE
+        :param names: the names and titles
+        :param years: the start years, None to leave the column out
+        :param genres: the genre bitmasks, None to leave the column out
+        :param title_types: the title type codes, None to leave the column out
+        :param genre_labels: the genre of each bit
+        :param title_type_labels: the title type of each code
+        :return: a VertexMetadata
+        """
+        return cls(array(KIND_TYPE, kinds), StringPool.from_strings(names),
+                   None if years is None else array(YEAR_TYPE, years),
+                   None if genres is None else array(GENRE_TYPE, genres),
+                   None if title_types is None else array(TITLE_TYPE_CODE, title_types),
+                   genre_labels, title_type_labels)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, vertex: int) -> str:
+        return self.names[vertex]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def name(self, vertex: Optional[int]) -> Optional[str]:
+        """
+        Gets the name of an actor or the title of a movie
+        :param vertex: the vertex id (None gives None, as the start of a prev dictionary)
+        :return: the name
+        """
+        return None if vertex is None else self.names[vertex]
+
+    def kind(self, vertex: int) -> int:
+        return self.kinds[vertex]
+
+    def is_actor(self, vertex: int) -> bool:
+        return self.kinds[vertex] == ACTOR
+
+    def is_movie(self, vertex: int) -> bool:
+        return self.kinds[vertex] == MOVIE
+
+    def year(self, vertex: int) -> Optional[int]:
+        """
+        Gets the start year of a movie
+        :param vertex: the vertex id
+        :return: the year, or None if it is unknown or the column is missing
+        """
+        if self.years is None or self.years[vertex] == NO_YEAR:
+            return None
+        return self.years[vertex]
+
+    def genre_names(self, vertex: int) -> List[str]:
+        """
+        Gets the genres of a movie
+        :param vertex: the vertex id
+        :return: the genre names (empty if the column is missing)
+        """
+        if self.genres is None:
+            return []
+        return genre_names(self.genres[vertex], self.genre_labels)
+
+    def genre_mask(self, genres: Iterable[str]) -> int:
+        """
+        Gets the bitmask of some genres, to test against the genres column
+        :param genres: the genre names
+        :return: the bitmask; ValueError for an unknown genre
+        """
+        mask = 0
+        for genre in genres:
+            if genre not in self.genre_labels:
+                raise ValueError("Unknown genre: %s" % genre)
+            mask |= 1 << self.genre_labels.index(genre)
+        return mask
+
+    def title_type(self, vertex: int) -> Optional[str]:
+        """
+        Gets the title type of a movie
+        :param vertex: the vertex id
+        :return: the title type, or None for the actors or if the column is missing
+        """
+        if self.title_types is None or self.kinds[vertex] != MOVIE:
+            return None
+        return self.title_type_labels[self.title_types[vertex]]
+
+    def sections(self, prefix: str) -> list:
+        """
+        Lists the columns to write into a snapshot file
+        :param prefix: the prefix of the section names
+        :return: the (name, typecode, values) sections
+        """
+        sections = [(prefix + "_offsets", 'q', self.names.offsets), (prefix + "_bytes", 'B', self.names.data),
+                    (prefix + "_kinds", KIND_TYPE, self.kinds)]
+        for column, typecode in (("years", YEAR_TYPE), ("genres", GENRE_TYPE), ("title_types", TITLE_TYPE_CODE)):
+            values = getattr(self, column)
+            if values is not None:
+                sections.append((prefix + "_" + column, typecode, values))
+        if self.movies is not None:
+            sections += self.movies.sections(prefix + "_movies")
+        return sections
+
+    def header(self) -> dict:
+        header = {"genre_labels": self.genre_labels, "title_type_labels": self.title_type_labels}
+        if self.movies is not None:
+            header["movie_genre_labels"] = self.movies.genre_labels
+        return header
+
+    @classmethod
+    def from_sections(cls, sections: dict, prefix: str, header: dict) -> "VertexMetadata":
+        """
+        Builds the store over the columns of a snapshot file, without copying them
+        :param sections: the mapped sections by name
+        :param prefix: the prefix of the section names
+        :param header: what header() gave when the file was written
+        :return: a VertexMetadata
+        """
+        movies = None
+        if "movie_genre_labels" in header:
+            movies = MovieTable.from_sections(sections, prefix + "_movies", header["movie_genre_labels"])
+        return cls(sections[prefix + "_kinds"],
+                   StringPool(sections[prefix + "_offsets"], sections[prefix + "_bytes"]),
+                   sections.get(prefix + "_years"), sections.get(prefix + "_genres"),
+                   sections.get(prefix + "_title_types"),
+                   header["genre_labels"], header["title_type_labels"], movies)
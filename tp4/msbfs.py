@@ -0,0 +1,103 @@
+from typing import Iterable, List
+
+BATCH_SIZE = 64
+
+
+def _add_mask(planes: List[int], mask: int) -> None:
+    """
+    Adds one to the counter of every source set in mask. The counters are
+    bit-sliced: bit s of planes[b] is bit b of the counter of source s, so one
+    call costs a few big-integer operations whatever the number of sources.
+    :param planes: the counter bit planes
+    :param mask: the sources to count
+    """
+    carry = mask
+    for b in range(len(planes)):
+        plane = planes[b]
+        planes[b] = plane ^ carry
+        carry &= plane
+        if not carry:
+            return
+    planes.append(carry)
+
+
+def _read_counts(planes: List[int], num_sources: int) -> List[int]:
+    """
+    Reads back the per-source counters from their bit planes
+    :param planes: the counter bit planes
+    :param num_sources: the number of sources
+    :return: the counter of each source
+    """
+    counts = [0] * num_sources
+    for b, plane in enumerate(planes):
+        while plane:
+            low = plane & -plane
+            counts[low.bit_length() - 1] += 1 << b
+            plane ^= low
+    return counts
+
+
+def multi_source_bfs(graph, sources: List[int]) -> List[dict]:
+    """
+    Runs one Breadth First Search per source in a single sweep. Every vertex
+    keeps a bitset of the sources that reached it, so each adjacency list is
+    scanned once per level for all the sources together.
+    :param graph: the graph, a CSRGraph (see Graph.freeze)
+    :param sources: the source vertex ids (any number; 64 is a good batch)
+    :return: for each source, its eccentricity, the sum of its distances, the number of
+    vertices it reaches (itself included) and the number of vertices at each distance
+    """
+    seen = [0] * graph.num_vertices()
+    visit = {}
+    for i, source in enumerate(sources):
+        seen[source] |= 1 << i
+        visit[source] = visit.get(source, 0) | (1 << i)
+
+    histograms = [[1] for _ in sources]
+    level = 0
+    while visit:
+        level += 1
+        reached = {}
+        for v, mask in visit.items():
+            for w in graph.neighbor_slice(v):
+                reached[w] = reached.get(w, 0) | mask
+        visit = {}
+        planes = []
+        for w, mask in reached.items():
+            new = mask & ~seen[w]
+            if new:
+                seen[w] |= new
+                visit[w] = new
+                _add_mask(planes, new)
+        for i, count in enumerate(_read_counts(planes, len(sources))):
+            if count:
+                histograms[i].append(count)
+
+    results = []
+    for source, histogram in zip(sources, histograms):
+        results.append({
+            "source": source,
+            "eccentricity": len(histogram) - 1,
+            "total_distance": sum(d * count for d, count in enumerate(histogram)),
+            "reached": sum(histogram),
+            "histogram": histogram,
+        })
+    return results
+
+
+def msbfs_sweep(graph, sources: Iterable[int], batch_size: int=BATCH_SIZE):
+    """
+    Runs multi_source_bfs over any number of sources, batch_size at a time
+    :param graph: the graph, a CSRGraph
+    :param sources: the source vertex ids
+    :param batch_size: the number of sources per sweep
+    :return: an iterator of the per-source results
+    """
+    batch = []
+    for source in sources:
+        batch.append(source)
+        if len(batch) == batch_size:
+            yield from multi_source_bfs(graph, batch)
+            batch = []
+    if batch:
+        yield from multi_source_bfs(graph, batch)
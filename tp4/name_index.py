@@ -0,0 +1,210 @@
+import unicodedata
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+FUZZY_DISTANCE = 2
+FUZZY_PREFIX = 7
+
+
+def normalize(name: Optional[str]) -> str:
+    """
+    Folds a name for searching: no accents, no case, single spaces
+    :param name: the name
+    :return: the folded name
+    """
+    if not name:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def _deletes(word: str, distance: int) -> set:
+    """
+    Gets the strings obtained by deleting up to distance characters of a word
+    """
+    result = {word}
+    level = result
+    for _ in range(distance):
+        level = {w[:i] + w[i + 1:] for w in level for i in range(len(w))}
+        result |= level
+    return result
+
+
+def edit_distance(word1: str, word2: str, limit: int) -> int:
+    """
+    Levenshtein distance, calculated only on the diagonal band that can stay within the limit
+    :param word1: the first string
+    :param word2: the second string
+    :param limit: the maximum distance of interest
+    :return: the distance, or limit + 1 if it is greater than the limit
+    """
+    if abs(len(word1) - len(word2)) > limit:
+        return limit + 1
+    if len(word1) > len(word2):
+        word1, word2 = word2, word1
+    over = limit + 1
+    previous = list(range(len(word2) + 1))
+    for i, c1 in enumerate(word1, 1):
+        low, high = max(1, i - limit), min(len(word2), i + limit)
+        current = [over] * (len(word2) + 1)
+        current[0] = i if i <= limit else over
+        best = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (c1 != word2[j - 1])
+            cost = min(cost, previous[j] + 1, current[j - 1] + 1)
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > limit:
+            return over
+        previous = current
+    return min(previous[len(word2)], over)
+
+
+class NameIndex:
+    """
+    Name lookups over the vertices of a graph (actors, movies or both):
+    exact names with duplicates, accent and case insensitive prefixes, fuzzy
+    search within an edit distance and id to name resolution in batches.
+
+    The folded names are kept sorted once, so a prefix search is a binary search.
+    The fuzzy search uses symmetric deletes (as SymSpell) of the first FUZZY_PREFIX
+    characters, built on the first fuzzy query, and checks the candidates with a
+    banded edit distance.
+    """
+    def __init__(self, vertices: Sequence[Any], names: Sequence[Optional[str]], name_of=None):
+        """
+        :param vertices: the indexed vertices
+        :param names: the name of each indexed vertex
+        :param name_of: the names by vertex for the batch resolution (a dict, or a
+        sequence indexed by the vertex ids of a CSRGraph); by default built from the pairs
+        """
+        self._vertices = list(vertices)
+        self._names = list(names)
+        self._name_of = name_of if name_of is not None else dict(zip(self._vertices, self._names))
+        self._exact = {}
+        folded = {}
+        for position, name in enumerate(self._names):
+            self._exact.setdefault(name, []).append(position)
+            folded.setdefault(normalize(name), []).append(position)
+        self._keys = sorted(folded.keys())
+        self._positions = [folded[key] for key in self._keys]
+        self._deletes = None
+        self._fuzzy_distance = None
+
+    @classmethod
+    def from_graph(cls, graph, predicate: Optional[Callable[[Any], bool]]=None) -> "NameIndex":
+        """
+        Indexes the vertex data of a graph
+        :param graph: the graph
+        :param predicate: index only the vertices it accepts (e.g. the actors), None for all
+        :return: a NameIndex
+        """
+        vertices = [v for v in graph.get_vertices() if predicate is None or predicate(v)]
+        names = [graph.get_vertex_data(v) for v in vertices]
+        name_of = None
+        if isinstance(graph.get_vertices(), range) and hasattr(graph, "vertex_data"):
+            # Integer ids: read the names straight from the graph data
+            name_of = graph.vertex_data
+        return cls(vertices, names, name_of)
+
+    def __len__(self) -> int:
+        return len(self._vertices)
+
+    def lookup(self, name: str) -> List[Any]:
+        """
+        Finds the vertices with exactly this name
+        :param name: the name
+        :return: the vertices, in the order they were indexed
+        """
+        return [self._vertices[p] for p in self._exact.get(name, ())]
+
+    def prefix(self, text: str, limit: Optional[int]=None) -> List[Any]:
+        """
+        Finds the vertices whose name starts with a text, ignoring case and accents
+        :param text: the beginning of the name
+        :param limit: the maximum number of vertices (None for all)
+        :return: the vertices, by folded name
+        """
+        key = normalize(text)
+        result = []
+        i = bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i].startswith(key):
+            for p in self._positions[i]:
+                if limit is not None and len(result) >= limit:
+                    return result
+                result.append(self._vertices[p])
+            i += 1
+        return result
+
+    def _build_deletes(self, distance: int) -> None:
+        deletes = {}
+        # The keys are sorted, so the keys with the same prefix come together
+        prefix, variants = None, ()
+        for i, key in enumerate(self._keys):
+            if key[:FUZZY_PREFIX] != prefix:
+                prefix = key[:FUZZY_PREFIX]
+                variants = _deletes(prefix, distance)
+            for deleted in variants:
+                deletes.setdefault(deleted, []).append(i)
+        self._deletes = deletes
+        self._fuzzy_distance = distance
+
+    def fuzzy(self, text: str, distance: int=FUZZY_DISTANCE,
+              limit: Optional[int]=None) -> List[Tuple[Any, int]]:
+        """
+        Finds the vertices whose name is within an edit distance of a text, ignoring case and accents
+        :param text: the name
+        :param distance: the maximum edit distance
+        :param limit: the maximum number of vertices (None for all)
+        :return: the (vertex, distance) pairs, closest first
+        """
+        if self._deletes is None or self._fuzzy_distance < distance:
+            self._build_deletes(distance)
+        key = normalize(text)
+        candidates = set()
+        for deleted in _deletes(key[:FUZZY_PREFIX], distance):
+            candidates.update(self._deletes.get(deleted, ()))
+        matches = []
+        for i in candidates:
+            d = edit_distance(key, self._keys[i], distance)
+            if d <= distance:
+                matches.append((d, self._keys[i], i))
+        matches.sort()
+        result = []
+        for d, _, i in matches:
+            for p in self._positions[i]:
+                if limit is not None and len(result) >= limit:
+                    return result
+                result.append((self._vertices[p], d))
+        return result
+
+    def name(self, vertex: Any) -> Optional[str]:
+        """
+        Gets the name of a vertex
+        :param vertex: the vertex
+        :return: the name, None if the vertex is unknown (or None, as the start of a prev path)
+        """
+        if isinstance(self._name_of, dict):
+            return self._name_of.get(vertex)
+        return None if vertex is None else self._name_of[vertex]
+
+    def names(self, vertices) -> List[Optional[str]]:
+        """
+        Gets the names of several vertices
+        :param vertices: the vertices (any iterable, e.g. an array of ids)
+        :return: the names, in the same order
+        """
+        name_of = self._name_of
+        if isinstance(name_of, dict):
+            return [name_of.get(v) for v in vertices]
+        return [name_of[v] for v in vertices]
+
+    def names_dict(self, values: Dict[Any, Any]) -> Dict[Optional[str], Any]:
+        """
+        Replaces the vertex keys of a dictionary with their names
+        :param values: the values by vertex
+        :return: the values by name
+        """
+        return dict(zip(self.names(values.keys()), values.values()))
@@ -0,0 +1,215 @@
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from collections import deque
+from typing import Optional
+
+MAGIC = b"PLLINDEX"
+VERSION = 1
+PREFIX = struct.Struct("<8sII")
+ALIGNMENT = 8
+OFFSET_TYPE = 'q'
+HUB_TYPE = 'i'
+DIST_TYPE = 'B'
+MAX_DIST = 0xFF
+
+
+class LabelIndex:
+    """
+    Exact hop distances by pruned landmark labeling (a 2-hop cover). Every vertex
+    keeps a label of (hub, distance) entries, sorted by hub rank, such that every
+    shortest path goes through a hub of both ends; the distance of a pair is the
+    minimum over the hubs they share, found by merging the two labels.
+
+    The hubs are taken by decreasing degree, and the BFS of each hub skips the
+    vertices whose distance the labels already give, so the labels stay small on
+    graphs with high degree vertices as the co-star and actor-movie graphs.
+    The labels are three flat arrays (offsets, hubs, distances) over CSRGraph ids,
+    saved with the fingerprint of the graph they were built on.
+    """
+    def __init__(self, offsets, hubs, dists, bipartite: bool=False, build_time: float=0.0,
+                 fingerprint: Optional[str]=None):
+        self.offsets = offsets
+        self.hubs = hubs
+        self.dists = dists
+        self.bipartite = bipartite
+        self.build_time = build_time
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, graph, bipartite: bool=False) -> "LabelIndex":
+        """
+        Builds the labels of a graph
+        :param graph: the graph, a CSRGraph
+        :param bipartite: the graph is the actor-movie graph; distances are halved as in sep_rate
+        :return: a LabelIndex
+        """
+        start_time = time.perf_counter()
+        n = graph.num_vertices()
+        order = sorted(range(n), key=graph.degree, reverse=True)
+        label_hubs = [array(HUB_TYPE) for _ in range(n)]
+        label_dists = [array(DIST_TYPE) for _ in range(n)]
+        # The distances of the current root to its own hubs, by hub rank
+        root_dist = array('i', [-1]) * n
+        for rank, root in enumerate(order):
+            root_hubs, root_dists = label_hubs[root], label_dists[root]
+            for hub, d in zip(root_hubs, root_dists):
+                root_dist[hub] = d
+            dist = {root: 0}
+            queue = deque([root])
+            while queue:
+                v = queue.popleft()
+                d = dist[v]
+                pruned = False
+                for hub, dv in zip(label_hubs[v], label_dists[v]):
+                    dr = root_dist[hub]
+                    if dr != -1 and dr + dv <= d:
+                        pruned = True
+                        break
+                if pruned:
+                    continue
+                if d > MAX_DIST:
+                    raise OverflowError("Distance %s does not fit in the labels" % d)
+                label_hubs[v].append(rank)
+                label_dists[v].append(d)
+                for w in graph.get_neighbors(v):
+                    if w not in dist:
+                        dist[w] = d + 1
+                        queue.append(w)
+            for hub in root_hubs:
+                root_dist[hub] = -1
+
+        offsets = array(OFFSET_TYPE, [0])
+        hubs, dists = array(HUB_TYPE), array(DIST_TYPE)
+        for v in range(n):
+            hubs.extend(label_hubs[v])
+            dists.extend(label_dists[v])
+            offsets.append(len(hubs))
+        return cls(offsets, hubs, dists, bipartite, time.perf_counter() - start_time, graph.fingerprint())
+
+    def num_vertices(self) -> int:
+        return len(self.offsets) - 1
+
+    def distance(self, vertex1: int, vertex2: int) -> int:
+        """
+        Calculates the hop distance between two vertices, as bfs
+        :param vertex1: the first vertex id
+        :param vertex2: the second vertex id
+        :return: the distance, -1 if they are not connected
+        """
+        offsets, hubs, dists = self.offsets, self.hubs, self.dists
+        i, end1 = offsets[vertex1], offsets[vertex1 + 1]
+        j, end2 = offsets[vertex2], offsets[vertex2 + 1]
+        best = -1
+        while i < end1 and j < end2:
+            hub1, hub2 = hubs[i], hubs[j]
+            if hub1 == hub2:
+                d = dists[i] + dists[j]
+                if best == -1 or d < best:
+                    best = d
+                i += 1
+                j += 1
+            elif hub1 < hub2:
+                i += 1
+            else:
+                j += 1
+        return best
+
+    def separation(self, vertex1: int, vertex2: int) -> int:
+        """
+        Calculates the separation between two vertices: the distance, halved on the
+        actor-movie graph as separation_rate does
+        :param vertex1: the first vertex id
+        :param vertex2: the second vertex id
+        :return: the separation, -1 if they are not connected
+        """
+        d = self.distance(vertex1, vertex2)
+        if d == -1 or not self.bipartite:
+            return d
+        return int(d / 2)
+
+    def stats(self) -> dict:
+        """
+        Describes the size of the index
+        :return: the number of vertices and label entries, the average label size,
+        the size in bytes and the build time in seconds
+        """
+        n, entries = self.num_vertices(), len(self.hubs)
+        size = (len(self.offsets) * self.offsets.itemsize + entries * self.hubs.itemsize
+                + entries * self.dists.itemsize)
+        return {"vertices": n, "entries": entries, "average_label": entries / n if n else 0.0,
+                "bytes": size, "build_time": self.build_time}
+
+    def save(self, path: str) -> None:
+        """
+        Writes the index into a file that load maps back
+        :param path: the file path
+        """
+        sections = [("offsets", OFFSET_TYPE, self.offsets), ("hubs", HUB_TYPE, self.hubs),
+                    ("dists", DIST_TYPE, self.dists)]
+        header = {"bipartite": self.bipartite, "build_time": self.build_time, "graph": self.fingerprint,
+                  "sections": {}}
+        position = 0
+        for name, typecode, values in sections:
+            header["sections"][name] = [position, len(values)]
+            position += -(-len(values) * array(typecode).itemsize // ALIGNMENT) * ALIGNMENT
+        header_bytes = json.dumps(header).encode("utf-8")
+        header_bytes += b" " * (-(PREFIX.size + len(header_bytes)) % ALIGNMENT)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+            file.write(header_bytes)
+            for name, typecode, values in sections:
+                data = memoryview(values).cast('B')
+                file.write(data)
+                file.write(b"\0" * (-len(data) % ALIGNMENT))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LabelIndex"]:
+        """
+        Maps an index file
+        :param path: the file path
+        :return: the LabelIndex, or None if the file is not a valid index
+        """
+        try:
+            with open(path, "rb") as file:
+                magic, version, header_len = PREFIX.unpack(file.read(PREFIX.size))
+                if magic != MAGIC or version != VERSION:
+                    return None
+                header = json.loads(file.read(header_len).decode("utf-8"))
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            base = PREFIX.size + header_len
+            views = {}
+            for name, typecode in (("offsets", OFFSET_TYPE), ("hubs", HUB_TYPE), ("dists", DIST_TYPE)):
+                start, count = header["sections"][name]
+                itemsize = array(typecode).itemsize
+                view = memoryview(mapped)[base + start:base + start + count * itemsize]
+                if len(view) != count * itemsize:
+                    # A truncated file
+                    return None
+                views[name] = view.cast(typecode)
+            return cls(views["offsets"], views["hubs"], views["dists"], header["bipartite"], header["build_time"],
+                       header.get("graph"))
+        except (OSError, struct.error, ValueError, KeyError, TypeError):
+            return None
+
+
+def cached_labels (graph, path: str, bipartite: bool=False) -> LabelIndex:
+    """
+    Loads the index of a graph from a file, building and saving it first if the
+    file is missing, damaged or was built for a different graph
+    :param graph: the graph, a CSRGraph
+    :param path: the index file
+    :param bipartite: the graph is the actor-movie graph
+    :return: the LabelIndex
+    """
+    index = LabelIndex.load(path)
+    if (index is None or index.num_vertices() != graph.num_vertices() or index.bipartite != bipartite
+            or index.fingerprint != graph.fingerprint()):
+        index = LabelIndex.build(graph, bipartite)
+        index.save(path)
+    return index
@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from components import ComponentIndex
+from functions import MOVIES_DATA_PATH, ACTORS_DATA_PATH, ACTORS_NAMES_PATH, is_actor
+from grafo_b import separation_rate, separation_path
+from name_index import NameIndex
+from snapshot import cached_graph, open_snapshot, snapshot_path, BIPARTITE
+
+HOST = "127.0.0.1"
+PORT = 8642
+TIMEOUT = 10.0
+WORKERS = 2
+KEVIN_BACON = "Kevin Bacon"
+
+# Traversals run in the worker processes, each with the snapshot mapped once
+_worker_graph = None
+
+
+def _init_worker (path):
+    # The snapshot the service mapped, so the vertex ids it resolved mean the same here
+    global _worker_graph
+    _worker_graph = open_snapshot(path)
+
+
+def _separation_worker (vertex1, vertex2):
+    return separation_rate(vertex1, vertex2, _worker_graph)
+
+
+def _path_worker (vertex1, vertex2):
+    return separation_path(vertex1, vertex2, _worker_graph)
+
+
+class QueryError(Exception):
+    """
+    A request that cannot be answered (sent back to the client as an error)
+    """
+
+
+class Stats:
+    """
+    Request counters: number of requests, errors and timeouts, latency and throughput
+    """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.by_op = {}
+
+    def record(self, op: str, seconds: float) -> None:
+        self.requests += 1
+        count, total, worst = self.by_op.get(op, (0, 0.0, 0.0))
+        self.by_op[op] = (count + 1, total + seconds, max(worst, seconds))
+
+    def as_dict(self) -> dict:
+        uptime = time.monotonic() - self.started
+        return {
+            "uptime": uptime,
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "throughput": self.requests / uptime if uptime else 0.0,
+            "latency": {op: {"count": count, "mean_ms": 1000 * total / count, "max_ms": 1000 * worst}
+                        for op, (count, total, worst) in self.by_op.items()},
+        }
+
+
+class QueryService:
+    """
+    Keeps the actor-movie graph loaded and answers line-delimited JSON requests:
+    one object per line with an "op" and its arguments, one object back per line.
+
+    Ops: separation (actor1, actor2), path (actor1, actor2), component (actor),
+    kevin_bacon (actor) and stats. Actors are given by IMDb id or exact name.
+    Separations and paths run in a process pool, so a slow query does not hold
+    the other connections; a query that takes longer than the timeout gets an
+    error (its worker finishes it in the background).
+    """
+    def __init__(self, paths=(MOVIES_DATA_PATH, ACTORS_DATA_PATH, ACTORS_NAMES_PATH),
+                 workers: int=WORKERS, timeout: float=TIMEOUT):
+        """
+        :param paths: the title-basics, title-principals and name-basics files
+        :param workers: the number of worker processes
+        :param timeout: the maximum seconds for a query
+        """
+        self.graph = cached_graph(BIPARTITE, *paths)
+        self.components = ComponentIndex.from_graph(self.graph)
+        self.biggest = self.components.components()[0] if self.components.num_components() else None
+        self.names = NameIndex.from_graph(self.graph, lambda v: is_actor(self.graph, v))
+        self.timeout = timeout
+        self.stats = Stats()
+        self.pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(snapshot_path(BIPARTITE, paths),))
+        self._actors = {}
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _vertex(self, key: Any) -> int:
+        """
+        Finds an actor by IMDb id or by exact name
+        :param key: the id or the name
+        :return: the vertex
+        """
+        if not isinstance(key, str):
+            raise QueryError("Actors must be given by IMDb id or name")
+        vertex = self.graph.vertex_id(key)
+        if vertex is None:
+            matches = self.names.lookup(key)
+            vertex = matches[0] if matches else None
+        if vertex is None or not is_actor(self.graph, vertex):
+            raise QueryError("Unknown actor: %s" % key)
+        return vertex
+
+    def _describe(self, vertex: int) -> dict:
+        return {"id": self.graph.vertex_label(vertex), "name": self.graph.get_vertex_data(vertex)}
+
+    def _component_actors(self, component: Any) -> int:
+        if component not in self._actors:
+            members = self.components.members(component)
+            self._actors[component] = sum(1 for v in members if is_actor(self.graph, v))
+        return self._actors[component]
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(self.pool, function, *args), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            raise QueryError("Timed out after %s seconds" % self.timeout)
+
+    async def _separation(self, vertex1: int, vertex2: int) -> int:
+        # Different components are answered here, without a traversal
+        if not self.components.same_component(vertex1, vertex2):
+            return -1
+        return await self._run(_separation_worker, vertex1, vertex2)
+
+    async def separation(self, request: dict) -> dict:
+        vertex1, vertex2 = self._vertex(request.get("actor1")), self._vertex(request.get("actor2"))
+        return {"separation": await self._separation(vertex1, vertex2)}
+
+    async def path(self, request: dict) -> dict:
+        vertex1, vertex2 = self._vertex(request.get("actor1")), self._vertex(request.get("actor2"))
+        if not self.components.same_component(vertex1, vertex2):
+            return {"separation": -1, "path": None}
+        rate, path = await self._run(_path_worker, vertex1, vertex2)
+        return {"separation": rate, "path": [self._describe(v) for v in path]}
+
+    async def component(self, request: dict) -> dict:
+        vertex = self._vertex(request.get("actor"))
+        component = self.components.component_of(vertex)
+        return {"component": self.graph.vertex_label(component),
+                "vertices": self.components.size(component),
+                "actors": self._component_actors(component),
+                "biggest": component == self.biggest}
+
+    async def kevin_bacon(self, request: dict) -> dict:
+        vertex = self._vertex(request.get("actor"))
+        kevin_bacon = self._vertex(KEVIN_BACON)
+        return {"separation": await self._separation(kevin_bacon, vertex)}
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answers one request
+        :param request: the decoded request
+        :return: the response, with the request id if it had one
+        """
+        start = time.perf_counter()
+        op = request.get("op") if isinstance(request, dict) else None
+        response = {"id": request.get("id")} if isinstance(request, dict) else {}
+        try:
+            if op == "stats":
+                result = self.stats.as_dict()
+            elif op in ("separation", "path", "component", "kevin_bacon"):
+                result = await getattr(self, op)(request)
+            else:
+                raise QueryError("Unknown op: %s" % op)
+            response.update(ok=True, result=result)
+        except QueryError as error:
+            self.stats.errors += 1
+            response.update(ok=False, error=str(error))
+        except Exception as error:
+            # A failed worker or op answers this request only, the connection goes on
+            self.stats.errors += 1
+            response.update(ok=False, error="%s: %s" % (type(error).__name__, error))
+        self.stats.record(op if isinstance(op, str) else "invalid", time.perf_counter() - start)
+        return response
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves one connection; its requests are answered concurrently, in the order they finish
+        """
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def answer(line):
+            try:
+                request = json.loads(line)
+            except ValueError:
+                self.stats.errors += 1
+                response = {"ok": False, "error": "Invalid JSON"}
+            else:
+                response = await self.handle(request)
+            async with lock:
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(answer(line))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, unix_path: Optional[str]=None, host: str=HOST, port: int=PORT):
+        """
+        Starts listening on a Unix socket, or on a localhost TCP port
+        :param unix_path: the socket path (None for TCP)
+        :param host: the TCP host
+        :param port: the TCP port (0 for any free port)
+        :return: the asyncio server
+        """
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self._client, path=unix_path)
+        return await asyncio.start_server(self._client, host, port)
+
+
+async def query (requests, unix_path: Optional[str]=None, host: str=HOST, port: int=PORT):
+    """
+    Sends requests to a running service and waits for all the responses
+    :param requests: the request dictionaries (give them an "id" to match the responses)
+    :param unix_path: the socket path (None for TCP)
+    :param host: the TCP host
+    :param port: the TCP port
+    :return: the responses, in the order they arrived
+    """
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    for request in requests:
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+async def _main (args):
+    service = QueryService(workers=args.workers, timeout=args.timeout)
+    server = await service.serve(args.unix, port=args.port)
+    print("Listening on", args.unix or "%s:%d" % (HOST, args.port))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Separation queries over the actor-movie graph")
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--port", type=int, default=PORT, help="localhost TCP port")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds per query")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import List, Optional, Sequence
+
+from csr_graph import CSRGraph
+from loader import IdLabels, read_data_compact
+from metadata import VertexMetadata
+from string_pool import StringPool
+
+MAGIC = b"IMDBSNAP"
+# 2: co-star edge items are movie numbers instead of interned titles
+# 3: the vertex data is a VertexMetadata (kinds, years, genres, title types)
+# 4: co-star snapshots keep a MovieTable
+VERSION = 4
+PREFIX = struct.Struct("<8sII")
+ALIGNMENT = 8
+COSTAR = "costar"
+BIPARTITE = "bipartite"
+CACHE_DIR = "./datasets/.cache"
+
+
+def fingerprint(paths: Sequence[str], use_hash: bool=False) -> List[dict]:
+    """
+    Describes the source files so that a snapshot can tell when they change
+    :param paths: the source file paths
+    :param use_hash: also hash the file contents (slow on the full dumps)
+    :return: the size, mtime and optionally the sha1 of each file
+    """
+    result = []
+    for path in paths:
+        stat = os.stat(path)
+        entry = {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if use_hash:
+            digest = hashlib.sha1()
+            with open(path, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+            entry["sha1"] = digest.hexdigest()
+        result.append(entry)
+    return result
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _string_sections(name: str, strings) -> list:
+    pool = strings if isinstance(strings, StringPool) else StringPool.from_strings(strings)
+    return [(name + "_offsets", 'q', pool.offsets), (name + "_bytes", 'B', pool.data)]
+
+
+def save_snapshot(graph: CSRGraph, path: str, variant: str, sources: Optional[List[dict]]=None) -> None:
+    """
+    Writes a CSR graph to a binary snapshot file. The file is written next to
+    its final path and moved into place, so readers never see a partial file.
+    :param graph: the graph
+    :param path: the snapshot path
+    :param variant: the graph variant (COSTAR or BIPARTITE)
+    :param sources: the fingerprint of the source files
+    """
+    sections = [("indptr", 'q', graph.indptr), ("indices", 'i', graph.indices),
+                ("edge_ptr", 'q', graph.edge_ptr), ("edge_items", 'i', graph.edge_items)]
+    header = {"variant": variant, "sources": sources or [], "sections": {}}
+    labels = graph.labels
+    if isinstance(labels, IdLabels):
+        sections.append(("label_numbers", 'q', labels.numbers))
+        header["movie_start"] = labels.movie_start
+    else:
+        sections += _string_sections("labels", labels)
+    if graph.metadata is not None:
+        sections += graph.metadata.sections("data")
+        header["metadata"] = graph.metadata.header()
+    else:
+        sections += _string_sections("data", graph.vertex_data)
+    if graph.item_labels is not None:
+        sections += _string_sections("items", graph.item_labels)
+
+    offset = 0
+    for name, typecode, values in sections:
+        size = memoryview(values).nbytes
+        header["sections"][name] = [offset, typecode, size]
+        offset = _align(offset + size)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(PREFIX.size + len(header_bytes))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "wb") as file:
+        file.write(PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+        file.write(header_bytes)
+        for name, typecode, values in sections:
+            file.seek(data_start + header["sections"][name][0])
+            file.write(memoryview(values).cast('B'))
+    os.replace(tmp_path, path)
+
+
+def _read_prefix(path: str):
+    try:
+        with open(path, "rb") as file:
+            magic, version, header_len = PREFIX.unpack(file.read(PREFIX.size))
+            if magic != MAGIC or version != VERSION:
+                return None, 0
+            return json.loads(file.read(header_len).decode("utf-8")), header_len
+    except (OSError, struct.error, ValueError):
+        return None, 0
+
+
+def read_header(path: str) -> Optional[dict]:
+    """
+    Reads the header of a snapshot file
+    :param path: the snapshot path
+    :return: the header, or None if the file is missing or not a snapshot
+    """
+    return _read_prefix(path)[0]
+
+
+def open_snapshot(path: str) -> CSRGraph:
+    """
+    Opens a snapshot file as a read-only memory map. The arrays of the
+    returned graph are views over the mapped pages, so several processes
+    opening the same snapshot share them. The sections are checked against
+    the file size first, so a truncated file raises ValueError.
+    :param path: the snapshot path
+    :return: the CSRGraph
+    """
+    header, header_len = _read_prefix(path)
+    if header is None:
+        raise ValueError("Not a graph snapshot: %s" % path)
+    data_start = _align(PREFIX.size + header_len)
+    file_size = os.path.getsize(path)
+    try:
+        bounds = [(name, data_start + offset, typecode, size)
+                  for name, (offset, typecode, size) in header["sections"].items()]
+        for name, start, typecode, size in bounds:
+            if start < data_start or size < 0 or start + size > file_size or size % struct.calcsize(typecode):
+                raise ValueError("Damaged graph snapshot (section %s): %s" % (name, path))
+    except (KeyError, TypeError, struct.error):
+        raise ValueError("Damaged graph snapshot header: %s" % path)
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapped)
+    sections = {}
+    for name, start, typecode, size in bounds:
+        sections[name] = buffer[start:start + size].cast(typecode)
+    indptr, edge_ptr = sections.get("indptr"), sections.get("edge_ptr")
+    if (indptr is None or edge_ptr is None or len(indptr) == 0 or len(edge_ptr) != len(sections["indices"]) + 1
+            or indptr[-1] != len(sections["indices"]) or edge_ptr[-1] != len(sections["edge_items"])):
+        raise ValueError("Damaged graph snapshot: %s" % path)
+
+    def strings(name):
+        if name + "_offsets" not in sections:
+            return None
+        return StringPool(sections[name + "_offsets"], sections[name + "_bytes"])
+
+    if "label_numbers" in sections:
+        labels = IdLabels(sections["label_numbers"], header["movie_start"])
+    else:
+        labels = strings("labels")
+    if "metadata" in header:
+        data = VertexMetadata.from_sections(sections, "data", header["metadata"])
+    else:
+        data = strings("data")
+    graph = CSRGraph(sections["indptr"], sections["indices"], labels, data,
+                     sections["edge_ptr"], sections["edge_items"], strings("items"))
+    graph.snapshot_path = path
+    return graph
+
+
+def snapshot_path(variant: str, paths: Sequence[str], cache_dir: str=CACHE_DIR) -> str:
+    """
+    Gets the snapshot path for a graph variant built from some source files
+    :param variant: the graph variant (COSTAR or BIPARTITE)
+    :param paths: the source file paths
+    :param cache_dir: the snapshot directory
+    :return: the snapshot path
+    """
+    key = hashlib.sha1("\n".join(os.path.abspath(p) for p in paths).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "%s-%s.snap" % (variant, key))
+
+
+def cached_graph(variant: str, movies_file: str, actors_file: str, actors_name_file: str,
+                 cache_dir: str=CACHE_DIR, use_hash: bool=False) -> CSRGraph:
+    """
+    Loads a graph variant from its snapshot, rebuilding the snapshot first if
+    it is missing, damaged or the source files changed since it was written
+    :param variant: COSTAR (load_graph) or BIPARTITE (load_graph_b)
+    :param movies_file: the title-basics file
+    :param actors_file: the title-principals file
+    :param actors_name_file: the name-basics file
+    :param cache_dir: the snapshot directory
+    :param use_hash: also compare the file contents hash
+    :return: the CSRGraph, mapped from the snapshot
+    """
+    if variant not in (COSTAR, BIPARTITE):
+        raise ValueError("Unknown graph variant: %s" % variant)
+    paths = (movies_file, actors_file, actors_name_file)
+    path = snapshot_path(variant, paths, cache_dir)
+    sources = fingerprint(paths, use_hash)
+    header = read_header(path)
+    if header is not None and header.get("variant") == variant and header.get("sources") == sources:
+        try:
+            return open_snapshot(path)
+        except ValueError:
+            # A damaged snapshot is written again
+            pass
+    imdb_data = read_data_compact(*paths)
+    print("Loading graph")
+    graph = CSRGraph.from_imdb_data(imdb_data, bipartite=(variant == BIPARTITE))
+    del imdb_data
+    save_snapshot(graph, path, variant, sources)
+    return open_snapshot(path)
@@ -0,0 +1,46 @@
+from array import array
+from typing import Iterable, Optional
+
+OFFSET_TYPE = 'q'
+
+
+class StringPool:
+    """
+    Read-only sequence of strings stored back to back in one UTF-8 buffer.
+    String i is data[offsets[i]:offsets[i + 1]]; offsets and data can be arrays
+    or memoryviews over a mapped file.
+    """
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = memoryview(data)
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[Optional[str]]) -> "StringPool":
+        """
+        Builds a pool from a sequence of strings (None is stored as "")
+        :param strings: the strings
+        :return: a StringPool
+        """
+        offsets = array(OFFSET_TYPE, [0])
+        data = bytearray()
+        for string in strings:
+            if string is not None:
+                data += string.encode("utf-8")
+            offsets.append(len(data))
+        return cls(offsets, data)
+
+    def __reduce__(self):
+        # A pool over a mapped file is pickled as a copy of its buffers
+        return StringPool, (array(OFFSET_TYPE, self.offsets), bytes(self.data))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        if position < 0:
+            position += len(self)
+        return str(self.data[self.offsets[position]:self.offsets[position + 1]], "utf-8")
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
@@ -0,0 +1,139 @@
+import os
+import random
+import sys
+from bisect import bisect_left
+from itertools import accumulate
+
+from loader import format_id, ACTOR_PREFIX, MOVIE_PREFIX
+
+MOVIES_FILE = "title-basics-f.tsv"
+ACTORS_FILE = "title-principals-f.tsv"
+ACTORS_NAME_FILE = "name-basics-f.tsv"
+
+FIRST_YEAR = 1920
+LAST_YEAR = 2023
+CAST_EXPONENT = 2.2
+MAX_CAST = 60
+POPULARITY_EXPONENT = 1.2
+ACTORS_PER_MOVIE = 2.5
+KEVIN_BACON = ("nm0000102", "Kevin Bacon")
+
+TITLE_TYPES = (("movie", 0.6), ("short", 0.15), ("tvMovie", 0.1), ("tvSeries", 0.1), ("video", 0.05))
+GENRES = ("Drama", "Comedy", "Action", "Romance", "Thriller", "Crime", "Horror", "Adventure",
+          "Documentary", "Family", "Fantasy", "Sci-Fi", "Mystery", "Western", "Musical", "War")
+FIRST_NAMES = ("John", "Mary", "José", "Ana", "Kevin", "Zoë", "Chloé", "Björn", "Søren", "Renée",
+               "Michael", "Laura", "André", "Inés", "Paul", "Sofía", "Jürgen", "Amélie", "Lucas", "Emma",
+               "Noël", "Raúl", "Ingrid", "Tomás", "Grace", "Hiroshi", "Yuki", "Olga", "Peter", "Ruth")
+LAST_NAMES = ("Smith", "García", "Müller", "Rossi", "Dubois", "Bacon", "Nakamura", "Kowalski",
+              "Fernández", "O'Brien", "Johansson", "Silva", "Novák", "Brown", "López", "Schröder",
+              "Martin", "Ivanova", "Costa", "Jensen", "Pérez", "Lefèvre", "Kim", "Walsh", "Horvat")
+WORDS = ("Night", "Love", "City", "Last", "Blue", "River", "Dark", "Summer", "King", "Road", "Dream",
+         "Storm", "Silent", "Golden", "Return", "Secret", "Fire", "House", "Time", "Heart")
+
+
+def power_law (rng, exponent, minimum, maximum) -> int:
+    """
+    Draws an integer from a discrete power law P(k) ~ k^-exponent, between two bounds
+    """
+    while True:
+        value = int(minimum * (1 - rng.random()) ** (-1 / (exponent - 1)))
+        if value <= maximum:
+            return value
+
+
+def _careers (rng, actors):
+    """
+    Draws the career of every actor: first and last active year and a popularity weight
+    """
+    careers = []
+    for _ in range(actors):
+        start = rng.randint(FIRST_YEAR, LAST_YEAR)
+        length = min(power_law(rng, 2.0, 1, 60), LAST_YEAR - start + 1)
+        careers.append((start, start + length - 1, power_law(rng, POPULARITY_EXPONENT + 1, 1, 10000)))
+    return careers
+
+
+def _active_by_year (careers):
+    """
+    Groups the actors by active year, with the cumulative popularity of each group
+    """
+    by_year = {}
+    for actor, (start, end, popularity) in enumerate(careers):
+        for year in range(start, end + 1):
+            by_year.setdefault(year, []).append(actor)
+    return {year: (members, list(accumulate(careers[a][2] for a in members)))
+            for year, members in by_year.items()}
+
+
+def _cast (rng, active, size):
+    """
+    Chooses distinct actors of an active group, the popular ones more often
+    """
+    members, cumulative = active
+    size = min(size, len(members))
+    chosen = set()
+    total = cumulative[-1]
+    while len(chosen) < size:
+        chosen.add(members[bisect_left(cumulative, rng.random() * total)])
+    return chosen
+
+
+def generate_dataset (directory, movies = 10000, actors = None, seed = 0):
+    """
+    Writes synthetic title-basics, title-principals and name-basics files with the
+    columns of the IMDb datasets. Cast sizes follow a power law (most titles have
+    a few actors, some have large ensembles), every actor has a career of active
+    years and a power law popularity, so a few actors appear in many titles.
+    Kevin Bacon is always one of the actors, with a long and busy career.
+    :param directory: the output directory
+    :param movies: the number of titles (all title types)
+    :param actors: the number of actors (by default ACTORS_PER_MOVIE per title)
+    :param seed: the random seed; the same arguments always write the same files
+    :return: the paths of the title-basics, title-principals and name-basics files
+    """
+    rng = random.Random(seed)
+    actors = actors if actors is not None else max(2, int(movies * ACTORS_PER_MOVIE))
+    careers = _careers(rng, actors)
+    careers[0] = (1978, LAST_YEAR, 50)
+    active = _active_by_year(careers)
+    years = sorted(active.keys())
+    kinds, kind_weights = zip(*TITLE_TYPES)
+    os.makedirs(directory, exist_ok=True)
+    paths = tuple(os.path.join(directory, name) for name in (MOVIES_FILE, ACTORS_FILE, ACTORS_NAME_FILE))
+
+    def actor_id(actor):
+        return KEVIN_BACON[0] if actor == 0 else format_id(ACTOR_PREFIX, actor + 1000000)
+
+    with open(paths[0], "w", encoding="utf-8", newline="") as titles, \
+            open(paths[1], "w", encoding="utf-8", newline="") as principals:
+        titles.write("tconst\ttitleType\tprimaryTitle\toriginalTitle\tisAdult\tstartYear\tendYear\t"
+                     "runtimeMinutes\tgenres\n")
+        principals.write("tconst\tordering\tnconst\tcategory\tjob\tcharacters\n")
+        for m in range(movies):
+            movie_id = format_id(MOVIE_PREFIX, m + 1)
+            year = years[min(int(len(years) * rng.random() ** 0.7), len(years) - 1)]
+            kind = rng.choices(kinds, kind_weights)[0]
+            title = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+            genres = ",".join(sorted(rng.sample(GENRES, rng.randint(1, 3))))
+            runtime = rng.randint(5, 30) if kind == "short" else rng.randint(70, 180)
+            titles.write(f"{movie_id}\t{kind}\t{title}\t{title}\t0\t{year}\t\\N\t{runtime}\t{genres}\n")
+            cast = _cast(rng, active[year], power_law(rng, CAST_EXPONENT, 1, MAX_CAST))
+            for ordering, actor in enumerate(sorted(cast), 1):
+                category = "actor" if actor % 2 == 0 else "actress"
+                principals.write(f"{movie_id}\t{ordering}\t{actor_id(actor)}\t{category}\t\\N\t\\N\n")
+
+    with open(paths[2], "w", encoding="utf-8", newline="") as names:
+        names.write("nconst\tprimaryName\tbirthYear\tdeathYear\tprimaryProfession\tknownForTitles\n")
+        for actor, (start, _, _) in enumerate(careers):
+            name = KEVIN_BACON[1] if actor == 0 else f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            profession = "actor" if actor % 2 == 0 else "actress"
+            names.write(f"{actor_id(actor)}\t{name}\t{start - rng.randint(18, 40)}\t\\N\t{profession}\t\\N\n")
+    return paths
+
+
+if __name__ == '__main__':
+    # Usage: synthetic.py directory [movies] [seed]
+    movies = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    for path in generate_dataset(sys.argv[1], movies, seed=seed):
+        print(path)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules of the package are imported flat, as the scripts run from tp4
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+import contextlib
+import io
+import json
+import os
+
+import pytest
+
+import apsp
+from apsp import HOPS, WEIGHTED, DistanceStore, build_distance_store
+from csr_graph import CSRGraph
+from functions import bfs, dijkstra
+from loader import read_data_compact
+from synthetic import generate_dataset
+
+
+@pytest.fixture(scope="module")
+def graphs(tmp_path_factory):
+    paths = generate_dataset(str(tmp_path_factory.mktemp("apsp")), 150)
+    with contextlib.redirect_stdout(io.StringIO()):
+        imdb_data = read_data_compact(*paths)
+        return {HOPS: CSRGraph.from_imdb_data(imdb_data, bipartite=True),
+                WEIGHTED: CSRGraph.from_imdb_data(imdb_data)}
+
+
+def _check(store, graph, metric):
+    for source in graph.get_vertices():
+        dist = bfs(graph, source) if metric == HOPS else dijkstra(graph, source)[0]
+        for target in graph.get_vertices():
+            assert store.dist(source, target) == dist.get(target, -1)
+
+
+class _Interrupt(Exception):
+    pass
+
+
+@pytest.mark.parametrize("metric", [HOPS, WEIGHTED])
+def test_interrupted_build_resumes(graphs, metric, tmp_path, monkeypatch):
+    graph = graphs[metric]
+    directory = str(tmp_path / "store")
+    write_rows = apsp._write_rows
+    written = []
+    calls = []
+
+    def interrupted(directory, component, rows, row_bytes):
+        if len(calls) == 3:
+            raise _Interrupt()
+        calls.append(component)
+        write_rows(directory, component, rows, row_bytes)
+        written.extend(r for r, _ in rows)
+
+    monkeypatch.setattr(apsp, "CHUNK_ROWS", 4)
+    monkeypatch.setattr(apsp, "_write_rows", interrupted)
+    with pytest.raises(_Interrupt):
+        build_distance_store(graph, directory, metric)
+    assert not DistanceStore(directory).complete()
+
+    # The resumed build only calculates the rows left
+    resumed = []
+
+    def counted(directory, component, rows, row_bytes):
+        write_rows(directory, component, rows, row_bytes)
+        resumed.extend(r for r, _ in rows)
+
+    monkeypatch.setattr(apsp, "_write_rows", counted)
+    store = build_distance_store(graph, directory, metric)
+    assert store.complete()
+    rows = sum(size for size in store.manifest["sizes"] if size > 1)
+    assert len(resumed) == rows - len(written)
+    _check(store, graph, metric)
+
+
+def test_store_of_another_graph_is_rebuilt(graphs, tmp_path):
+    graph = graphs[HOPS]
+    directory = str(tmp_path / "store")
+    build_distance_store(graph, directory, HOPS)
+    manifest_path = os.path.join(directory, apsp.MANIFEST)
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    assert apsp._load_members(graph, directory, HOPS) is not None
+    manifest["graph"] = "0" * 40
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file)
+    assert apsp._load_members(graph, directory, HOPS) is None
+    assert apsp._load_members(graph, directory, WEIGHTED) is None
+    _check(build_distance_store(graph, directory, HOPS), graph, HOPS)
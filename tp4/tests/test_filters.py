@@ -0,0 +1,137 @@
+import contextlib
+import io
+import random
+
+import pytest
+
+from csr_graph import CSRGraph
+from filters import FilteredGraph, MovieFilter, filtered
+from functions import bfs, connected, dijkstra, read_data
+from grafo_a import load_graph
+from grafo_b import load_graph_b, separation_rate
+from loader import read_data_compact
+from metadata import parse_year
+from synthetic import generate_dataset
+
+FILTERS = [
+    MovieFilter(genres=["Drama"]),
+    MovieFilter(min_year=1990),
+    MovieFilter(genres=["Drama", "Comedy"], all_genres=True, max_year=2000),
+    MovieFilter(exclude=["Horror"]),
+    MovieFilter(genres=["Nope"]),
+]
+
+
+def _keeps(movie_filter, row):
+    genres = set() if row["genres"] in (None, "\\N") else set(row["genres"].split(","))
+    year = parse_year(row["startYear"])
+    if movie_filter.genres:
+        wanted = set(movie_filter.genres)
+        if not (wanted <= genres if movie_filter.all_genres else wanted & genres):
+            return False
+    if set(movie_filter.exclude) & genres:
+        return False
+    if movie_filter.min_year is not None or movie_filter.max_year is not None:
+        if not year:
+            return False
+        if movie_filter.min_year is not None and year < movie_filter.min_year:
+            return False
+        if movie_filter.max_year is not None and year > movie_filter.max_year:
+            return False
+    return True
+
+
+@pytest.fixture(scope="module")
+def data(tmp_path_factory):
+    paths = generate_dataset(str(tmp_path_factory.mktemp("filters")), 600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        movies, actors_by_movie, names = read_data(*paths)
+        imdb_data = read_data_compact(*paths)
+        graphs = {
+            "costar": load_graph(movies, actors_by_movie, names),
+            "bipartite": load_graph_b(movies, actors_by_movie, names),
+            "csr_costar": CSRGraph.from_imdb_data(imdb_data),
+            "csr_bipartite": CSRGraph.from_imdb_data(imdb_data, bipartite=True),
+        }
+    return movies, actors_by_movie, names, graphs
+
+
+def _rebuilt(data, movie_filter):
+    movies, actors_by_movie, names, _ = data
+    accepted = {movie_id: row for movie_id, row in movies.items() if _keeps(movie_filter, row)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        return load_graph(accepted, actors_by_movie, names), load_graph_b(accepted, actors_by_movie, names)
+
+
+def _label(graph, vertex):
+    return graph.vertex_label(vertex) if hasattr(graph, "vertex_label") else vertex
+
+
+def _labels(graph, result):
+    return {_label(graph, v): d for v, d in result.items()}
+
+
+@pytest.mark.parametrize("movie_filter", FILTERS, ids=repr)
+def test_filtered_traversals_match_rebuilt_graphs(data, movie_filter):
+    graphs = data[3]
+    costar, bipartite = _rebuilt(data, movie_filter)
+    rng = random.Random(1)
+    actors = sorted(v for v in graphs["bipartite"].get_vertices() if v[:2] == "nm")
+    for _ in range(8):
+        actor, other = rng.choice(actors), rng.choice(actors)
+        expected = bfs(bipartite, actor) if bipartite.vertex_exists(actor) else {actor: 0}
+        assert bfs(graphs["bipartite"], actor, movie_filter=movie_filter) == expected
+        csr = graphs["csr_bipartite"]
+        assert _labels(csr, bfs(csr, csr.vertex_id(actor), movie_filter=movie_filter)) == expected
+        if bipartite.vertex_exists(actor) and bipartite.vertex_exists(other):
+            separation = separation_rate(actor, other, bipartite)
+        else:
+            separation = 0 if actor == other else -1
+        assert separation_rate(csr.vertex_id(actor), csr.vertex_id(other), csr, movie_filter) == separation
+
+        if not graphs["costar"].vertex_exists(actor):
+            continue
+        expected = dijkstra(costar, actor)[0] if costar.vertex_exists(actor) else {actor: 0}
+        assert dijkstra(graphs["costar"], actor, movie_filter=movie_filter)[0] == expected
+        csr = graphs["csr_costar"]
+        assert _labels(csr, dijkstra(csr, csr.vertex_id(actor), movie_filter=movie_filter)[0]) == expected
+
+
+@pytest.mark.parametrize("movie_filter", FILTERS, ids=repr)
+def test_filtered_components_match_rebuilt_graphs(data, movie_filter):
+    graphs = data[3]
+    _, bipartite = _rebuilt(data, movie_filter)
+    expected = sorted(map(sorted, connected(list(bipartite.get_vertices()), bipartite)[1]))
+    for name in ("bipartite", "csr_bipartite"):
+        graph = graphs[name]
+        components = connected(list(graph.get_vertices()), graph, movie_filter=movie_filter)[1]
+        assert sorted(sorted(_label(graph, v) for v in component) for component in components) == expected
+
+
+def test_views_are_reused(data):
+    graph = data[3]["csr_costar"]
+    view = filtered(graph, MovieFilter(min_year=1990))
+    assert isinstance(view, FilteredGraph)
+    assert filtered(graph, MovieFilter(min_year=1990)) is view
+    assert filtered(view, MovieFilter(min_year=1990)) is view
+    assert filtered(graph, MovieFilter(min_year=1991)) is not view
+    assert filtered(graph, None) is graph
+
+
+def test_views_follow_graph_changes(data):
+    movies, actors_by_movie, names, _ = data
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph = load_graph_b(movies, actors_by_movie, names)
+    movie_filter = MovieFilter(exclude=["Horror"])
+    view = filtered(graph, movie_filter)
+    actor = next(v for v in graph.get_vertices() if v[:2] == "nm" and len(view.get_neighbors(v)) > 1)
+    movie = view.get_neighbors(actor)[0]
+    graph.remove_edge(actor, movie)
+    changed = filtered(graph, movie_filter)
+    assert changed is not view and movie not in changed.get_neighbors(actor)
+    assert filtered(graph, movie_filter) is changed
+
+    # A movie that becomes a horror movie leaves the view
+    movie = changed.get_neighbors(actor)[0]
+    graph.movies.set_movie(int(movie[2:]), "2000", "Horror")
+    assert movie not in filtered(graph, movie_filter).get_neighbors(actor)
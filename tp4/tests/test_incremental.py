@@ -0,0 +1,139 @@
+import contextlib
+import io
+import os
+import random
+
+import pytest
+
+from components import ComponentIndex
+from filters import MovieFilter
+from functions import bfs, dijkstra, dijkstra_buckets, read_data
+from grafo_a import load_graph
+from grafo_b import load_graph_b
+from incremental import GraphUpdater
+from loader import format_id, MOVIE_PREFIX
+from synthetic import GENRES, generate_dataset
+
+MOVIES = 300
+KEYS = (("tconst",), ("tconst", "ordering"), ("nconst",))
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as file:
+        header = file.readline().rstrip("\n").split("\t")
+        return header, [line.rstrip("\n").split("\t") for line in file]
+
+
+def _write(path, header, rows):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\t".join(header) + "\n")
+        for row in rows:
+            file.write("\t".join(row) + "\n")
+
+
+def _deltas(paths, rng):
+    """
+    Random rows for every file: new movies, changed titles, years and genres, movies
+    that stop being movies, cast replacements and additions, and renamed actors
+    """
+    (movie_header, movie_rows), (cast_header, cast_rows), (name_header, name_rows) = map(_read, paths)
+    movies = [row for row in movie_rows if row[1] == "movie"]
+    actors = [row[0] for row in name_rows]
+    new_movies = [format_id(MOVIE_PREFIX, MOVIES + i + 1) for i in range(5)]
+
+    titles = []
+    for row in rng.sample(movies, 12):
+        row = list(row)
+        change = rng.randrange(4)
+        if change == 0:
+            row[1] = "short"
+        elif change == 1:
+            row[2] = row[3] = "Renamed " + row[0]
+        elif change == 2:
+            row[5] = str(int(row[5]) + rng.choice((-30, 30)))
+        else:
+            row[8] = ",".join(sorted(rng.sample(GENRES, 2)))
+        titles.append(row)
+    for movie_id in new_movies:
+        titles.append([movie_id, "movie", "New " + movie_id, "New " + movie_id, "0",
+                       str(rng.randint(1950, 2020)), "\\N", "90", rng.choice(("Horror", "Drama,Comedy", "\\N"))])
+
+    cast = []
+    for row in rng.sample(cast_rows, 25):
+        cast.append([row[0], row[1], rng.choice(actors)] + row[3:])
+    for _ in range(25):
+        movie_id = rng.choice(new_movies + [row[0] for row in movies])
+        cast.append([movie_id, str(rng.randint(1, 12)), rng.choice(actors), "actor", "\\N", "\\N"])
+
+    names = [[actor, "Renamed " + actor] + ["\\N"] * 4 for actor in rng.sample(actors, 10)]
+    return (movie_header, titles), (cast_header, cast), (name_header, names)
+
+
+def _merged(paths, deltas, directory):
+    """
+    Writes the base files with the delta rows replacing the rows with the same keys
+    """
+    merged = []
+    for path, (header, delta), key in zip(paths, deltas, KEYS):
+        rows = {}
+        for row in _read(path)[1] + delta:
+            rows[tuple(row[header.index(column)] for column in key)] = row
+        merged.append(os.path.join(directory, "merged-" + os.path.basename(path)))
+        _write(merged[-1], header, rows.values())
+    return merged
+
+
+def _assert_same_graph(graph, rebuilt):
+    assert set(graph.get_vertices()) == set(rebuilt.get_vertices())
+    for vertex in graph.get_vertices():
+        assert graph.get_vertex_data(vertex) == rebuilt.get_vertex_data(vertex)
+        assert set(graph.get_neighbors(vertex)) == set(rebuilt.get_neighbors(vertex))
+        for neighbor in graph.get_neighbors(vertex):
+            data, expected = graph.get_edge_data(vertex, neighbor), rebuilt.get_edge_data(vertex, neighbor)
+            assert sorted(data) == sorted(expected)
+    movies, expected = graph.movies, rebuilt.movies
+    assert list(movies.numbers) == list(expected.numbers)
+    assert list(movies.years) == list(expected.years)
+    assert ([set(movies.genre_names(number)) for number in movies.numbers]
+            == [set(expected.genre_names(number)) for number in expected.numbers])
+
+
+@pytest.mark.parametrize("bipartite", [False, True], ids=["costar", "bipartite"])
+def test_deltas_match_rebuilt_graph(tmp_path, bipartite):
+    loader = load_graph_b if bipartite else load_graph
+    paths = generate_dataset(str(tmp_path / "base"), MOVIES)
+    rng = random.Random(3)
+    with contextlib.redirect_stdout(io.StringIO()):
+        movies_by_id, actors_by_movie, actor_names_by_id = read_data(*paths)
+        graph = loader(movies_by_id, actors_by_movie, actor_names_by_id)
+    updater = GraphUpdater(graph, movies_by_id, actors_by_movie, actor_names_by_id, bipartite=bipartite,
+                           actors_file=paths[1], actors_name_file=paths[2])
+    sources = rng.sample(sorted(v for v in graph.get_vertices() if v.startswith("nm")), 25)
+    for source in sources:
+        updater.cache.hops(source)
+        updater.cache.weighted(source)
+
+    deltas = _deltas(paths, rng)
+    delta_paths = [str(tmp_path / ("delta-%d.tsv" % i)) for i in range(3)]
+    for path, (header, rows) in zip(delta_paths, deltas):
+        _write(path, header, rows)
+    stats = updater.apply_delta(*delta_paths)
+    assert stats["movies_added"] == 5 and stats["edges_changed"] > 0
+    assert 0 < len(updater.cache) < 2 * len(sources)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rebuilt = loader(*read_data(*_merged(paths, deltas, str(tmp_path))))
+    _assert_same_graph(graph, rebuilt)
+    expected = ComponentIndex.from_graph(rebuilt).as_connected()[1]
+    assert sorted(map(sorted, updater.components.as_connected()[1])) == sorted(map(sorted, expected))
+
+    horror = MovieFilter(exclude=["Horror"])
+    for source in sources:
+        if not rebuilt.vertex_exists(source):
+            continue
+        assert updater.cache.hops(source) == bfs(rebuilt, source)
+        assert updater.cache.weighted(source)[0] == dijkstra_buckets(rebuilt, source)[0]
+        assert bfs(graph, source, movie_filter=horror) == bfs(rebuilt, source, movie_filter=horror)
+        if not bipartite:
+            assert (dijkstra(graph, source, movie_filter=horror)[0]
+                    == dijkstra(rebuilt, source, movie_filter=horror)[0])
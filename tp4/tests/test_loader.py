@@ -0,0 +1,14 @@
+from loader import read_columns
+
+
+def test_read_columns_skips_short_lines(tmp_path):
+    path = tmp_path / "names.tsv"
+    path.write_text("nconst\tprimaryName\tbirthYear\n"
+                    "nm0000001\tFred Astaire\t1899\n"
+                    "nm0000002\n"
+                    "\n"
+                    "nm0000003\tLauren Bacall\n"
+                    "nm0000004\tBrigitte Bardot\t1934\textra\n", encoding="utf-8")
+    assert list(read_columns(str(path), ["primaryName", "nconst"])) == [
+        ("Fred Astaire", "nm0000001"), ("Lauren Bacall", "nm0000003"), ("Brigitte Bardot", "nm0000004")]
+    assert list(read_columns(str(path), ["birthYear"])) == [("1899",), ("1934",)]
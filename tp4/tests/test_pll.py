@@ -0,0 +1,64 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+from csr_graph import CSRGraph
+from functions import bfs
+from loader import read_data_compact
+from pll import ALIGNMENT, LabelIndex, cached_labels
+from synthetic import generate_dataset
+
+
+@pytest.fixture(scope="module")
+def graphs(tmp_path_factory):
+    paths = generate_dataset(str(tmp_path_factory.mktemp("pll")), 200)
+    with contextlib.redirect_stdout(io.StringIO()):
+        imdb_data = read_data_compact(*paths)
+        return {False: CSRGraph.from_imdb_data(imdb_data), True: CSRGraph.from_imdb_data(imdb_data, bipartite=True)}
+
+
+@pytest.mark.parametrize("bipartite", [False, True], ids=["costar", "bipartite"])
+def test_distances_match_bfs(graphs, bipartite):
+    graph = graphs[bipartite]
+    index = LabelIndex.build(graph, bipartite)
+    assert index.num_vertices() == graph.num_vertices()
+    for source in graph.get_vertices():
+        dist = bfs(graph, source)
+        for target in graph.get_vertices():
+            expected = dist.get(target, -1)
+            assert index.distance(source, target) == expected
+            assert index.separation(source, target) == (expected if expected == -1 or not bipartite
+                                                        else expected // 2)
+
+
+def test_save_and_load(graphs, tmp_path):
+    graph = graphs[True]
+    index = LabelIndex.build(graph, True)
+    path = str(tmp_path / "labels.pll")
+    index.save(path)
+    loaded = LabelIndex.load(path)
+    assert loaded is not None and loaded.bipartite and loaded.fingerprint == graph.fingerprint()
+    assert list(loaded.offsets) == list(index.offsets)
+    assert list(loaded.hubs) == list(index.hubs)
+    assert list(loaded.dists) == list(index.dists)
+    assert cached_labels(graph, path, True).fingerprint == graph.fingerprint()
+
+    size = os.path.getsize(path)
+    # The last section ends less than ALIGNMENT bytes before the end of the file
+    for length in (size - ALIGNMENT, size // 2, 10):
+        with open(path, "r+b") as file:
+            file.truncate(length)
+        assert LabelIndex.load(path) is None
+    # A damaged file is built and saved again
+    assert list(cached_labels(graph, path, True).hubs) == list(index.hubs)
+    assert os.path.getsize(path) == size
+
+
+def test_labels_of_another_graph_are_rebuilt(graphs, tmp_path):
+    path = str(tmp_path / "labels.pll")
+    LabelIndex.build(graphs[False], False).save(path)
+    index = cached_labels(graphs[True], path, True)
+    assert index.bipartite and index.fingerprint == graphs[True].fingerprint()
+    assert LabelIndex.load(path).fingerprint == graphs[True].fingerprint()
@@ -0,0 +1,117 @@
+import asyncio
+import contextlib
+import io
+import os
+
+import pytest
+
+from functions import bfs, read_data
+from grafo_b import load_graph_b
+from server import QueryService, query
+from synthetic import generate_dataset
+
+
+@pytest.fixture(scope="module")
+def paths(tmp_path_factory):
+    return generate_dataset(str(tmp_path_factory.mktemp("server")), 400)
+
+
+@pytest.fixture(scope="module")
+def reference(paths):
+    # The dictionary actor-movie graph, to check the answers without the code the service runs
+    with contextlib.redirect_stdout(io.StringIO()):
+        return load_graph_b(*read_data(*paths))
+
+
+def _separation(reference, label1, label2):
+    distance = bfs(reference, label1).get(label2)
+    return -1 if distance is None else distance // 2
+
+
+@pytest.fixture(scope="module")
+def service(paths):
+    directory = os.path.dirname(paths[0])
+    with pytest.MonkeyPatch.context() as patch:
+        # The snapshot cache is relative to the working directory
+        patch.chdir(directory)
+        service = QueryService(paths, workers=1)
+        yield service
+        service.close()
+
+
+def _ask(service, requests):
+    async def run():
+        server = await service.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await query(requests, port=port)
+    responses = asyncio.run(run())
+    return {response["id"]: response for response in responses}
+
+
+def _two_actors(service):
+    component = service.biggest
+    actors = [v for v in service.components.members(component) if service.graph.metadata.is_actor(v)]
+    return actors[0], actors[-1]
+
+
+def test_separation_and_path(service, reference):
+    graph = service.graph
+    actor1, actor2 = _two_actors(service)
+    label1, label2 = graph.vertex_label(actor1), graph.vertex_label(actor2)
+    responses = _ask(service, [
+        {"id": 1, "op": "separation", "actor1": label1, "actor2": label2},
+        {"id": 2, "op": "path", "actor1": label1, "actor2": graph.get_vertex_data(actor2)},
+        {"id": 3, "op": "kevin_bacon", "actor": label1},
+    ])
+    expected = _separation(reference, label1, label2)
+    assert expected > 0
+    assert responses[1] == {"id": 1, "ok": True, "result": {"separation": expected}}
+    result = responses[2]["result"]
+    assert result["separation"] == expected
+    path = [step["id"] for step in result["path"]]
+    assert path[0] == label1 and path[-1] == label2 and len(path) == expected * 2 + 1
+    assert all(reference.edge_exists(a, b) for a, b in zip(path, path[1:]))
+    assert responses[3]["ok"]
+    kevin_bacon = graph.vertex_label(service._vertex("Kevin Bacon"))
+    assert responses[3]["result"]["separation"] == _separation(reference, kevin_bacon, label1)
+
+
+def test_component(service, reference):
+    graph = service.graph
+    actor, _ = _two_actors(service)
+    response = _ask(service, [{"id": 1, "op": "component", "actor": graph.vertex_label(actor)}])[1]
+    assert response["ok"]
+    result = response["result"]
+    assert result["biggest"] is True
+    component = bfs(reference, graph.vertex_label(actor))
+    assert result["vertices"] == len(component)
+    assert result["actors"] == sum(1 for v in component if v[:2] == "nm")
+
+
+def test_errors(service):
+    errors = service.stats.errors
+    responses = _ask(service, [
+        {"id": 1, "op": "separation", "actor1": "nm0000000", "actor2": "Kevin Bacon"},
+        {"id": 2, "op": "nope"},
+        {"id": 3, "op": "component", "actor": 7},
+        {"id": 4, "op": "stats"},
+    ])
+    assert responses[1]["ok"] is False and "Unknown actor" in responses[1]["error"]
+    assert responses[2]["ok"] is False and "Unknown op" in responses[2]["error"]
+    assert responses[3]["ok"] is False
+    assert responses[4]["ok"] is True
+    assert service.stats.errors == errors + 3
+
+
+def test_failed_op_answers_with_an_error(service, monkeypatch):
+    def broken(request):
+        raise RuntimeError("worker died")
+    monkeypatch.setattr(service, "component", broken)
+    actor, _ = _two_actors(service)
+    responses = _ask(service, [
+        {"id": 1, "op": "component", "actor": service.graph.vertex_label(actor)},
+        {"id": 2, "op": "stats"},
+    ])
+    assert responses[1] == {"id": 1, "ok": False, "error": "RuntimeError: worker died"}
+    assert responses[2]["ok"] is True
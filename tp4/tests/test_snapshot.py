@@ -0,0 +1,31 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+from snapshot import BIPARTITE, COSTAR, cached_graph, open_snapshot, snapshot_path
+from synthetic import generate_dataset
+
+
+@pytest.mark.parametrize("variant", [COSTAR, BIPARTITE])
+def test_truncated_snapshot_is_rebuilt(tmp_path, variant):
+    paths = generate_dataset(str(tmp_path / "data"), 200)
+    cache_dir = str(tmp_path / "cache")
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph = cached_graph(variant, *paths, cache_dir=cache_dir)
+    expected = [list(graph.get_neighbors(v)) for v in graph.get_vertices()]
+    path = snapshot_path(variant, paths, cache_dir)
+    size = os.path.getsize(path)
+    del graph
+
+    for length in (size // 2, size - 1):
+        with open(path, "r+b") as file:
+            file.truncate(length)
+        with pytest.raises(ValueError):
+            open_snapshot(path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            graph = cached_graph(variant, *paths, cache_dir=cache_dir)
+        assert os.path.getsize(path) == size
+        assert [list(graph.get_neighbors(v)) for v in graph.get_vertices()] == expected
+        del graph
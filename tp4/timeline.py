@@ -0,0 +1,275 @@
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from components import ComponentIndex
+from functions import bidirectional_bfs
+from metadata import ACTOR, MOVIE, NO_YEAR
+
+YEAR_TYPE = 'h'
+INDEX_TYPE = 'i'
+# Sort key of the edges whose movies have no known year: after every real year
+UNDATED = 0x7FFF
+
+
+class Timeline:
+    """
+    Edges of a CSRGraph stamped with the year they appear: the start year of the
+    movie in the actor-movie graph, or the earliest start year of the shared movies
+    in the co-star graph. Edges whose movies have no known year are UNDATED, and
+    only belong to the whole graph.
+
+    Every row of the graph is reordered by edge year (indices[indptr[v]:indptr[v + 1]]
+    with edge_years non-decreasing), so the graph as of a year is a prefix of every
+    row: as_of gives it as a view without copying anything. Each edge is also kept
+    once in an edge list sorted by year (src, dst, list_years), for the sweeps.
+    """
+    def __init__(self, graph, indices: array, edge_years: array, src: array, dst: array,
+                 list_years: array, bipartite: bool):
+        self.graph = graph
+        self.indices = indices
+        self.edge_years = edge_years
+        self.src = src
+        self.dst = dst
+        self.list_years = list_years
+        self.bipartite = bipartite
+        self._indices_view = memoryview(indices)
+
+    @classmethod
+    def build(cls, graph) -> "Timeline":
+        """
+        Stamps and sorts the edges of a graph
+        :param graph: a CSRGraph with its VertexMetadata (as snapshot.cached_graph gives):
+        the actor-movie graph, with the movie years, or the co-star graph, with a MovieTable
+        :return: a Timeline
+        """
+        metadata = getattr(graph, "metadata", None)
+        if metadata is None or (metadata.years is None and metadata.movies is None):
+            raise ValueError("The graph has no movie years (see snapshot.cached_graph)")
+        bipartite = metadata.years is not None
+        indptr, indices = graph.indptr, graph.indices
+        stamp = _movie_year_stamp(graph, metadata) if bipartite else _costar_year_stamp(graph, metadata.movies)
+
+        sorted_indices = array(INDEX_TYPE)
+        edge_years = array(YEAR_TYPE)
+        by_year = {}
+        for v in graph.get_vertices():
+            row = sorted((stamp(v, p), indices[p]) for p in range(indptr[v], indptr[v + 1]))
+            for year, w in row:
+                sorted_indices.append(w)
+                edge_years.append(year)
+                if v < w:
+                    pair = by_year.get(year)
+                    if pair is None:
+                        pair = by_year[year] = (array(INDEX_TYPE), array(INDEX_TYPE))
+                    pair[0].append(v)
+                    pair[1].append(w)
+
+        src, dst, list_years = array(INDEX_TYPE), array(INDEX_TYPE), array(YEAR_TYPE)
+        for year in sorted(by_year):
+            year_src, year_dst = by_year.pop(year)
+            src += year_src
+            dst += year_dst
+            list_years += array(YEAR_TYPE, [year]) * len(year_src)
+        return cls(graph, sorted_indices, edge_years, src, dst, list_years, bipartite)
+
+    def years(self) -> List[int]:
+        """
+        Gets the years in which some edge appears
+        :return: the years, in order (without the undated edges)
+        """
+        years = []
+        for year in self.list_years:
+            if year == UNDATED:
+                break
+            if not years or years[-1] != year:
+                years.append(year)
+        return years
+
+    def edges_until(self, year: Optional[int]) -> int:
+        """
+        Counts the edges of the graph as of a year
+        :param year: the last year (None for the whole graph)
+        :return: the number of edges
+        """
+        return len(self.list_years) if year is None else bisect_right(self.list_years, year)
+
+    def as_of(self, year: Optional[int]) -> "TimelineView":
+        """
+        Gets the graph as it was at the end of a year
+        :param year: the last year (None for the whole graph, undated edges included)
+        :return: a TimelineView
+        """
+        return TimelineView(self, year)
+
+    def sweep(self, years: Optional[Iterable[int]]=None,
+              pairs: Iterable[Tuple[int, int]]=()) -> List[Dict[str, Any]]:
+        """
+        Adds the edges to a ComponentIndex in year order, in a single pass, describing
+        the graph at the end of every year: its vertices, components and giant component.
+        The separation of some pairs of vertices is followed too, with a bidirectional
+        BFS over the view of each year once union-find says they are connected.
+        :param years: the years to describe (by default every year with edges)
+        :param pairs: the pairs of vertex ids to follow
+        :return: one dictionary per year with year, edges, vertices, components, giant,
+        giant_actors and separations (one per pair, -1 while they are not connected)
+        """
+        kinds = self.graph.metadata.kinds
+        src, dst = self.src, self.dst
+        pairs = list(pairs)
+        index = ComponentIndex()
+        actors = {}
+        giant_root, giant = None, 0
+        vertices = position = 0
+        result = []
+        for year in sorted(self.years() if years is None else years):
+            end = max(position, bisect_right(self.list_years, year))
+            for i in range(position, end):
+                u, v = src[i], dst[i]
+                for w in (u, v):
+                    if not index.contains(w):
+                        index.add_vertex(w)
+                        vertices += 1
+                        actors[w] = 1 if kinds[w] == ACTOR else 0
+                root1, root2 = index.find(u), index.find(v)
+                if root1 == root2:
+                    continue
+                root = index.union(root1, root2)
+                actors[root] += actors.pop(root2 if root == root1 else root1)
+                if index.size(root) > giant:
+                    giant_root, giant = root, index.size(root)
+            position = end
+
+            view = self.as_of(year)
+            separations = []
+            for a, b in pairs:
+                if not index.same_component(a, b):
+                    separations.append(-1)
+                    continue
+                distance = bidirectional_bfs(view, a, b)
+                separations.append(int(distance / 2) if self.bipartite else distance)
+            result.append({"year": year, "edges": end, "vertices": vertices,
+                           "components": index.num_components(), "giant": giant,
+                           "giant_actors": actors[giant_root] if giant_root is not None else 0,
+                           "separations": separations})
+        return result
+
+
+class TimelineView:
+    """
+    A graph as of a year: every row of the Timeline cut where its edge years pass
+    the year, found by binary search, over the same arrays. Only the vertices with
+    an edge by then exist.
+    """
+    def __init__(self, timeline: Timeline, year: Optional[int]):
+        self.timeline = timeline
+        self.graph = timeline.graph
+        self.year = year
+        self._indptr = timeline.graph.indptr
+        self._last = UNDATED if year is None else year
+
+    def _end(self, vertex: int) -> int:
+        return bisect_right(self.timeline.edge_years, self._last, self._indptr[vertex], self._indptr[vertex + 1])
+
+    def get_neighbors(self, vertex: int) -> memoryview:
+        """
+        Gets the neighbors of a vertex as of the year
+        :param vertex: the vertex id
+        :return: the neighbor ids, as a zero-copy view
+        """
+        if not self.graph.vertex_exists(vertex):
+            return self.timeline._indices_view[0:0]
+        return self.timeline._indices_view[self._indptr[vertex]:self._end(vertex)]
+
+    def degree(self, vertex: int) -> int:
+        return self._end(vertex) - self._indptr[vertex]
+
+    def vertex_exists(self, vertex: int) -> bool:
+        if not self.graph.vertex_exists(vertex):
+            return False
+        first = self._indptr[vertex]
+        return first < self._indptr[vertex + 1] and self.timeline.edge_years[first] <= self._last
+
+    def edge_exists(self, vertex1: int, vertex2: int) -> bool:
+        return self.vertex_exists(vertex1) and vertex2 in self.get_neighbors(vertex1)
+
+    def get_edge_data(self, vertex1: int, vertex2: int) -> Any:
+        """
+        Gets the data of an edge as of the year
+        :param vertex1: the vertex1 id
+        :param vertex2: the vertex2 id
+        :return: the edge data; in a co-star graph, the movies released by then
+        """
+        if not self.edge_exists(vertex1, vertex2):
+            raise ValueError("The edge does not exist")
+        data = self.graph.get_edge_data(vertex1, vertex2)
+        if self.timeline.bipartite or self.year is None:
+            return data
+        movies = self.graph.movies
+        return [m for m in data if movies.year(m) is not None and movies.year(m) <= self.year]
+
+    def get_vertex_data(self, vertex: int) -> Optional[Any]:
+        return self.graph.get_vertex_data(vertex) if self.vertex_exists(vertex) else None
+
+    def get_vertices(self) -> List[int]:
+        return [v for v in self.graph.get_vertices() if self.vertex_exists(v)]
+
+    def vertex_label(self, vertex: int) -> Any:
+        return self.graph.vertex_label(vertex)
+
+    def vertex_id(self, label: Any) -> Optional[int]:
+        vertex = self.graph.vertex_id(label)
+        return vertex if vertex is not None and self.vertex_exists(vertex) else None
+
+    @property
+    def metadata(self):
+        return self.graph.metadata
+
+    def num_edges(self) -> int:
+        return self.timeline.edges_until(self.year)
+
+    def print_graph(self) -> None:
+        """
+        Prints the graph
+        """
+        for vertex in self.get_vertices():
+            print("Vertex:", vertex)
+            print("Data:", self.get_vertex_data(vertex))
+            print("Neighbors:", list(self.get_neighbors(vertex)))
+            print("")
+
+
+def _year_key(year: int) -> int:
+    return UNDATED if year == NO_YEAR else year
+
+
+def _movie_year_stamp(graph, metadata):
+    """
+    Stamps the edges of an actor-movie graph with the year of their movie
+    """
+    indices, years, kinds = graph.indices, metadata.years, metadata.kinds
+
+    def stamp(vertex, position):
+        movie = vertex if kinds[vertex] == MOVIE else indices[position]
+        return _year_key(years[movie])
+    return stamp
+
+
+def _costar_year_stamp(graph, movies):
+    """
+    Stamps the edges of a co-star graph with the earliest year of their movies
+    """
+    known = {}
+
+    def year_of(number):
+        year = known.get(number)
+        if year is None:
+            i = movies.position(number)
+            year = known[number] = _year_key(movies.years[i]) if i >= 0 else UNDATED
+        return year
+
+    edge_ptr, items = graph.edge_ptr, graph.edge_items
+
+    def stamp(vertex, position):
+        return min((year_of(m) for m in items[edge_ptr[position]:edge_ptr[position + 1]]), default=UNDATED)
+    return stamp
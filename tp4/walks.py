@@ -0,0 +1,146 @@
+import heapq
+import random
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from functions import is_actor
+from metadata import ACTOR
+
+COUNT_TYPE = 'q'
+SCORE_TYPE = 'd'
+DAMPING = 0.85
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 100
+
+
+def actor_mask (graph) -> bytearray:
+    """
+    Marks the actors of a graph
+    :param graph: the graph, a CSRGraph
+    :return: 1 for every actor vertex id, 0 for the movies
+    """
+    metadata = getattr(graph, "metadata", None)
+    if metadata is not None:
+        return bytearray(1 if kind == ACTOR else 0 for kind in metadata.kinds)
+    return bytearray(1 if is_actor(graph, v) else 0 for v in graph.get_vertices())
+
+
+def batch_random_walks (graph, walkers: int, steps: int, seed: Optional[int]=None,
+                        restart: float=0.0, starts: Optional[List[int]]=None,
+                        actors: Optional[bytearray]=None) -> Tuple[array, array]:
+    """
+    Moves many random walkers over the CSR adjacency, all of them one step at a time.
+    Each walker starts at a random vertex (of starts, if given) and, on every step,
+    goes back to its start with probability restart or else to a random neighbor.
+    A walker at a vertex with no neighbors stops. As in grafo_b.random_walks, the
+    vertex reached on every step is counted (the starting one is not).
+    :param graph: the graph, a CSRGraph
+    :param walkers: the number of walkers
+    :param steps: the number of steps of each walker
+    :param seed: the random seed, for reproducible counts
+    :param restart: the probability of going back to the start on each step
+    :param starts: the possible starting vertices (None for all the vertices)
+    :param actors: the actor_mask of the graph, if already calculated
+    :return: the visits of every vertex id, counted apart for the actors and the movies
+    (the movie entries of the first array and the actor entries of the second stay at 0)
+    """
+    rng = random.Random(seed)
+    indptr, indices = graph.indptr, graph.indices
+    n = graph.num_vertices()
+    if actors is None:
+        actors = actor_mask(graph)
+    actor_visits = array(COUNT_TYPE, [0]) * n
+    movie_visits = array(COUNT_TYPE, [0]) * n
+    if starts is None:
+        origin = array('i', (rng.randrange(n) for _ in range(walkers))) if n else array('i')
+    else:
+        origin = array('i', (rng.choice(starts) for _ in range(walkers)))
+    position = array('i', origin)
+    active = list(range(len(position)))
+    uniform = rng.random
+    for _ in range(steps):
+        if not active:
+            break
+        still_active = []
+        for walker in active:
+            vertex = position[walker]
+            if restart and uniform() < restart:
+                vertex = origin[walker]
+            else:
+                start = indptr[vertex]
+                degree = indptr[vertex + 1] - start
+                if degree == 0:
+                    continue
+                vertex = indices[start + int(uniform() * degree)]
+            position[walker] = vertex
+            if actors[vertex]:
+                actor_visits[vertex] += 1
+            else:
+                movie_visits[vertex] += 1
+            still_active.append(walker)
+        active = still_active
+    return actor_visits, movie_visits
+
+
+def pagerank (graph, damping: float=DAMPING, personalization: Optional[Dict[int, float]]=None,
+              tolerance: float=TOLERANCE, max_iterations: int=MAX_ITERATIONS) -> array:
+    """
+    Calculates PageRank by power iteration over the CSR adjacency. The rank of the
+    vertices with no neighbors is spread as the teleport is.
+    :param graph: the graph, a CSRGraph
+    :param damping: the probability of following an edge
+    :param personalization: the teleport weight of some vertices (personalised PageRank);
+    None to teleport uniformly
+    :param tolerance: stop once the total change of an iteration is below this
+    :param max_iterations: the maximum number of iterations
+    :return: the score of every vertex id (they add up to 1)
+    """
+    indptr, indices = graph.indptr, graph.indices
+    n = graph.num_vertices()
+    if n == 0:
+        return array(SCORE_TYPE)
+    if personalization is None:
+        teleport = array(SCORE_TYPE, [1.0 / n]) * n
+    else:
+        total = float(sum(personalization.values()))
+        if total <= 0:
+            raise ValueError("The personalization weights must add up to more than 0")
+        teleport = array(SCORE_TYPE, [0.0]) * n
+        for vertex, value in personalization.items():
+            teleport[vertex] = value / total
+    rank = array(SCORE_TYPE, teleport)
+    for _ in range(max_iterations):
+        following = array(SCORE_TYPE, [0.0]) * n
+        dangling = 0.0
+        for v in range(n):
+            start, end = indptr[v], indptr[v + 1]
+            if start == end:
+                dangling += rank[v]
+                continue
+            share = damping * rank[v] / (end - start)
+            for p in range(start, end):
+                following[indices[p]] += share
+        spread = 1.0 - damping + damping * dangling
+        change = 0.0
+        for v in range(n):
+            value = following[v] + spread * teleport[v]
+            change += abs(value - rank[v])
+            following[v] = value
+        rank = following
+        if change < tolerance:
+            break
+    return rank
+
+
+def top_vertices (scores, top: int=10, mask: Optional[bytearray]=None, kind: int=1) -> List[Tuple[int, float]]:
+    """
+    Gets the vertices with the highest scores (ties by vertex id)
+    :param scores: the score of every vertex id
+    :param top: the number of vertices
+    :param mask: the actor_mask, to rank only one kind of vertex
+    :param kind: with a mask, 1 for the actors and 0 for the movies
+    :return: the (vertex id, score) pairs
+    """
+    candidates = range(len(scores)) if mask is None else (v for v in range(len(scores)) if mask[v] == kind)
+    ranked = heapq.nsmallest(top, candidates, key=lambda v: (-scores[v], v))
+    return [(v, scores[v]) for v in ranked]